@@ -1,8 +1,14 @@
 import streamlit as st
-import asyncio
 import logging
+import time
+import uuid
 from chat import process_message, reset_chat_history
-from multi_agent import run_multi_agent
+from multi_agent import get_publish_queue
+from orchestrator import orchestrator
+from publish_queue import FINISHED_STATES, describe_job
+
+# How long the page follows a publish job before leaving it to the background worker
+PUBLISH_STATUS_TIMEOUT = 120
 
 
 #Configure logging
@@ -29,7 +35,7 @@ def render_chat_ui(title, on_submit):
         if st.button("➕ New Chat"):
             if title == "Chat":
                 st.session_state.chat_history = []
-                reset_chat_history()
+                reset_chat_history(st.session_state.session_id)
             elif title == "Multi-Agent":
                 st.session_state.multi_agent_history = []
   
@@ -58,6 +64,8 @@ def chat():
     """Chat functionality."""
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
     def on_chat_submit(user_input):
         if user_input:
@@ -66,7 +74,7 @@ def chat():
                 st.session_state.chat_history.append({"role": "user", "message": user_input})
                 with st.spinner("Processing your request.."):
                     # Get assistant's response
-                    assistant_response = asyncio.run(process_message(user_input))
+                    assistant_response = orchestrator.call(process_message(user_input, st.session_state.session_id))
                 st.session_state.chat_history.append({"role": "assistant", "message": assistant_response})
             except Exception as e:
                 logging.error(f"Error processing message: {e}")
@@ -81,29 +89,65 @@ def multi_agent():
     """Handles multi-agent system."""
     if "multi_agent_history" not in st.session_state:
         st.session_state.multi_agent_history = []
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
 
     def on_multi_agent_submit(user_input):
         if user_input:
             try:
                 st.session_state.multi_agent_history.append({"role": "user", "message": user_input})
+                #Display multi-agent chat history, then render new turns as they arrive
+                display_chat_history(st.session_state.multi_agent_history)
+                placeholder = None
+                streamed_text = ""
+                publish_job = None
                 with st.spinner("Agents are collaborating..."):
-                    result = asyncio.run(run_multi_agent(user_input))
-                    # Iterate directly over the list of responses
-                    for response in result:
+                    # The run executes on the shared orchestrator loop; this thread only renders its events
+                    run_id = orchestrator.submit(st.session_state.session_id, user_input)
+                    for event in orchestrator.stream(run_id):
+                        if event["type"] == "stats":
+                            st.caption(event["content"])
+                            continue
+                        if placeholder is None:
+                            placeholder = st.empty()
+                        if event["type"] == "delta":
+                            streamed_text += event["content"]
+                            placeholder.markdown(f"**{event['agent']}**: {streamed_text}")
+                            continue
+                        placeholder.markdown(f"**{event['agent']}**: {event['content']}")
                         st.session_state.multi_agent_history.append({
-                            "role": response["agent"],
-                            "message": response["content"]
+                            "role": event["agent"],
+                            "message": event["content"]
                         })
+                        placeholder = None
+                        streamed_text = ""
+                        publish_job = event.get("publish_job", publish_job)
+                if publish_job is not None:
+                    job = show_publish_status(publish_job)
+                    if job and job["status"] in FINISHED_STATES:
+                        st.session_state.multi_agent_history.append({"role": "System", "message": describe_job(job)})
             except Exception as e:
                 logging.error(f"Error in multi-agent system: {e}")
                 st.error("An error occurred while processing the multi-agent request.")
-        
-    #Display multi-agent chat history
-        display_chat_history(st.session_state.multi_agent_history)
-        
+        else:
+            display_chat_history(st.session_state.multi_agent_history)
+
     render_chat_ui("Multi-Agent", on_multi_agent_submit)
 
 
+def show_publish_status(job_id):
+    """Show a publish job's status as it moves through the queue; return the last status seen."""
+    placeholder = st.empty()
+    deadline = time.monotonic() + PUBLISH_STATUS_TIMEOUT
+    job = get_publish_queue().status(job_id)
+    while job and job["status"] not in FINISHED_STATES and time.monotonic() < deadline:
+        placeholder.info(describe_job(job))
+        time.sleep(0.5)
+        job = get_publish_queue().status(job_id)
+    placeholder.markdown(f"**System**: {describe_job(job)}")
+    return job
+
+
 def display_chat_history(chat_history):
     """Display chat history."""
     with st.container():
@@ -115,6 +159,8 @@ def display_chat_history(chat_history):
 
 def main():
     """Main function to run the app."""
+    # Resume publish jobs left over from a previous run
+    get_publish_queue()
     # st.set_page_config(page_title="AI Workshop", layout="wide")
     chosen_operation = configure_sidebar()
     st.markdown("<h2 style='text-align:center;'>Welcome to the AI Workshop for Developers</h2>", unsafe_allow_html=True)
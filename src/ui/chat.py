@@ -1,39 +1,64 @@
 import logging
+import os
+import httpx
 from dotenv import load_dotenv
-from semantic_kernel import Kernel
-from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.connectors.ai.function_choice_behavior import FunctionChoiceBehavior
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
 #Import Modules
+from openapi_plugin import workitems_api
+from plugin_registry import plugins
+from services import get_embedding_service, get_kernel
+from session_history import sessions
 
 # Add Logger
 logger = logging.getLogger(__name__)
 
 load_dotenv(override=True)
 
-chat_history = ChatHistory()
+# Sessions that pass no id share this one
+DEFAULT_SESSION = "default"
+
+# Plugins are imported on the first call of one of their functions (see plugin_registry.py)
+# Challenge 03 - Add Time Plugin
+plugins.register("time", "semantic_kernel.core_plugins.time_plugin:TimePlugin")
+plugins.register("geo", "plugins.geo_coding_plugin:GeoPlugin")
+# Challenge 05 - Handbook search over a local index, built from HANDBOOK_DIR on first use
+if os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"):
+    plugins.register("handbook", "plugins.handbook_plugin:create_handbook_plugin")
+
+
+def setup_kernel(kernel):
+    """Add plugins and services to the chat kernel; runs once per process (and event loop)."""
+    plugins.add_to(kernel)
+    #Challenge 05 - Add Text Embedding service for semantic search
+    # Cached: repeated questions and re-ingested chunks are not embedded again
+    if os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"):
+        kernel.add_service(get_embedding_service())
+    #Challenge 07 - Add DALL-E image generation service
+
 
 def initialize_kernel():
     #Challene 02 - Add Kernel
-    kernel = Kernel()
     #Challenge 02 - Chat Completion Service
-    #Challenge 05 - Add Text Embedding service for semantic search
-    #Challenge 07 - Add DALL-E image generation service
-    chat_completion_service = kernel.get_service(type=ChatCompletionClientBase)
-    return kernel
+    # Kernel, pooled services and plugins are shared process-wide; only the first call builds them
+    return get_kernel("chat", setup=setup_kernel)
 
 
-async def process_message(user_input):
+async def process_message(user_input, session_id=DEFAULT_SESSION):
     kernel = initialize_kernel()
 
     #Challenge 03 and 04 - Services Required
+    chat_completion_service = kernel.get_service(type=ChatCompletionClientBase)
     #Challenge 03 - Create Prompt Execution Settings
-
-
-
-    # Challenge 03 - Add Time Plugin
-    # Placeholder for Time plugin
+    execution_settings = PromptExecutionSettings(function_choice_behavior=FunctionChoiceBehavior.Auto())
 
     # Challenge 04 - Import OpenAPI Spec
-    # Placeholder for OpenAPI plugin
+    # The spec is fetched and compiled once; later messages reuse the compiled plugin
+    try:
+        await workitems_api.add_to(kernel)
+    except (httpx.HTTPError, OSError) as e:
+        logger.warning(f"Work Items API plugin unavailable: {e}")
 
 
     # Challenge 05 - Add Search Plugin
@@ -45,9 +70,18 @@ async def process_message(user_input):
     # Placeholder for Text To Image plugin
 
     # Start Challenge 02 - Sending a message to the chat completion service by invoking kernel
-
-    #return result
-
-def reset_chat_history():
-    global chat_history
-    chat_history = ChatHistory()
\ No newline at end of file
+    chat_history = sessions.get(session_id)
+    known = len(chat_history.messages)
+    chat_history.add_user_message(user_input)
+    result = await chat_completion_service.get_chat_message_content(
+        chat_history=chat_history,
+        settings=execution_settings,
+        kernel=kernel,
+    )
+    chat_history.add_message(result)
+    sessions.append(session_id, chat_history.messages[known:])
+
+    return str(result)
+
+def reset_chat_history(session_id=DEFAULT_SESSION):
+    sessions.reset(session_id)
\ No newline at end of file
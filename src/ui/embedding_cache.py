@@ -0,0 +1,160 @@
+"""
+Embedding cache for the text embedding service.
+
+Keys are a SHA-256 hash of the embedding model, the dimensions and the normalised
+text (Unicode NFC, whitespace collapsed), so the same question or handbook chunk is
+embedded once. Vectors live in a float32 file that is memory-mapped, one fixed slot
+per entry; a SQLite key index maps keys to slots and records when each was last used,
+so the cache survives restarts. When it is full the least recently used entry's slot
+is reused. Without a path the cache is kept in memory.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from response_cache import make_key
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))
+
+
+def normalize_text(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class EmbeddingCache:
+    """LRU cache of embedding vectors of one dimension count, in memory or in a directory on disk."""
+
+    def __init__(self, dimensions, path=None, capacity=EMBEDDING_CACHE_SIZE):
+        self.dimensions = dimensions
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> slot, least recently used first
+        self._slots = OrderedDict()
+        self._db = None
+        if path is None:
+            self._vectors = np.zeros((capacity, dimensions), dtype=np.float32)
+            return
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        vectors_path = path / f"vectors-{dimensions}.f32"
+        mode = "r+" if vectors_path.exists() and vectors_path.stat().st_size == capacity * dimensions * 4 else "w+"
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode=mode, shape=(capacity, dimensions))
+        self._db = sqlite3.connect(str(path / f"keys-{dimensions}.sqlite3"), check_same_thread=False, timeout=30)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            if mode == "w+":
+                # A new or resized vector file invalidates every slot
+                self._db.execute("DELETE FROM embeddings")
+        for key, slot in self._db.execute("SELECT key, slot FROM embeddings ORDER BY accessed_at"):
+            self._slots[key] = slot
+
+    def key(self, model, text):
+        return make_key(model, self.dimensions, normalize_text(text))
+
+    def get_many(self, model, texts):
+        """Return a cached vector (a copy) or None for each text."""
+        keys = [self.key(model, text) for text in texts]
+        results = []
+        touched = []
+        with self._lock:
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                self.hits += 1
+                self._slots.move_to_end(key)
+                touched.append(key)
+                results.append(np.array(self._vectors[slot]))
+            if touched and self._db is not None:
+                now = time.time()
+                with self._db:
+                    self._db.executemany("UPDATE embeddings SET accessed_at = ? WHERE key = ?", [(now, k) for k in touched])
+        return results
+
+    def put_many(self, model, texts, vectors):
+        """Store the vectors of texts, evicting the least recently used entries when full."""
+        rows = []
+        evicted = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                if vector.shape != (self.dimensions,):
+                    continue
+                key = self.key(model, text)
+                slot = self._slots.get(key)
+                if slot is None:
+                    if len(self._slots) < self.capacity:
+                        slot = len(self._slots)
+                    else:
+                        old_key, slot = self._slots.popitem(last=False)
+                        evicted.append((old_key,))
+                self._slots[key] = slot
+                self._slots.move_to_end(key)
+                self._vectors[slot] = vector
+                rows.append((key, slot))
+            if self._db is not None and rows:
+                # Vectors reach the file before the keys that point at them
+                self._vectors.flush()
+                now = time.time()
+                with self._db:
+                    self._db.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, slot, accessed_at) VALUES (?, ?, ?)",
+                        [(key, slot, now) for key, slot in rows],
+                    )
+
+    async def embed(self, model, texts, embed):
+        """
+        Return vectors for texts, calling ``embed(texts)`` (async) only for the distinct
+        texts that are not cached.
+        """
+        cached = self.get_many(model, texts)
+        missing = {}
+        for text, vector in zip(texts, cached):
+            if vector is None:
+                missing.setdefault(normalize_text(text), text)
+        if missing:
+            vectors = await embed(list(missing.values()))
+            self.put_many(model, list(missing.values()), vectors)
+            fresh = dict(zip(missing, (np.asarray(vector, dtype=np.float32) for vector in vectors)))
+            cached = [vector if vector is not None else fresh[normalize_text(text)] for text, vector in zip(texts, cached)]
+        return cached
+
+    def __len__(self):
+        return len(self._slots)
+
+    def metrics(self):
+        """Return hit/miss counters, the hit rate and the number of stored entries."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._slots),
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._vectors.flush()
+            self._db.close()
+            self._db = None
+
+
+def cached_embedder(embed, cache, model):
+    """Wrap an ``embed(texts)`` callable (see retrieval/vector_index.py) with an EmbeddingCache."""
+    async def cached(texts):
+        return await cache.embed(model, texts, embed)
+    return cached
@@ -0,0 +1,167 @@
+"""
+Git publishing backend for approved artifacts.
+
+Runs git directly (no PowerShell or bash wrapper), stages only the artifact paths
+instead of walking the whole working tree with ``git add .``, and writes several
+artifacts as one commit and one push. ``publish`` runs the blocking git calls on a
+worker thread so the agent conversation's event loop keeps going.
+"""
+
+import asyncio
+import base64
+import os
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+DEFAULT_COMMIT_MESSAGE = "Auto-commit: HTML code approved and deployed"
+GIT_TIMEOUT_SECONDS = float(os.getenv("GIT_TIMEOUT", "120"))
+
+
+class GitPublishError(Exception):
+    """Raised when a git command fails; retryable is False when trying again cannot help."""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+@dataclass
+class Artifact:
+    """A file to write and publish. Relative paths are resolved against the working directory."""
+    path: str
+    content: str
+
+
+@dataclass
+class PublishResult:
+    """Outcome of one publish call, with the time spent in each step in seconds."""
+    paths: list = field(default_factory=list)
+    commit: str = None
+    committed: bool = False
+    pushed: bool = False
+    error: str = None
+    # False for failures that would repeat on every attempt, e.g. a path outside the repository
+    retryable: bool = True
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def success(self):
+        return self.error is None and self.pushed
+
+    def timing_summary(self):
+        """Return e.g. "write 1 ms, stage 12 ms, commit 25 ms, push 640 ms"."""
+        return ", ".join(f"{step} {seconds * 1000:.0f} ms" for step, seconds in self.timings.items())
+
+
+class GitPublisher:
+    """Writes artifacts, then stages, commits and pushes them in one batch."""
+
+    def __init__(self, repo_dir=None, remote=None, branch="main"):
+        self.repo_dir = Path(repo_dir) if repo_dir else None
+        self.remote = remote
+        self.branch = branch
+
+    def _git(self, *args, env=None, check=True):
+        result = subprocess.run(
+            ["git", *args],
+            cwd=self.repo_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=GIT_TIMEOUT_SECONDS,
+            check=False,
+        )
+        if check and result.returncode != 0:
+            raise GitPublishError(f"git {args[0]} failed: {result.stderr.strip() or result.stdout.strip()}")
+        return result
+
+    def _resolve_repo_dir(self):
+        if self.repo_dir is None:
+            toplevel = subprocess.run(
+                ["git", "rev-parse", "--show-toplevel"],
+                cwd=Path(__file__).parent,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if toplevel.returncode != 0:
+                raise GitPublishError(f"Not a git repository: {toplevel.stderr.strip()}", retryable=False)
+            self.repo_dir = Path(toplevel.stdout.strip())
+        return self.repo_dir
+
+    def _push_target(self):
+        """Return the push remote and the environment that authenticates it."""
+        if self.remote:
+            return self.remote, None
+        github_pat = os.getenv("GITHUB_PAT")
+        github_username = os.getenv("GITHUB_USERNAME")
+        github_repo_url = os.getenv("GITHUB_REPO_URL")
+        if github_pat and github_username and github_repo_url:
+            # Pass the PAT through git's environment config so it never shows up in argv or output
+            credentials = base64.b64encode(f"{github_username}:{github_pat}".encode()).decode()
+            env = dict(os.environ)
+            env.update({
+                "GIT_CONFIG_COUNT": "1",
+                "GIT_CONFIG_KEY_0": "http.https://github.com/.extraheader",
+                "GIT_CONFIG_VALUE_0": f"AUTHORIZATION: basic {credentials}",
+            })
+            return github_repo_url, env
+        return "origin", None
+
+    def publish_sync(self, artifacts, message=DEFAULT_COMMIT_MESSAGE, extra_paths=(), branch=None):
+        """Write the artifacts and publish them with their extra paths as a single commit."""
+        result = PublishResult()
+        branch = branch or self.branch
+        try:
+            repo_dir = self._resolve_repo_dir().resolve()
+            # Only the named branch is committed to and pushed, never whatever else is checked out
+            current = self._git("symbolic-ref", "--quiet", "--short", "HEAD", check=False).stdout.strip()
+            if current != branch:
+                raise GitPublishError(
+                    f"{current or 'A detached HEAD'} is checked out, not {branch}; not publishing", retryable=False
+                )
+
+            started = time.perf_counter()
+            paths = []
+            for artifact in artifacts:
+                path = Path(artifact.path).resolve()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(path.name + ".tmp")
+                tmp_path.write_text(artifact.content, encoding="utf-8")
+                os.replace(tmp_path, path)
+                paths.append(path)
+            result.timings["write"] = time.perf_counter() - started
+
+            paths.extend(Path(extra).resolve() for extra in extra_paths if Path(extra).exists())
+            result.paths = [str(path.relative_to(repo_dir)) for path in paths]
+            if not result.paths:
+                return result
+
+            started = time.perf_counter()
+            self._git("add", "--", *result.paths)
+            result.timings["stage"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            # --only style commit of just our paths; other staged work is left alone
+            if self._git("diff", "--cached", "--quiet", "--", *result.paths, check=False).returncode != 0:
+                self._git("commit", "-m", message, "--", *result.paths)
+                result.committed = True
+            result.commit = self._git("rev-parse", "HEAD").stdout.strip()
+            result.timings["commit"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            remote, env = self._push_target()
+            self._git("push", remote, f"{branch}:{branch}", env=env)
+            result.pushed = True
+            result.timings["push"] = time.perf_counter() - started
+        except (GitPublishError, OSError, ValueError, subprocess.SubprocessError) as e:
+            result.error = str(e)
+            # ValueError: a path outside the repository
+            result.retryable = getattr(e, "retryable", not isinstance(e, ValueError))
+        return result
+
+    async def publish(self, artifacts, message=DEFAULT_COMMIT_MESSAGE, extra_paths=(), branch=None):
+        """Publish off the event loop."""
+        return await asyncio.to_thread(self.publish_sync, artifacts, message, extra_paths, branch)
@@ -0,0 +1,253 @@
+"""
+Prompt history reduction for the multi-agent conversation.
+
+Without it every agent turn resends the whole conversation, including every HTML
+revision the SoftwareEngineer has written, so prompt size grows with each review
+cycle. ``HistoryReducer`` rewrites the prompt an agent is about to send:
+
+- the latest HTML block is kept verbatim and every superseded block is replaced by
+  a one-line reference to the revision that replaced it;
+- when the prompt is still over the token budget, turns older than the most recent
+  ones are folded into a single summary message.
+
+The group chat history itself is not changed, so approval detection and HTML
+extraction still see every message. Agents opt in through ``ReducingChatCompletionAgent``.
+"""
+
+import os
+from typing import Any
+
+from pydantic import Field
+from semantic_kernel.agents import ChatCompletionAgent
+from semantic_kernel.connectors.ai.prompt_execution_settings import PromptExecutionSettings
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.text_content import TextContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+from html_fence import close_html_fence, open_html_fence
+
+# 0 disables summarization; superseded HTML is always replaced
+HISTORY_TOKEN_BUDGET = int(os.getenv("MULTI_AGENT_HISTORY_TOKENS", "6000"))
+# Most recent turns that are never summarized
+HISTORY_KEEP_RECENT = int(os.getenv("MULTI_AGENT_HISTORY_KEEP_RECENT", "4"))
+# "extractive" (no model call) or "model"
+HISTORY_SUMMARY = os.getenv("MULTI_AGENT_HISTORY_SUMMARY", "extractive").lower()
+
+SUMMARY_NAME = "ConversationSummary"
+SUMMARY_INSTRUCTIONS = (
+    "Summarize this conversation between a BusinessAnalyst, a SoftwareEngineer and a ProductOwner. "
+    "Keep every requirement, decision and open defect; leave out code."
+)
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) when the service reports no usage."""
+    return max(1, len(text or "") // 4)
+
+
+def split_html_blocks(text):
+    """
+    Split text into ("text", str) and ("html", str) segments.
+
+    Fences follow ``html_fence.py``, as in ``HtmlBlockExtractor``; a block still open at
+    the end of the text runs to the end.
+    """
+    segments = []
+    current = []
+    fence = 0
+    for line in text.split("\n"):
+        if fence:
+            current.append(line)
+            if close_html_fence(line, fence) is not None:
+                segments.append(("html", "\n".join(current)))
+                current = []
+                fence = 0
+            continue
+        opened = open_html_fence(line)
+        if opened is None:
+            current.append(line)
+            continue
+        if current:
+            segments.append(("text", "\n".join(current)))
+        current = [line]
+        fence = opened[0]
+    if current:
+        segments.append(("html" if fence else "text", "\n".join(current)))
+    return segments
+
+
+def _is_text_only(message):
+    return all(isinstance(item, TextContent) for item in message.items)
+
+
+def _message_tokens(messages):
+    return sum(estimate_tokens(message.content) for message in messages)
+
+
+def _copy_with_content(message, content):
+    return ChatMessageContent(role=message.role, name=message.name, content=content)
+
+
+async def extractive_summary(messages):
+    """Summarize turns without a model call: the opening of each turn, code left out."""
+    lines = []
+    for message in messages:
+        text = " ".join(
+            segment.strip() for kind, segment in split_html_blocks(message.content or "") if kind == "text"
+        )
+        text = " ".join(text.split())
+        if text:
+            lines.append(f"- {message.name or message.role.value}: {text[:300]}{'...' if len(text) > 300 else ''}")
+    return "\n".join(lines)
+
+
+def model_summarizer(service):
+    """Return a summarizer that asks the chat completion service for the summary."""
+    async def summarize(messages):
+        history = ChatHistory(system_message=SUMMARY_INSTRUCTIONS)
+        transcript = "\n\n".join(f"{message.name or message.role.value}: {message.content}" for message in messages)
+        history.add_user_message(transcript)
+        result = await service.get_chat_message_content(history, PromptExecutionSettings())
+        return str(result)
+    return summarize
+
+
+class HistoryReducer:
+    """
+    Shrinks the prompts of one multi-agent run and counts the tokens it saves.
+
+    ``summarize`` is an async callable that turns a list of messages into summary text.
+    Summaries are reused while the summarized prefix is unchanged, so a model summarizer
+    is only called again when more turns fall out of the recent window.
+    """
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET, keep_recent=HISTORY_KEEP_RECENT, summarize=None):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.summarize = summarize or extractive_summary
+        self.prompts = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.artifacts_replaced = 0
+        self.summaries = 0
+        self._summary_cache = {}
+
+    async def reduce(self, messages):
+        """Return a reduced copy of a prompt's messages."""
+        before = _message_tokens(messages)
+        reduced = self._replace_superseded_html(messages)
+        if self.token_budget and _message_tokens(reduced) > self.token_budget:
+            reduced = await self._summarize_older_turns(reduced)
+        after = _message_tokens(reduced)
+        self.prompts += 1
+        self.tokens_before += before
+        self.tokens_after += after
+        return reduced
+
+    def _replace_superseded_html(self, messages):
+        """Replace every HTML block except the latest with a reference to its successor."""
+        split = [
+            split_html_blocks(message.content) if message.content and _is_text_only(message) else None
+            for message in messages
+        ]
+        total = sum(1 for segments in split if segments for kind, _ in segments if kind == "html")
+        if total < 2:
+            return list(messages)
+        reduced = []
+        revision = 0
+        for message, segments in zip(messages, split):
+            if not segments or not any(kind == "html" for kind, _ in segments):
+                reduced.append(message)
+                continue
+            parts = []
+            for kind, segment in segments:
+                if kind == "html":
+                    revision += 1
+                    reference = f"[HTML revision {revision} omitted: superseded by revision {total} below]"
+                    if revision < total and len(reference) < len(segment):
+                        self.artifacts_replaced += 1
+                        segment = reference
+                parts.append(segment)
+            reduced.append(_copy_with_content(message, "\n".join(parts)))
+        return reduced
+
+    async def _summarize_older_turns(self, messages):
+        """Fold turns before the recent window into one summary, keeping the latest artifact."""
+        head = [message for message in messages[:1] if message.role == AuthorRole.SYSTEM]
+        body = messages[len(head):]
+        cutoff = max(0, len(body) - self.keep_recent)
+        older, recent = body[:cutoff], body[cutoff:]
+        if not older:
+            return messages
+
+        # The message carrying the latest artifact survives even when it is old
+        artifact_index = None
+        for index, message in enumerate(body):
+            if message.content and _is_text_only(message) and any(
+                kind == "html" for kind, _ in split_html_blocks(message.content)
+            ):
+                artifact_index = index
+        if artifact_index is not None and artifact_index >= cutoff:
+            artifact_index = None
+        kept = [older[artifact_index]] if artifact_index is not None else []
+        to_summarize = [message for index, message in enumerate(older) if index != artifact_index and message.content]
+        if not to_summarize:
+            return messages
+
+        cache_key = tuple((message.name, message.content) for message in to_summarize)
+        summary = self._summary_cache.get(cache_key)
+        if summary is None:
+            summary = await self.summarize(to_summarize)
+            self._summary_cache = {cache_key: summary}
+            self.summaries += 1
+        summary_message = ChatMessageContent(
+            role=AuthorRole.SYSTEM,
+            name=SUMMARY_NAME,
+            content=f"Summary of the {len(to_summarize)} earlier turns:\n{summary}",
+        )
+        return head + [summary_message] + kept + recent
+
+    @property
+    def tokens_saved(self):
+        return self.tokens_before - self.tokens_after
+
+    def metrics(self):
+        """Return prompt counts and estimated tokens before and after reduction."""
+        return {
+            "prompts": self.prompts,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+            "artifacts_replaced": self.artifacts_replaced,
+            "summaries": self.summaries,
+        }
+
+    def report(self):
+        """Return a one-line summary of the tokens saved in this run."""
+        if not self.prompts:
+            return "History reduction: no prompts sent"
+        percent = 100 * self.tokens_saved / self.tokens_before if self.tokens_before else 0.0
+        return (f"History reduction: ~{self.tokens_saved} prompt tokens saved over {self.prompts} turns "
+                f"({percent:.0f}%, {self.artifacts_replaced} superseded HTML blocks replaced, {self.summaries} summaries)")
+
+
+def create_history_reducer(service=None):
+    """Create a reducer configured from the environment; model summaries need a chat service."""
+    summarize = model_summarizer(service) if HISTORY_SUMMARY == "model" and service is not None else None
+    return HistoryReducer(summarize=summarize)
+
+
+class ReducingChatCompletionAgent(ChatCompletionAgent):
+    """ChatCompletionAgent that passes every prompt through a HistoryReducer before sending it."""
+
+    history_reducer: Any = Field(default=None, exclude=True)
+
+    def __init__(self, *, history_reducer=None, **kwargs):
+        super().__init__(**kwargs)
+        self.history_reducer = history_reducer
+
+    async def _prepare_agent_chat_history(self, history, kernel, arguments):
+        prepared = await super()._prepare_agent_chat_history(history, kernel, arguments)
+        if self.history_reducer is None:
+            return prepared
+        return ChatHistory(messages=await self.history_reducer.reduce(prepared.messages))
@@ -0,0 +1,36 @@
+"""
+Fence rules for ```html code blocks in agent messages.
+
+Shared by ``HtmlBlockExtractor`` (multi_agent.py), which pulls the latest block out of
+streamed messages, and ``split_html_blocks`` (history_reducer.py), which finds the
+blocks to replace in prompts, so both agree on where a block starts and ends.
+"""
+
+import re
+
+# Opening fence of an html code block, e.g. "```html" or "````HTML"
+_HTML_FENCE_OPEN = re.compile(r'(`{3,})\s*html\b(.*)$', re.IGNORECASE)
+
+
+def open_html_fence(line):
+    """
+    Return (fence length, code after the fence) when line opens an html block, else None.
+    Single-line mentions such as "```html [code] ```" do not open a block.
+    """
+    match = _HTML_FENCE_OPEN.search(line)
+    if match is None or match.group(1) in match.group(2):
+        return None
+    return len(match.group(1)), match.group(2)
+
+
+def close_html_fence(line, fence):
+    """
+    Return the code before the closing fence when line closes a block opened with fence
+    backticks, else None. A block closes at the end of a line with at least as many
+    backticks, alone or after the last line of code (e.g. "<p>x</p>```").
+    """
+    code = line.rstrip()
+    backticks = len(code) - len(code.rstrip("`"))
+    if backticks < fence:
+        return None
+    return code[:-backticks]
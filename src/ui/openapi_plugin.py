@@ -0,0 +1,192 @@
+"""
+Cached OpenAPI plugin loader for the Work Items API.
+
+Importing an OpenAPI spec as a kernel plugin means downloading ``/openapi.json``,
+resolving its ``$ref``s and compiling one kernel function per operation. The loader
+does that once: the raw and resolved specs are cached on disk with the spec's ETag and
+content hash, a restart revalidates with one conditional request (``If-None-Match``,
+answered 304 by ``workitems/api.py``) instead of re-parsing, and the compiled plugin
+is reused until the spec's hash changes. Tool calls share a pooled HTTP client per
+event loop, so each costs one HTTP request and no spec work.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from pathlib import Path
+
+import httpx
+from semantic_kernel.connectors.openapi_plugin.openapi_function_execution_parameters import (
+    OpenAPIFunctionExecutionParameters,
+)
+from semantic_kernel.connectors.openapi_plugin.openapi_parser import OpenApiParser
+from semantic_kernel.functions import KernelPlugin
+
+from rate_limiter import RateLimitedTransport
+
+logger = logging.getLogger(__name__)
+
+WORKITEMS_API_URL = os.getenv("WORKITEMS_API_URL", "http://localhost:8000")
+OPENAPI_CACHE_DIR = os.getenv("OPENAPI_CACHE_DIR", str(Path(__file__).parent / ".openapi_cache"))
+# How often a loaded spec is revalidated with a conditional request
+OPENAPI_REVALIDATE_SECONDS = float(os.getenv("OPENAPI_REVALIDATE_SECONDS", "300"))
+OPENAPI_TIMEOUT = float(os.getenv("OPENAPI_TIMEOUT", "30"))
+OPENAPI_MAX_CONNECTIONS = int(os.getenv("OPENAPI_MAX_CONNECTIONS", "8"))
+
+
+class OpenApiPluginLoader:
+    """Loads an API's OpenAPI spec as a KernelPlugin, caching the spec and the compiled plugin."""
+
+    def __init__(self, plugin_name, base_url, cache_dir=OPENAPI_CACHE_DIR, description=None,
+                 revalidate_seconds=OPENAPI_REVALIDATE_SECONDS, transport=None):
+        self.plugin_name = plugin_name
+        self.base_url = base_url.rstrip("/")
+        self.spec_url = f"{self.base_url}/openapi.json"
+        self.cache_path = Path(cache_dir) / f"{plugin_name}.json"
+        self.description = description
+        self.revalidate_seconds = revalidate_seconds
+        self.transport = transport
+        self.downloads = 0
+        self.not_modified = 0
+        self.compiles = 0
+        self._etag = None
+        self._hash = None
+        self._resolved = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._refreshing = weakref.WeakKeyDictionary()
+        # event loop -> (spec hash, pooled client, compiled plugin)
+        self._by_loop = weakref.WeakKeyDictionary()
+        self._read_cache()
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, encoding="utf-8") as file:
+                cached = json.load(file)
+            self._etag, self._hash, self._resolved = cached["etag"], cached["hash"], cached["resolved"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _write_cache(self):
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({"etag": self._etag, "hash": self._hash, "resolved": self._resolved}, file)
+            os.replace(tmp_path, self.cache_path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not cache the OpenAPI spec of {self.plugin_name}: {e}")
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        entry = self._by_loop.get(loop)
+        if entry is not None:
+            return entry[1]
+        limits = httpx.Limits(max_connections=OPENAPI_MAX_CONNECTIONS, max_keepalive_connections=OPENAPI_MAX_CONNECTIONS)
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(OPENAPI_TIMEOUT, pool=None),
+            transport=self.transport or RateLimitedTransport(limits=limits),
+        )
+        self._by_loop[loop] = (None, client, None)
+        return client
+
+    def _resolve(self, body):
+        """Resolve the $refs of a raw spec with Semantic Kernel's parser."""
+        path = self.cache_path.with_suffix(".raw.json")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(body)
+        return OpenApiParser().parse(str(path))
+
+    async def refresh(self):
+        """Revalidate the spec with a conditional request; return True if it changed."""
+        client = self._client()
+        headers = {"If-None-Match": self._etag} if self._etag and self._resolved is not None else {}
+        response = await client.get(self.spec_url, headers=headers)
+        self._checked_at = time.monotonic()
+        if response.status_code == 304:
+            self.not_modified += 1
+            return False
+        response.raise_for_status()
+        self.downloads += 1
+        spec_hash = hashlib.sha256(response.content).hexdigest()
+        etag = response.headers.get("etag")
+        if spec_hash == self._hash and self._resolved is not None:
+            if etag != self._etag:
+                self._etag = etag
+                self._write_cache()
+            return False
+        resolved = await asyncio.to_thread(self._resolve, response.content)
+        with self._lock:
+            self._etag, self._hash, self._resolved = etag, spec_hash, resolved
+        self._write_cache()
+        return True
+
+    async def _refresh_once(self):
+        """Refresh, letting concurrent callers on the same loop share one request."""
+        loop = asyncio.get_running_loop()
+        task = self._refreshing.get(loop)
+        if task is None:
+            task = loop.create_task(self.refresh())
+            self._refreshing[loop] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(loop, None))
+        await asyncio.shield(task)
+
+    async def plugin(self):
+        """Return the compiled plugin for the running event loop, revalidating the spec when due."""
+        due = self._checked_at is None or time.monotonic() - self._checked_at >= self.revalidate_seconds
+        if due:
+            try:
+                await self._refresh_once()
+            except (httpx.HTTPError, OSError) as e:
+                # Not retried before the next revalidation is due
+                self._checked_at = time.monotonic()
+                if self._resolved is None:
+                    raise
+                # Keep serving the cached spec while the API is unreachable
+                logger.warning(f"Using the cached OpenAPI spec of {self.plugin_name}: {e}")
+        if self._resolved is None:
+            raise ConnectionError(f"The OpenAPI spec of {self.plugin_name} could not be loaded from {self.spec_url}")
+        loop = asyncio.get_running_loop()
+        client = self._client()
+        spec_hash, _, plugin = self._by_loop[loop]
+        if plugin is None or spec_hash != self._hash:
+            settings = OpenAPIFunctionExecutionParameters(
+                http_client=client,
+                server_url_override=self.base_url,
+                # The API is trusted even on a private address such as localhost
+                server_url_validation_allowed_base_urls=[self.base_url],
+            )
+            plugin = KernelPlugin.from_openapi(
+                plugin_name=self.plugin_name,
+                openapi_parsed_spec=self._resolved,
+                execution_settings=settings,
+                description=self.description,
+            )
+            self.compiles += 1
+            self._by_loop[loop] = (self._hash, client, plugin)
+        return plugin
+
+    async def add_to(self, kernel):
+        """Add (or, after a spec change, replace) the plugin on a kernel; a no-op when it is current."""
+        plugin = await self.plugin()
+        if kernel.plugins.get(self.plugin_name) is not plugin:
+            kernel.plugins[self.plugin_name] = plugin
+        return kernel
+
+    async def aclose(self):
+        """Close the HTTP client of the running event loop."""
+        entry = self._by_loop.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
+
+
+workitems_api = OpenApiPluginLoader(
+    "workitems",
+    WORKITEMS_API_URL,
+    description="Create, read, update and delete work items in the backlog.",
+)
@@ -0,0 +1,233 @@
+"""
+Orchestration service for concurrent multi-agent sessions.
+
+One long-lived event loop, running on a single background thread, drives every
+``AgentGroupChat`` conversation for the process, so the pooled connections in
+``services.py`` stay warm and no thread is added per request. Runs are limited per
+session and globally, and each deployment has a tokens-per-minute budget that
+delays the next agent turn once it is spent.
+
+Callers on other threads (the Streamlit script thread) use ``submit`` to start a
+run, then ``poll`` or ``stream`` to read its events as they are produced.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from history_reducer import estimate_tokens
+from multi_agent import stream_multi_agent
+from services import get_chat_service
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", "16"))
+MAX_RUNS_PER_SESSION = int(os.getenv("MAX_RUNS_PER_SESSION", "1"))
+# 0 disables the budget
+TOKENS_PER_MINUTE = int(os.getenv("AZURE_OPENAI_TOKENS_PER_MINUTE", "0"))
+# Finished runs are kept this long so late pollers can still read them
+RUN_RETENTION_SECONDS = 600
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+FINISHED_STATES = (DONE, ERROR)
+
+
+class TokenBudget:
+    """
+    Tokens-per-minute bucket for one deployment.
+
+    Usage is only known after a turn, so it is charged afterwards and the balance may go
+    negative; the next turn of any session on the deployment waits until it is paid back.
+    Only touched from the orchestrator's event loop, so it needs no lock.
+    """
+
+    def __init__(self, tokens_per_minute):
+        self.tokens_per_minute = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._last_service_total = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.tokens_per_minute, self.tokens + (now - self._updated) * self.tokens_per_minute / 60)
+        self._updated = now
+
+    def charge(self, tokens):
+        self._refill()
+        self.tokens -= tokens
+
+    def charge_service_usage(self, service, fallback):
+        """Charge the tokens the service reported since the last call, or the fallback estimate."""
+        total = getattr(service, "total_tokens", 0) or 0
+        used = total - self._last_service_total if self._last_service_total is not None else 0
+        self._last_service_total = total
+        self.charge(used if used > 0 else fallback)
+
+    async def wait(self):
+        """Wait until the balance is no longer negative."""
+        self._refill()
+        while self.tokens < 0:
+            await asyncio.sleep(-self.tokens * 60 / self.tokens_per_minute)
+            self._refill()
+
+
+@dataclass
+class _Run:
+    run_id: str
+    session_id: str
+    user_input: str
+    stream_tokens: bool
+    status: str = QUEUED
+    error: str = None
+    events: list = field(default_factory=list)
+    finished_at: float = None
+    condition: threading.Condition = field(default_factory=threading.Condition)
+
+    def add_event(self, event):
+        with self.condition:
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def set_status(self, status, error=None):
+        with self.condition:
+            self.status = status
+            self.error = error
+            if status in FINISHED_STATES:
+                self.finished_at = time.monotonic()
+            self.condition.notify_all()
+
+
+class AgentOrchestrator:
+    """Runs many multi-agent conversations concurrently on one event loop."""
+
+    def __init__(self, max_concurrent_runs=MAX_CONCURRENT_RUNS, max_runs_per_session=MAX_RUNS_PER_SESSION,
+                 tokens_per_minute=TOKENS_PER_MINUTE, runner=stream_multi_agent,
+                 run_retention_seconds=RUN_RETENTION_SECONDS):
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_runs_per_session = max_runs_per_session
+        self.tokens_per_minute = tokens_per_minute
+        self.run_retention_seconds = run_retention_seconds
+        self._runner = runner
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._runs = {}
+        self._loop = None
+        self._thread = None
+        # Created on the loop thread
+        self._global_limit = None
+        self._session_limits = {}
+        self._session_counts = {}
+        self._budgets = {}
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="agent-orchestrator",
+                                                daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _run_loop(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._global_limit = asyncio.Semaphore(self.max_concurrent_runs)
+        self._loop = loop
+        ready.set()
+        loop.run_forever()
+
+    def _prune_finished(self):
+        cutoff = time.monotonic() - self.run_retention_seconds
+        for run_id in [run_id for run_id, run in self._runs.items()
+                       if run.finished_at is not None and run.finished_at < cutoff]:
+            del self._runs[run_id]
+
+    def submit(self, session_id, user_input, stream_tokens=True):
+        """Start a run for the session and return its run id."""
+        loop = self._ensure_loop()
+        with self._lock:
+            self._prune_finished()
+            run = _Run(f"run-{next(self._ids)}", session_id, user_input, stream_tokens)
+            self._runs[run.run_id] = run
+        asyncio.run_coroutine_threadsafe(self._execute(run), loop)
+        return run.run_id
+
+    def call(self, coro, timeout=None):
+        """Run a coroutine on the orchestrator loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+    def poll(self, run_id, cursor=0):
+        """Return the run's status and the events after cursor, with the cursor to pass next time."""
+        run = self._get_run(run_id)
+        with run.condition:
+            events = run.events[cursor:]
+            return {"status": run.status, "error": run.error, "events": events, "cursor": cursor + len(events)}
+
+    def stream(self, run_id, cursor=0):
+        """Yield the run's events as they arrive (blocking); raise RuntimeError if the run fails."""
+        run = self._get_run(run_id)
+        while True:
+            with run.condition:
+                while cursor >= len(run.events) and run.status not in FINISHED_STATES:
+                    run.condition.wait()
+                events = run.events[cursor:]
+                status, error = run.status, run.error
+            cursor += len(events)
+            yield from events
+            if status in FINISHED_STATES:
+                if status == ERROR:
+                    raise RuntimeError(error)
+                return
+
+    def _get_run(self, run_id):
+        with self._lock:
+            # Pollers come back often, so expired runs go even when nothing new is submitted
+            self._prune_finished()
+            run = self._runs.get(run_id)
+        if run is None:
+            raise KeyError(f"Unknown run: {run_id}")
+        return run
+
+    def _budget_for(self, deployment_name):
+        if not self.tokens_per_minute:
+            return None
+        if deployment_name not in self._budgets:
+            self._budgets[deployment_name] = TokenBudget(self.tokens_per_minute)
+        return self._budgets[deployment_name]
+
+    async def _execute(self, run):
+        session_limit = self._session_limits.get(run.session_id)
+        if session_limit is None:
+            session_limit = self._session_limits[run.session_id] = asyncio.Semaphore(self.max_runs_per_session)
+        self._session_counts[run.session_id] = self._session_counts.get(run.session_id, 0) + 1
+        try:
+            async with session_limit, self._global_limit:
+                run.set_status(RUNNING)
+                deployment_name = os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME")
+                budget = self._budget_for(deployment_name)
+                service = get_chat_service(deployment_name) if budget else None
+                async for event in self._runner(run.user_input, stream_tokens=run.stream_tokens):
+                    run.add_event(event)
+                    if budget is not None and event["type"] == "message":
+                        budget.charge_service_usage(service, estimate_tokens(event["content"]))
+                        await budget.wait()
+            run.set_status(DONE)
+        except Exception as e:
+            logger.error(f"Run {run.run_id} failed: {e}")
+            run.set_status(ERROR, str(e))
+        finally:
+            self._session_counts[run.session_id] -= 1
+            if not self._session_counts[run.session_id]:
+                del self._session_counts[run.session_id]
+                del self._session_limits[run.session_id]
+
+
+orchestrator = AgentOrchestrator()
@@ -0,0 +1,145 @@
+"""
+Lazy plugin registry for the chat kernel.
+
+Plugins are registered by import path (``"package.module:Factory"``) and are only
+imported and constructed the first time the model calls one of their functions.
+The kernel still has to advertise every function up front, so their metadata (names,
+descriptions, parameter schemas) is kept in a manifest file, keyed by a hash of the
+plugin's source file. After the first run a cold start reads the manifest instead of
+importing the plugins; a plugin whose source changed is imported once to refresh it.
+"""
+
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+from pydantic import Field
+from semantic_kernel.functions import KernelFunction, KernelPlugin
+from semantic_kernel.functions.kernel_function_metadata import KernelFunctionMetadata
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_MANIFEST_PATH = os.getenv("PLUGIN_MANIFEST_PATH", str(Path(__file__).parent / ".plugin_manifest.json"))
+
+
+def _import_target(target):
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _source_fingerprint(target):
+    """Hash of the source file of the target's module, found without importing it."""
+    try:
+        spec = importlib.util.find_spec(target.partition(":")[0])
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.origin or not os.path.exists(spec.origin):
+        return None
+    with open(spec.origin, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+class LazyKernelFunction(KernelFunction):
+    """Stands in for a plugin function and loads the real one on first invocation."""
+
+    loader: Any = Field(default=None, exclude=True)
+
+    async def _invoke_internal(self, context):
+        await self.loader()._invoke_internal(context)
+
+    async def _invoke_internal_stream(self, context):
+        await self.loader()._invoke_internal_stream(context)
+
+
+class PluginRegistry:
+    """Registered plugins by name; ``add_to(kernel)`` adds them as lazy plugins."""
+
+    def __init__(self, manifest_path=PLUGIN_MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self.loads = 0
+        self._plugins = {}
+        self._loaded = {}
+        self._manifest = None
+        self._lock = threading.RLock()
+
+    def register(self, name, target, *args, **kwargs):
+        """Register a plugin: target is "module:factory", called with args and kwargs when first used."""
+        with self._lock:
+            self._plugins[name] = (target, args, kwargs)
+
+    def load(self, name):
+        """Import and construct a plugin (once) and return it as a KernelPlugin."""
+        with self._lock:
+            plugin = self._loaded.get(name)
+            if plugin is None:
+                target, args, kwargs = self._plugins[name]
+                logger.info(f"Loading plugin {name} from {target}")
+                plugin = KernelPlugin.from_object(name, _import_target(target)(*args, **kwargs))
+                self._loaded[name] = plugin
+                self.loads += 1
+            return plugin
+
+    def _read_manifest(self):
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path, encoding="utf-8") as file:
+                    self._manifest = json.load(file)
+            except (OSError, ValueError):
+                self._manifest = {}
+        return self._manifest
+
+    def _write_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(self._manifest, file)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            logger.warning(f"Could not write plugin manifest {self.manifest_path}: {e}")
+
+    def metadata(self, name):
+        """Return the KernelFunctionMetadata of a plugin's functions, from the manifest when current."""
+        with self._lock:
+            target, args, kwargs = self._plugins[name]
+            manifest = self._read_manifest()
+            fingerprint = _source_fingerprint(target)
+            entry = manifest.get(name)
+            if fingerprint and entry and entry["target"] == target and entry["fingerprint"] == fingerprint:
+                return [KernelFunctionMetadata.model_validate(function) for function in entry["functions"]]
+            functions = [function.metadata for function in self.load(name).functions.values()]
+            if fingerprint:
+                manifest[name] = {
+                    "target": target,
+                    "fingerprint": fingerprint,
+                    "functions": [function.model_dump(mode="json", by_alias=True) for function in functions],
+                }
+                self._write_manifest()
+            return functions
+
+    def lazy_plugin(self, name):
+        """Return a KernelPlugin whose functions load the real plugin when first called."""
+        def loader_for(function_name):
+            return lambda: self.load(name).functions[function_name]
+
+        functions = [
+            LazyKernelFunction(metadata=metadata, loader=loader_for(metadata.name))
+            for metadata in self.metadata(name)
+        ]
+        return KernelPlugin(name=name, functions=functions)
+
+    def add_to(self, kernel):
+        """Add every registered plugin to a kernel without importing it."""
+        with self._lock:
+            names = list(self._plugins)
+        for name in names:
+            kernel.add_plugin(self.lazy_plugin(name))
+        return kernel
+
+
+plugins = PluginRegistry()
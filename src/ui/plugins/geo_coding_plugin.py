@@ -1,20 +1,134 @@
-from typing import TypedDict, Annotated, Optional  
-import requests  
-import asyncio  
-from semantic_kernel.functions import kernel_function
+"""
+Geocoding plugin backed by geocode.maps.co.
+
+Lookups go through a pooled ``httpx.AsyncClient`` (one per event loop) with a timeout,
+so they never block the loop the agents run on. Results are cached by normalised
+location in a TTL/LRU cache from ``response_cache.py`` (in memory, or on disk with
+``GEOCODING_CACHE=disk``, read and written on a worker thread), concurrent lookups of the same location share one request,
+and ``geocode_many`` resolves a batch of locations concurrently. Requests are paced by
+the shared adaptive rate limiter (``rate_limiter.py``), which retries 429s.
+"""
+
+import asyncio
+import logging
 import os
+import weakref
+from pathlib import Path
+from typing import Annotated
+
+import httpx
 from dotenv import load_dotenv
+from semantic_kernel.functions import kernel_function
+
+from rate_limiter import RateLimitedTransport, limiters
+from response_cache import DiskBackend, MemoryBackend
 
 load_dotenv(override=True)
 
-class GeoPlugin:  
+logger = logging.getLogger(__name__)
+
+GEOCODING_URL = os.getenv("GEOCODING_URL", "https://geocode.maps.co/search")
+GEOCODING_TIMEOUT = float(os.getenv("GEOCODING_TIMEOUT", "10"))
+GEOCODING_MAX_CONNECTIONS = int(os.getenv("GEOCODING_MAX_CONNECTIONS", "4"))
+# The free geocode.maps.co plan allows one request per second
+GEOCODING_REQUESTS_PER_SECOND = float(os.getenv("GEOCODING_REQUESTS_PER_SECOND", "1"))
+# "memory" or "disk"
+GEOCODING_CACHE = os.getenv("GEOCODING_CACHE", "memory").lower()
+GEOCODING_CACHE_TTL = float(os.getenv("GEOCODING_CACHE_TTL", str(7 * 24 * 3600)))
+GEOCODING_CACHE_PATH = os.getenv("GEOCODING_CACHE_PATH", str(Path(__file__).parent.parent / ".geocode_cache.sqlite3"))
+
+
+def normalize_location(location):
+    return " ".join(location.casefold().split())
+
+
+def create_geocode_cache(kind=GEOCODING_CACHE):
+    return DiskBackend(GEOCODING_CACHE_PATH) if kind == "disk" else MemoryBackend(max_entries=10000)
+
+
+class GeoPlugin:
+
+    def __init__(self, url=GEOCODING_URL, api_key=None, cache=None, ttl=GEOCODING_CACHE_TTL,
+                 transport=None):
+        self.url = url
+        limiters.configure(httpx.URL(url).host, rate=GEOCODING_REQUESTS_PER_SECOND,
+                           max_concurrency=GEOCODING_MAX_CONNECTIONS)
+        self.api_key = api_key if api_key is not None else os.getenv("GEOCODING_API_KEY")
+        self.cache = cache if cache is not None else create_geocode_cache()
+        self.ttl = ttl
+        self.transport = transport
+        self.requests = 0
+        self._clients = weakref.WeakKeyDictionary()
+        # normalised location -> task of the request in flight
+        self._in_flight = {}
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=GEOCODING_MAX_CONNECTIONS,
+                                  max_keepalive_connections=GEOCODING_MAX_CONNECTIONS)
+            transport = self.transport or RateLimitedTransport(limits=limits)
+            client = httpx.AsyncClient(timeout=httpx.Timeout(GEOCODING_TIMEOUT, pool=None), transport=transport)
+            self._clients[loop] = client
+        return client
+
+    async def _cache(self, method, *args):
+        # Disk lookups run on a worker thread so they do not hold up other sessions on the loop
+        if self.cache.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def geocode(self, location):
+        """Return {"lat": ..., "lon": ...} for a location, or None when it is not found."""
+        key = normalize_location(location)
+        task = self._in_flight.get(key)
+        if task is None:
+            cached = await self._cache(self.cache.get, key, self.ttl)
+            if cached is not None:
+                return cached or None
+            # Another lookup may have started while the cache was read
+            task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: one cancelled caller must not cancel the lookup for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key):
+        logger.info(f"lat/long request location: {key}")
+        self.requests += 1
+        response = await self._client().get(self.url, params={"q": key, "api_key": self.api_key})
+        response.raise_for_status()
+        data = response.json()
+        position = {"lat": data[0]["lat"], "lon": data[0]["lon"]} if data else {}
+        # Misses are cached too, as {}
+        await self._cache(self.cache.set, key, position)
+        return position or None
+
+    async def geocode_many(self, locations):
+        """Geocode many locations concurrently; returns results in the same order."""
+        return await asyncio.gather(*(self.geocode(location) for location in locations))
+
+    async def aclose(self):
+        """Close the HTTP client of the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
 
     @kernel_function(description="Gets the latitude and longitude for a location.")
-    async def get_latitude_longitude(self, location:Annotated[str, "The name of the location"]):  
-        print(f"lat/long request location: {location}")
-        url = f"https://geocode.maps.co/search?q={location}&api_key={os.getenv('GEOCODING_API_KEY')}"  
-        response = requests.get(url) 
-        data = response.json() 
-        position = data[0]
+    async def get_latitude_longitude(self, location:Annotated[str, "The name of the location"]):
+        position = await self.geocode(location)
+        if position is None:
+            return f"No coordinates found for {location}"
         return f"Latitude: {position['lat']}, Longitude: {position['lon']}"
-    
\ No newline at end of file
+
+    @kernel_function(description="Gets the latitude and longitude for several locations at once.")
+    async def get_latitudes_longitudes(self, locations:Annotated[list[str], "The names of the locations"]):
+        positions = await self.geocode_many(locations)
+        return "\n".join(
+            f"{location}: Latitude: {position['lat']}, Longitude: {position['lon']}" if position
+            else f"{location}: No coordinates found"
+            for location, position in zip(locations, positions)
+        )
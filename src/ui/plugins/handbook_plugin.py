@@ -0,0 +1,102 @@
+"""
+Employee handbook search over a local vector index.
+
+``create_handbook_plugin`` is the factory registered in ``chat.py``. It opens the index
+saved in ``HANDBOOK_INDEX_PATH`` (memory-mapped, so startup does not read the vectors),
+and the first search brings it in line with the Markdown and text files in
+``HANDBOOK_DIR`` through ``HandbookIndexer``: only new or edited chunks are embedded,
+and the index is saved again when anything changed. Searches go through a
+``HybridRetriever`` whose BM25 keyword index is saved next to the vectors.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Annotated, Optional
+
+from semantic_kernel.functions import kernel_function
+
+# The retrieval modules import each other by module name
+sys.path.append(str(Path(__file__).parent.parent / "retrieval"))
+
+from hybrid import BM25Index, HybridRetriever
+from ingest import HandbookIndexer, load_documents
+from services import EMBEDDING_DIMENSIONS, get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+HANDBOOK_DIR = os.getenv("HANDBOOK_DIR", str(Path(__file__).parent.parent / "data" / "handbook"))
+HANDBOOK_INDEX_PATH = os.getenv("HANDBOOK_INDEX_PATH", str(Path(__file__).parent.parent / ".handbook_index"))
+
+
+async def embed_with_service(texts):
+    """Embed texts with the shared, cached embedding service of the running event loop."""
+    return await get_embedding_service().generate_embeddings(texts)
+
+
+class HandbookPlugin:
+    """Employee handbook search over a local index (see retrieval/vector_index.py and retrieval/hybrid.py)."""
+
+    def __init__(self, index, embed, retriever=None, prepare=None):
+        self.index = index
+        self.embed = embed
+        # A HybridRetriever adds keyword matching for exact policy terms and acronyms
+        self.retriever = retriever
+        # Awaited once, before the first search
+        self.prepare = prepare
+        self._prepared = False
+        self._prepare_lock = None
+
+    async def _ensure_prepared(self):
+        if self._prepared or self.prepare is None:
+            return
+        if self._prepare_lock is None:
+            self._prepare_lock = asyncio.Lock()
+        async with self._prepare_lock:
+            if not self._prepared:
+                await self.prepare()
+                self._prepared = True
+
+    @kernel_function(description="Searches the employee handbook and returns the most relevant passages.")
+    async def search_handbook(
+        self,
+        query: Annotated[str, "What to look for in the handbook"],
+        top: Annotated[int, "Number of passages to return"] = 3,
+        filepath: Annotated[Optional[str], "Only search this handbook file"] = None,
+    ):
+        await self._ensure_prepared()
+        if self.retriever is not None:
+            results = await self.retriever.search(query, k=top, filters={"filepath": filepath})
+        else:
+            vector = (await self.embed([query]))[0]
+            results = self.index.search(vector, k=top, filters={"filepath": filepath})
+        if not results:
+            return "No handbook passages found."
+        return "\n\n".join(
+            f"[{record['title'] or record['filepath']}] ({score:.2f})\n{record['content']}"
+            for score, record in results
+        )
+
+
+def create_handbook_plugin(directory=HANDBOOK_DIR, index_path=HANDBOOK_INDEX_PATH, embed=embed_with_service,
+                           dimensions=EMBEDDING_DIMENSIONS):
+    """Return a HandbookPlugin over the saved index, synced with the documents in directory on first search."""
+    indexer = HandbookIndexer.load(index_path, embed, dimensions=dimensions)
+    keywords_saved = Path(index_path, "meta.json").exists() and Path(index_path, "bm25.json").exists()
+    retriever = HybridRetriever(indexer.index, embed,
+                                keyword_index=BM25Index.load(index_path) if keywords_saved else None)
+
+    async def sync():
+        if not Path(directory).is_dir():
+            logger.warning(f"Handbook directory {directory} not found; searching the saved index as is")
+            return
+        version = indexer.index.version
+        stats = await indexer.reindex(load_documents(directory))
+        logger.info(f"Handbook index: {stats}")
+        if indexer.index.version != version or not keywords_saved:
+            indexer.save(index_path)
+            retriever.save(index_path)
+
+    return HandbookPlugin(indexer.index, embed, retriever=retriever, prepare=sync)
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from geo_coding_plugin import GeoPlugin
+from response_cache import DiskBackend
+
+PLACES = {"seattle": {"lat": "47.6", "lon": "-122.3"}, "paris": {"lat": "48.8", "lon": "2.3"}}
+
+
+class StubGeocoder(BaseHTTPRequestHandler):
+    queries = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)["q"][0]
+        self.queries.append(query)
+        time.sleep(0.05)
+        body = json.dumps([PLACES[query]] if query in PLACES else []).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_lookups_are_coalesced_cached_and_persisted(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGeocoder)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/search"
+    try:
+        plugin = GeoPlugin(url, api_key="test", cache=DiskBackend(tmp_path / "geo.sqlite3"))
+
+        async def run():
+            results = await plugin.geocode_many(["Seattle", " seattle ", "Paris", "Atlantis"])
+            again = await plugin.get_latitude_longitude("SEATTLE")
+            missing = await plugin.get_latitude_longitude("atlantis")
+            await plugin.aclose()
+            return results, again, missing
+
+        results, again, missing = asyncio.run(run())
+        assert results == [PLACES["seattle"], PLACES["seattle"], PLACES["paris"], None]
+        assert again == "Latitude: 47.6, Longitude: -122.3" and missing == "No coordinates found for atlantis"
+        assert sorted(StubGeocoder.queries) == ["atlantis", "paris", "seattle"]
+
+        restarted = GeoPlugin(url, api_key="test", cache=DiskBackend(tmp_path / "geo.sqlite3"))
+        assert asyncio.run(restarted.geocode("Paris")) == PLACES["paris"] and restarted.requests == 0
+    finally:
+        server.shutdown()
+
+
+def test_disk_cache_reads_do_not_block_the_event_loop(tmp_path):
+    cache = DiskBackend(tmp_path / "geo.sqlite3")
+    cache.set("paris", PLACES["paris"])
+    get = cache.get
+
+    def slow_get(key, ttl):
+        time.sleep(0.2)
+        return get(key, ttl)
+
+    cache.get = slow_get
+    plugin = GeoPlugin("http://127.0.0.1:9/search", api_key="test", cache=cache)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    async def run():
+        return (await asyncio.gather(plugin.geocode("Paris"), ticker()))[0]
+
+    assert asyncio.run(run()) == PLACES["paris"]
+    assert ticks[-1] - ticks[0] < 0.18 and plugin.requests == 0
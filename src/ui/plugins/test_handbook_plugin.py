@@ -0,0 +1,64 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from handbook_plugin import create_handbook_plugin
+import hybrid
+from ingest import HandbookIndexer, load_documents
+from vector_index import FakeEmbedder, LocalVectorIndex
+
+
+class CountingEmbedder(FakeEmbedder):
+    def __init__(self, dimensions):
+        super().__init__(dimensions)
+        self.texts = 0
+
+    async def __call__(self, texts):
+        self.texts += len(texts)
+        return await super().__call__(texts)
+
+
+def test_first_search_builds_the_index_and_restarts_reuse_it(tmp_path, monkeypatch):
+    handbook = tmp_path / "handbook"
+    handbook.mkdir()
+    (handbook / "vacation_policy.md").write_text("Employees get 25 days of paid vacation leave per year.")
+    (handbook / "expenses.md").write_text("Submit expense reports with receipts within 30 days.")
+    (handbook / "security.md").write_text("Laptops must use full disk encryption and MFA for remote access.")
+    index_path = tmp_path / "index"
+
+    embed = CountingEmbedder(64)
+    plugin = create_handbook_plugin(handbook, index_path, embed=embed, dimensions=64)
+    answer = asyncio.run(plugin.search_handbook("paid vacation leave", top=1))
+    assert answer.startswith("[Vacation Policy]") and "25 days" in answer
+    assert (index_path / "manifest.json").exists() and (index_path / "bm25.json").exists()
+    embedded = embed.texts
+
+    # A restart opens the saved vector and keyword indexes; only the query is embedded
+    monkeypatch.setattr(hybrid.BM25Index, "build", None)
+    embed = CountingEmbedder(64)
+    plugin = create_handbook_plugin(handbook, index_path, embed=embed, dimensions=64)
+    answer = asyncio.run(plugin.search_handbook("expense receipts", top=1))
+    assert answer.startswith("[Expenses]")
+    # Acronyms are found by keyword even when the vectors do not match them
+    answer = asyncio.run(plugin.search_handbook("MFA", top=1))
+    assert answer.startswith("[Security]")
+    assert embedded == 3 + 1 and embed.texts == 2
+
+
+def test_index_saved_without_keywords_is_saved_again_in_place(tmp_path):
+    handbook = tmp_path / "handbook"
+    handbook.mkdir()
+    (handbook / "vacation_policy.md").write_text("Employees get 25 days of paid vacation leave per year.")
+    index_path = tmp_path / "index"
+    indexer = HandbookIndexer(LocalVectorIndex(64), FakeEmbedder(64))
+    asyncio.run(indexer.reindex(load_documents(handbook)))
+    indexer.save(index_path)
+
+    # The first search saves the memory-mapped index over itself, adding bm25.json
+    plugin = create_handbook_plugin(handbook, index_path, embed=FakeEmbedder(64), dimensions=64)
+    assert asyncio.run(plugin.search_handbook("vacation", top=1)).startswith("[Vacation Policy]")
+    assert (index_path / "bm25.json").exists()
+    assert len(LocalVectorIndex.load(index_path)) == 1
@@ -0,0 +1,318 @@
+"""
+Durable background queue for publishing approved artifacts.
+
+Approval hands the artifacts to a local SQLite-backed job queue and returns at once.
+A single worker thread publishes due jobs oldest-first, so pushes to one branch run in
+order. All jobs waiting on a branch go out as one commit. A failed push is retried with
+jittered exponential backoff until ``max_attempts`` is reached; failures that would
+repeat every time, such as a path outside the repository, fail at once.
+
+Several processes may share one queue file (the Streamlit app and the demo scripts do).
+Jobs are claimed in an immediate transaction under a lease that the claiming worker
+renews while it publishes, so a job is only taken over, as after a crash, once its
+lease has expired.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from git_publisher import DEFAULT_COMMIT_MESSAGE, Artifact
+
+PENDING = "pending"
+RUNNING = "running"
+RETRYING = "retrying"
+PUBLISHED = "published"
+FAILED = "failed"
+FINISHED_STATES = (PUBLISHED, FAILED)
+
+DEFAULT_QUEUE_PATH = os.getenv("PUBLISH_QUEUE_PATH", str(Path(__file__).parent / ".publish_queue.sqlite3"))
+# How long a claimed job stays with its worker without a heartbeat
+LEASE_SECONDS = float(os.getenv("PUBLISH_LEASE_SECONDS", "60"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS publish_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    branch TEXT NOT NULL,
+    artifacts TEXT NOT NULL,
+    extra_paths TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    error TEXT,
+    commit_sha TEXT,
+    timings TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS publish_jobs_open ON publish_jobs (status, branch, id);
+"""
+# Columns added after the first release, for queue files created before them
+_ADDED_COLUMNS = {"owner": "TEXT", "lease_until": "REAL"}
+
+
+class PublishQueue:
+    """SQLite-backed job queue with one worker thread that publishes through a GitPublisher."""
+
+    def __init__(self, publisher, path=DEFAULT_QUEUE_PATH, max_attempts=5, base_delay=2.0, max_delay=300.0,
+                 autostart=True, lease_seconds=LEASE_SECONDS):
+        self.publisher = publisher
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.autostart = autostart
+        self.lease_seconds = lease_seconds
+        # Identifies this queue's claims among the processes sharing the file
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._worker = None
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+            db.execute("BEGIN IMMEDIATE")
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(publish_jobs)")}
+            for column, column_type in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    db.execute(f"ALTER TABLE publish_jobs ADD COLUMN {column} {column_type}")
+            # Running jobs are left to their worker; they are taken over once their lease expires
+            has_open_jobs = db.execute(
+                "SELECT 1 FROM publish_jobs WHERE status IN (?, ?, ?) LIMIT 1", (PENDING, RETRYING, RUNNING)
+            ).fetchone()
+        if has_open_jobs and autostart:
+            self.start()
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection and run one transaction on it."""
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def enqueue(self, artifacts, extra_paths=(), branch=None):
+        """Queue artifacts (and existing files to publish with them) and return the job id."""
+        now = time.time()
+        payload = json.dumps([{"path": str(Path(a.path).resolve()), "content": a.content} for a in artifacts])
+        extra = json.dumps([str(Path(path).resolve()) for path in extra_paths])
+        with self._lock, self._connect() as db:
+            job_id = db.execute(
+                "INSERT INTO publish_jobs (branch, artifacts, extra_paths, status, next_attempt_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (branch or self.publisher.branch, payload, extra, PENDING, now, now, now),
+            ).lastrowid
+        if self.autostart:
+            self.start()
+        self._wakeup.set()
+        return job_id
+
+    def status(self, job_id):
+        """Return the job as a dict, or None if it does not exist."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, branch, status, attempts, next_attempt_at, error, commit_sha, timings "
+                "FROM publish_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["timings"] = json.loads(job["timings"]) if job["timings"] else {}
+        return job
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job is published or failed, or the timeout expires; return its status."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.status(job_id)
+            if job is None or job["status"] in FINISHED_STATES:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(0.2)
+
+    def start(self):
+        """Start the worker thread if it is not running."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping = False
+                self._worker = threading.Thread(target=self._run, name="publish-queue", daemon=True)
+                self._worker.start()
+
+    def stop(self, timeout=None):
+        """Stop the worker after the current batch."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def drain(self, timeout=None):
+        """Wait until no job is pending or running, or the timeout expires."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            with self._connect() as db:
+                due = db.execute(
+                    "SELECT COUNT(*) FROM publish_jobs WHERE status IN (?, ?) OR (status = ? AND next_attempt_at <= ?)",
+                    (PENDING, RUNNING, RETRYING, time.time()),
+                ).fetchone()[0]
+            if not due:
+                return True
+            time.sleep(0.2)
+        return False
+
+    def _claim_batch(self):
+        """
+        Claim every open job of one branch whose oldest open job is due.
+
+        Returns (branch, rows, None), or (None, [], next_due) when nothing is due yet.
+        A branch waits on its oldest job, so later approvals never overtake it, and a
+        branch whose oldest job is running waits until that job's lease expires.
+        """
+        now = time.time()
+        with self._lock, self._connect() as db:
+            # Taken before reading, so no other process can claim the same jobs in between
+            db.execute("BEGIN IMMEDIATE")
+            heads = db.execute(
+                "SELECT j.branch, CASE WHEN j.status = ? THEN COALESCE(j.lease_until, 0) "
+                "ELSE j.next_attempt_at END AS due_at FROM publish_jobs j JOIN ("
+                "SELECT MIN(id) AS head_id FROM publish_jobs WHERE status IN (?, ?, ?) GROUP BY branch"
+                ") h ON j.id = h.head_id ORDER BY j.id",
+                (RUNNING, PENDING, RETRYING, RUNNING),
+            ).fetchall()
+            due = next((head for head in heads if head["due_at"] <= now), None)
+            if due is None:
+                return None, [], min((head["due_at"] for head in heads), default=None)
+            rows = db.execute(
+                "SELECT id, artifacts, extra_paths, attempts FROM publish_jobs "
+                "WHERE status IN (?, ?, ?) AND branch = ? ORDER BY id",
+                (PENDING, RETRYING, RUNNING, due["branch"]),
+            ).fetchall()
+            db.executemany(
+                "UPDATE publish_jobs SET status = ?, owner = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                [(RUNNING, self.owner, now + self.lease_seconds, now, row["id"]) for row in rows],
+            )
+        return due["branch"], rows, None
+
+    @contextmanager
+    def _heartbeat(self):
+        """Renew the lease of this queue's running jobs until the block ends."""
+        done = threading.Event()
+
+        def renew():
+            while not done.wait(self.lease_seconds / 3):
+                with self._connect() as db:
+                    db.execute(
+                        "UPDATE publish_jobs SET lease_until = ? WHERE owner = ? AND status = ?",
+                        (time.time() + self.lease_seconds, self.owner, RUNNING),
+                    )
+
+        thread = threading.Thread(target=renew, name="publish-queue-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+
+    def _finish_batch(self, rows, result):
+        now = time.time()
+        timings = json.dumps(result.timings)
+        updates = []
+        for row in rows:
+            attempts = row["attempts"] + 1
+            if result.success:
+                updates.append((PUBLISHED, attempts, now, None, result.commit, timings, now, row["id"], self.owner))
+            elif attempts >= self.max_attempts or not result.retryable:
+                updates.append((FAILED, attempts, now, result.error, result.commit, timings, now, row["id"],
+                                self.owner))
+            else:
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+                retry_at = now + delay * random.uniform(0.5, 1.0)
+                updates.append((RETRYING, attempts, retry_at, result.error, result.commit, timings, now, row["id"],
+                                self.owner))
+        with self._lock, self._connect() as db:
+            # A job whose lease was taken over belongs to the other worker now
+            db.executemany(
+                "UPDATE publish_jobs SET status = ?, attempts = ?, next_attempt_at = ?, error = ?, "
+                "commit_sha = ?, timings = ?, updated_at = ?, owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND owner = ?",
+                updates,
+            )
+
+    def _fail_batch(self, rows, error):
+        """Mark claimed jobs failed without retrying them."""
+        now = time.time()
+        with self._lock, self._connect() as db:
+            db.executemany(
+                "UPDATE publish_jobs SET status = ?, attempts = attempts + 1, error = ?, updated_at = ?, "
+                "owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?",
+                [(FAILED, error, now, row["id"], self.owner) for row in rows],
+            )
+
+    def _run(self):
+        # The only worker: no error may end it
+        while not self._stopping:
+            try:
+                self._run_once()
+            except Exception as e:
+                print(f"Publish queue error: {type(e).__name__}: {e}")
+                self._wakeup.wait(self.base_delay)
+                self._wakeup.clear()
+
+    def _run_once(self):
+        branch, rows, next_due = self._claim_batch()
+        if not rows:
+            timeout = None if next_due is None else max(0.0, next_due - time.time())
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+            return
+
+        try:
+            # Later approvals of the same path overwrite earlier ones, in queue order
+            artifacts = {}
+            extra_paths = {}
+            for row in rows:
+                for artifact in json.loads(row["artifacts"]):
+                    artifacts[artifact["path"]] = Artifact(artifact["path"], artifact["content"])
+                extra_paths.update(dict.fromkeys(json.loads(row["extra_paths"])))
+            message = DEFAULT_COMMIT_MESSAGE if len(rows) == 1 else f"{DEFAULT_COMMIT_MESSAGE} ({len(rows)} approvals)"
+            with self._heartbeat():
+                result = self.publisher.publish_sync(list(artifacts.values()), message, list(extra_paths), branch)
+        except Exception as e:
+            # Not a git failure, so retrying would not help
+            error = f"{type(e).__name__}: {e}"
+            self._fail_batch(rows, error)
+            print(f"Publish jobs {[row['id'] for row in rows]} failed: {error}")
+            return
+        self._finish_batch(rows, result)
+        print(f"Publish jobs {[row['id'] for row in rows]}: "
+              f"{'published' if result.success else result.error} ({result.timing_summary()})")
+
+
+def describe_job(job):
+    """Return a one-line, user-facing description of a job's publish status."""
+    if job is None:
+        return "Publish job not found"
+    if job["status"] == PUBLISHED:
+        timings = ", ".join(f"{step} {seconds * 1000:.0f} ms" for step, seconds in job["timings"].items())
+        return f"✅ Publish job #{job['id']} pushed to GitHub ({timings})"
+    if job["status"] == FAILED:
+        return f"❌ Publish job #{job['id']} failed after {job['attempts']} attempts: {job['error']}"
+    if job["status"] == RETRYING:
+        wait = max(0, job["next_attempt_at"] - time.time())
+        return f"🔁 Publish job #{job['id']} retrying in {wait:.0f}s (attempt {job['attempts'] + 1}): {job['error']}"
+    if job["status"] == RUNNING:
+        return f"⏳ Publish job #{job['id']} is pushing to GitHub..."
+    return f"🕒 Publish job #{job['id']} is queued"
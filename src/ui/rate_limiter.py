@@ -0,0 +1,290 @@
+"""
+Adaptive rate limiting for outbound HTTP calls.
+
+Every endpoint (host) gets an ``AdaptiveLimiter`` that combines:
+
+- a token bucket, so requests start no faster than the endpoint's quota;
+- an AIMD concurrency limit: each success raises the limit by 1/limit (about one per
+  round of requests) and a 429 halves it, so concurrency settles just under what the
+  endpoint accepts;
+- a pause for the whole endpoint when a 429/503 carries ``Retry-After``, so waiting
+  callers do not fire into a throttled endpoint.
+
+Callers waiting for a concurrency slot are queued and woken when a slot is released.
+
+``RateLimitedTransport`` applies the limiter of each request's host to an httpx client
+and retries throttled requests, 5xx responses, timeouts and connection errors with
+jittered exponential backoff (it replaces the OpenAI SDK's own retries). Limiter state is
+guarded by a thread lock, and a waiter is woken through its own event loop
+(``call_soon_threadsafe``), so one limiter serves clients on every event loop. ``limiters.metrics()`` reports the state of each.
+"""
+
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import httpx
+
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+# Failures where the request may not have reached the endpoint, or got no complete answer
+RETRY_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_BACKOFF", "0.5"))
+MAX_BACKOFF_SECONDS = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", "30"))
+
+
+def retry_after_seconds(response):
+    """Return the delay asked for by retry-after-ms or Retry-After (seconds or an HTTP date), or None."""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """Token bucket plus AIMD concurrency limit for one endpoint. rate=0 disables the bucket."""
+
+    def __init__(self, name, rate=0.0, burst=None, max_concurrency=8, min_concurrency=1):
+        self.name = name
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.waited_seconds = 0.0
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._last_decrease = 0.0
+        # Futures of callers waiting for a slot, oldest first
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, waiter):
+        """
+        Take a slot and a token if both are free and return 0. Otherwise return how long to
+        wait, or None after queueing waiter to be woken when a slot is released.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.in_flight >= int(self.limit):
+                self._waiters.append(waiter)
+                return None
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                if self._tokens < 1:
+                    return (1 - self._tokens) / self.rate
+                self._tokens -= 1
+            self.in_flight += 1
+            self.requests += 1
+            return 0.0
+
+    async def acquire(self):
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        while True:
+            waiter = loop.create_future()
+            wait = self._try_acquire(waiter)
+            if wait == 0:
+                break
+            if wait is not None:
+                await asyncio.sleep(wait)
+                continue
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        # Already woken: hand the free slot to the next waiter
+                        self._wake_waiters()
+                raise
+        with self._lock:
+            self.waited_seconds += time.monotonic() - started
+
+    def _wake_waiters(self):
+        """Wake one queued caller per free slot; called with the lock held."""
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            try:
+                waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                # Its event loop is closed
+                continue
+            free -= 1
+
+    def release(self, throttled=False, retry_after=None):
+        """
+        Return the slot; a throttled response halves the limit (at most once per second), and
+        a Retry-After, on a 429 or a 503, pauses the endpoint.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+                if now - self._last_decrease >= 1.0:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            self._wake_waiters()
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "waited_seconds": round(self.waited_seconds, 3),
+                "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 3),
+            }
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class LimiterRegistry:
+    """Process-wide limiters by endpoint name, created on first use."""
+
+    def __init__(self):
+        self._limiters = {}
+        self._settings = {}
+        self._lock = threading.Lock()
+
+    def configure(self, name, **settings):
+        """Set the AdaptiveLimiter settings for name, applying them to the limiter if it exists."""
+        with self._lock:
+            self._settings[name] = settings
+            limiter = self._limiters.get(name)
+        if limiter is not None:
+            with limiter._lock:
+                for setting, value in settings.items():
+                    setattr(limiter, setting, value)
+                limiter.limit = min(limiter.limit, limiter.max_concurrency)
+                limiter._wake_waiters()
+
+    def get(self, name):
+        with self._lock:
+            limiter = self._limiters.get(name)
+            if limiter is None:
+                limiter = AdaptiveLimiter(name, **self._settings.get(name, {}))
+                self._limiters[name] = limiter
+            return limiter
+
+    def metrics(self):
+        """Return the state of every limiter by name."""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.metrics() for limiter in limiters}
+
+
+limiters = LimiterRegistry()
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that gives the limiter slot back once the body is closed."""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """httpx transport that limits each host with its AdaptiveLimiter and retries failed requests with backoff."""
+
+    def __init__(self, transport=None, registry=None, max_retries=MAX_RETRIES, **transport_kwargs):
+        self._transport = transport or httpx.AsyncHTTPTransport(**transport_kwargs)
+        self._registry = registry or limiters
+        self.max_retries = max_retries
+
+    async def handle_async_request(self, request):
+        limiter = self._registry.get(request.url.host)
+        attempt = 0
+        while True:
+            await limiter.acquire()
+            try:
+                response = await self._transport.handle_async_request(request)
+            except RETRY_ERRORS:
+                limiter.release()
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                limiter.record_retry()
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+            except BaseException:
+                limiter.release()
+                raise
+            if response.status_code not in RETRY_STATUSES:
+                return httpx.Response(
+                    response.status_code,
+                    headers=response.headers,
+                    stream=_ReleasingStream(response.stream, limiter.release),
+                    extensions=response.extensions,
+                )
+            retry_after = retry_after_seconds(response)
+            limiter.release(throttled=response.status_code == 429, retry_after=retry_after)
+            if attempt >= self.max_retries:
+                return response
+            await response.aclose()
+            attempt += 1
+            limiter.record_retry()
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        """Full jitter, but never earlier than the server asked for."""
+        backoff = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempt - 1))
+        return max(retry_after or 0.0, random.uniform(0, backoff))
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,192 @@
+"""
+Response cache for chat completions.
+
+Keys are a SHA-256 hash of the prompt the agent sends: its system message (agent name
+and instructions), the message history and the execution settings. Lookups are exact
+by key, with an optional embedding-similarity fallback for near-identical prompts.
+Entries expire after a TTL and are evicted least-recently-used, in memory or in a
+SQLite file on disk; disk lookups run in a worker thread so they never block the event
+loop. Hit-rate metrics are kept per cache.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def make_key(*parts):
+    """Hash JSON-serialisable parts into a cache key."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU store."""
+
+    # Calls return at once, so they can run on the event loop
+    blocking = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if ttl is not None and time.time() - created_at > ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskBackend:
+    """SQLite-backed LRU store that survives restarts and is shared between processes."""
+
+    blocking = True
+
+    def __init__(self, path, max_entries=10000):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)")
+
+    def get(self, key, ttl):
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if ttl is not None and now - row[1] > ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ResponseCache:
+    """
+    Exact-match response cache with an optional embedding-similarity lookup.
+
+    ``embed`` is an async callable returning a vector for a text. When it is set,
+    a miss is retried against earlier prompts of the same namespace (same agent,
+    instructions and settings) whose conversation embeds within ``similarity_threshold``.
+    """
+
+    def __init__(self, backend=None, ttl=3600, embed=None, similarity_threshold=0.97, max_vectors=1024):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.max_vectors = max_vectors
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._vectors = {}
+        self._lock = threading.Lock()
+
+    async def _backend(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get(self, key, namespace=None, text=None):
+        """Return the cached value for key (or a similar prompt), or None."""
+        value = await self._backend(self.backend.get, key, self.ttl)
+        if value is not None:
+            self._count("hits")
+            return value
+        if self.embed is not None and namespace is not None and text:
+            similar_key = await self._find_similar(namespace, text)
+            if similar_key is not None:
+                value = await self._backend(self.backend.get, similar_key, self.ttl)
+                if value is not None:
+                    self._count("similar_hits")
+                    return value
+        self._count("misses")
+        return None
+
+    async def set(self, key, value, namespace=None, text=None):
+        await self._backend(self.backend.set, key, value)
+        if self.embed is not None and namespace is not None and text:
+            vector = _unit(await self.embed(text))
+            with self._lock:
+                vectors = self._vectors.setdefault(namespace, OrderedDict())
+                vectors[key] = vector
+                while len(vectors) > self.max_vectors:
+                    vectors.popitem(last=False)
+
+    async def _find_similar(self, namespace, text):
+        with self._lock:
+            candidates = list(self._vectors.get(namespace, {}).items())
+        if not candidates:
+            return None
+        vector = _unit(await self.embed(text))
+        # Stored vectors are unit length, so one matrix product gives every cosine similarity
+        scores = np.stack([candidate for _, candidate in candidates]) @ vector
+        best = int(np.argmax(scores))
+        return candidates[best][0] if scores[best] >= self.similarity_threshold else None
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def metrics(self):
+        """Return hit/miss counters, the hit rate and the number of stored entries."""
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.similar_hits) / lookups if lookups else 0.0,
+            "entries": len(self.backend),
+        }
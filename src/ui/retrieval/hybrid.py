@@ -0,0 +1,194 @@
+"""
+Hybrid keyword and vector retrieval over a ``LocalVectorIndex``.
+
+Vector search alone misses exact policy terms and acronyms, so ``HybridRetriever``
+also runs a BM25 keyword search over each chunk's ``title`` and ``content`` and merges
+the two rankings with reciprocal-rank fusion (RRF). An optional reranker reorders the
+fused candidates before the top k are returned, so fewer, better chunks go into the
+prompt.
+
+``BM25Index`` stores its postings in flat NumPy arrays (CSR layout: per-term offsets
+into document-number and term-frequency arrays), which are saved as .npy files and
+loaded memory-mapped.
+"""
+
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from vector_index import replace_file
+
+# Rank offset of reciprocal-rank fusion; 60 is the value from the original RRF paper
+RRF_K = 60
+# Candidates taken from each ranking before fusion
+CANDIDATES = 50
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN.findall((text or "").lower())
+
+
+class BM25Index:
+    """Okapi BM25 over chunk titles and content, with array-backed postings."""
+
+    def __init__(self, terms, offsets, documents, frequencies, lengths, chunk_ids, k1=1.2, b=0.75):
+        self.terms = terms
+        self.offsets = offsets
+        self.documents = documents
+        self.frequencies = frequencies
+        self.lengths = lengths
+        self.chunk_ids = chunk_ids
+        self.k1 = k1
+        self.b = b
+        self.average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    @classmethod
+    def build(cls, records, **params):
+        """Index records (dicts with chunk_id, title and content); documents are numbered in order."""
+        terms = {}
+        term_ids, documents, frequencies = [], [], []
+        lengths = np.zeros(len(records), dtype=np.int32)
+        for number, record in enumerate(records):
+            tokens = tokenize(record.get("title")) + tokenize(record.get("content"))
+            lengths[number] = len(tokens)
+            for term, count in Counter(tokens).items():
+                term_ids.append(terms.setdefault(term, len(terms)))
+                documents.append(number)
+                frequencies.append(count)
+        term_ids = np.array(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.searchsorted(term_ids[order], np.arange(len(terms) + 1)).astype(np.int64)
+        return cls(
+            terms,
+            offsets,
+            np.array(documents, dtype=np.int32)[order],
+            np.array(frequencies, dtype=np.float32)[order],
+            lengths,
+            [record["chunk_id"] for record in records],
+            **params,
+        )
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def search(self, query, k=CANDIDATES, rows=None):
+        """Return up to k (score, document number) pairs, best first; rows restricts the documents."""
+        count = len(self.lengths)
+        if not count:
+            return []
+        scores = np.zeros(count, dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * self.lengths / (self.average_length or 1))
+        for term in set(tokenize(query)):
+            term_id = self.terms.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            documents = self.documents[start:end]
+            frequencies = self.frequencies[start:end]
+            idf = math.log(1 + (count - len(documents) + 0.5) / (len(documents) + 0.5))
+            scores[documents] += idf * frequencies * (self.k1 + 1) / (frequencies + norms[documents])
+        if rows is not None:
+            mask = np.zeros(count, dtype=bool)
+            mask[rows] = True
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(float(scores[i]), int(i)) for i in top]
+
+    def save(self, path):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        # Written through temporary files, since the arrays may be memory-mapped from path
+        for name in ("offsets", "documents", "frequencies", "lengths"):
+            replace_file(path / f"bm25_{name}.npy", lambda file: np.save(file, getattr(self, name)))
+        meta = {"terms": list(self.terms), "chunk_ids": self.chunk_ids, "k1": self.k1, "b": self.b}
+        replace_file(path / "bm25.json", lambda file: file.write(json.dumps(meta).encode("utf-8")))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        path = Path(path)
+        meta = json.loads((path / "bm25.json").read_text(encoding="utf-8"))
+        arrays = [np.load(path / f"bm25_{name}.npy", mmap_mode="r" if mmap else None)
+                  for name in ("offsets", "documents", "frequencies", "lengths")]
+        terms = {term: term_id for term_id, term in enumerate(meta["terms"])}
+        return cls(terms, *arrays, meta["chunk_ids"], k1=meta["k1"], b=meta["b"])
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse rankings (lists of keys, best first) into [(score, key)], best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(((score, key) for key, score in scores.items()), key=lambda pair: -pair[0])
+
+
+def coverage_reranker(query, results, weight=0.5):
+    """
+    Rerank (score, record) pairs by the share of query terms each chunk contains, with a
+    bonus when it contains the query verbatim. Cheap enough to run on every query.
+    """
+    terms = set(tokenize(query))
+    phrase = " ".join(tokenize(query))
+    if not terms:
+        return results
+    # RRF scores are small; scale them so the top fused result is worth 1
+    best = max(score for score, _ in results)
+    reranked = []
+    for score, record in results:
+        tokens = tokenize(record.get("title")) + tokenize(record.get("content"))
+        coverage = len(terms & set(tokens)) / len(terms)
+        exact = 1.0 if phrase and phrase in " ".join(tokens) else 0.0
+        reranked.append((score / best + weight * (coverage + exact), record))
+    reranked.sort(key=lambda pair: -pair[0])
+    return reranked
+
+
+class HybridRetriever:
+    """
+    BM25 plus vector search over a LocalVectorIndex, fused with RRF.
+
+    The keyword index is rebuilt from the vector index's records whenever the vector index
+    has changed since it was built. ``reranker(query, results)`` may reorder the fused
+    (score, record) candidates; pass None to keep the fused order.
+    """
+
+    def __init__(self, index, embed, reranker=coverage_reranker, keyword_index=None):
+        self.index = index
+        self.embed = embed
+        self.reranker = reranker
+        self._keywords = keyword_index
+        self._keywords_version = index.version if keyword_index is not None else None
+
+    @property
+    def keywords(self):
+        if self._keywords is None or self._keywords_version != self.index.version:
+            self._keywords = BM25Index.build(self.index.records)
+            self._keywords_version = self.index.version
+        return self._keywords
+
+    async def search(self, query, k=5, filters=None, candidates=CANDIDATES):
+        """Return up to k (score, record) pairs for a query, best first."""
+        vector = (await self.embed([query]))[0]
+        vector_hits = self.index.search(vector, k=candidates, filters=filters)
+        keyword_hits = self.keywords.search(query, k=candidates, rows=self.index.rows_matching(filters))
+        fused = reciprocal_rank_fusion([
+            [record["chunk_id"] for _, record in vector_hits],
+            [self.keywords.chunk_ids[number] for _, number in keyword_hits],
+        ])
+        results = [(score, self.index.get(chunk_id)) for score, chunk_id in fused[:candidates]]
+        if self.reranker is not None and results:
+            results = self.reranker(query, results)
+        return results[:k]
+
+    def save(self, path):
+        """Save the keyword index next to a saved vector index."""
+        self.keywords.save(path)
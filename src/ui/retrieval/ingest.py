@@ -0,0 +1,161 @@
+"""
+Incremental ingestion of handbook documents into a ``LocalVectorIndex``.
+
+Documents are split into chunks with stable ``chunk_id``s (the document's
+``parent_id`` plus the chunk number), and every chunk is hashed. A re-index only
+embeds chunks whose hash the document did not already have; the vectors of unchanged
+chunks are reused (copied when an edit shifts a chunk to another ``chunk_id``), and
+chunks that no longer exist are removed. Documents whose hash is unchanged are not
+even re-chunked, so the cost of a nightly re-index follows the size of the change
+rather than the size of the handbook.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from vector_index import LocalVectorIndex
+
+CHUNK_CHARS = int(os.getenv("HANDBOOK_CHUNK_CHARS", "2000"))
+DOCUMENT_PATTERNS = ("*.md", "*.txt")
+MANIFEST_FILE = "manifest.json"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def parent_id_for(filepath):
+    """Stable parent_id for a document, derived from its path."""
+    return hashlib.sha1(str(filepath).encode("utf-8")).hexdigest()[:16]
+
+
+def split_text(text, chunk_chars=CHUNK_CHARS):
+    """Split text into chunks of up to chunk_chars, breaking between paragraphs where possible."""
+    chunks, current = [], ""
+    for paragraph in (p.strip() for p in text.split("\n\n")):
+        if not paragraph:
+            continue
+        while len(paragraph) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:chunk_chars])
+            paragraph = paragraph[chunk_chars:]
+        if current and len(current) + 2 + len(paragraph) > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_document(document, chunk_chars=CHUNK_CHARS):
+    """Return the chunk records (EmployeeHandbookModel fields) of a {"filepath", "content", "title", "url"} document."""
+    parent_id = parent_id_for(document["filepath"])
+    return [
+        {
+            "chunk_id": f"{parent_id}_{number}",
+            "parent_id": parent_id,
+            "content": text,
+            "title": document.get("title"),
+            "url": document.get("url"),
+            "filepath": str(document["filepath"]),
+        }
+        for number, text in enumerate(split_text(document["content"], chunk_chars))
+    ]
+
+
+def load_documents(directory, patterns=DOCUMENT_PATTERNS):
+    """Read the handbook documents under a directory."""
+    directory = Path(directory)
+    for pattern in patterns:
+        for path in sorted(directory.rglob(pattern)):
+            yield {
+                "filepath": path.relative_to(directory).as_posix(),
+                "content": path.read_text(encoding="utf-8"),
+                "title": path.stem.replace("_", " ").replace("-", " ").title(),
+                "url": None,
+            }
+
+
+class HandbookIndexer:
+    """
+    Keeps a LocalVectorIndex in step with a set of documents.
+
+    The manifest records, per document, its hash and the hash of each of its chunks; it is
+    saved next to the index.
+    """
+
+    def __init__(self, index, embed, manifest=None, chunk_chars=CHUNK_CHARS):
+        self.index = index
+        self.embed = embed
+        self.manifest = manifest or {}
+        self.chunk_chars = chunk_chars
+
+    async def reindex(self, documents, batch_size=256, concurrency=4):
+        """
+        Bring the index in line with ``documents`` (the complete set) and return counts of
+        documents, unchanged documents, chunks, embedded, reused and deleted chunks.
+        """
+        stats = {"documents": 0, "unchanged_documents": 0, "chunks": 0, "embedded": 0, "reused": 0, "deleted": 0}
+        manifest = {}
+        changed = []
+        moved = []
+        stale = []
+        for document in documents:
+            stats["documents"] += 1
+            filepath = str(document["filepath"])
+            document_hash = content_hash(json.dumps([document["content"], document.get("title"), document.get("url")]))
+            previous = self.manifest.get(filepath, {"hash": None, "chunks": {}})
+            if previous["hash"] == document_hash:
+                manifest[filepath] = previous
+                stats["unchanged_documents"] += 1
+                stats["chunks"] += len(previous["chunks"])
+                stats["reused"] += len(previous["chunks"])
+                continue
+            chunks = {}
+            previous_ids = {chunk_hash: chunk_id for chunk_id, chunk_hash in previous["chunks"].items()}
+            for record in chunk_document(document, self.chunk_chars):
+                chunk_id = record["chunk_id"]
+                chunk_hash = content_hash(json.dumps([record["content"], record["title"], record["url"]]))
+                chunks[chunk_id] = chunk_hash
+                source = previous_ids.get(chunk_hash)
+                if source is None or self.index.get(source) is None:
+                    changed.append(record)
+                    continue
+                if source != chunk_id:
+                    moved.append((record, self.index.vector(source)))
+                stats["reused"] += 1
+            stale.extend(chunk_id for chunk_id in previous["chunks"] if chunk_id not in chunks)
+            manifest[filepath] = {"hash": document_hash, "chunks": chunks}
+            stats["chunks"] += len(chunks)
+
+        # Documents that are gone take all their chunks with them
+        for filepath, entry in self.manifest.items():
+            if filepath not in manifest:
+                stale.extend(entry["chunks"])
+        stats["deleted"] = self.index.remove(stale)
+        if moved:
+            self.index.add([record for record, _ in moved], [vector for _, vector in moved])
+        if changed:
+            stats["embedded"] = await self.index.ingest(changed, self.embed, batch_size, concurrency)
+        self.manifest = manifest
+        return stats
+
+    def save(self, path):
+        """Save the index and the manifest to a directory."""
+        self.index.save(path)
+        (Path(path) / MANIFEST_FILE).write_text(json.dumps(self.manifest), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path, embed, dimensions=None, quantize=False, chunk_chars=CHUNK_CHARS):
+        """Open a saved index and manifest, or start empty ones if the directory has none."""
+        path = Path(path)
+        if not (path / MANIFEST_FILE).exists():
+            index = LocalVectorIndex(dimensions, quantize) if dimensions else LocalVectorIndex(quantize=quantize)
+            return cls(index, embed, chunk_chars=chunk_chars)
+        manifest = json.loads((path / MANIFEST_FILE).read_text(encoding="utf-8"))
+        return cls(LocalVectorIndex.load(path), embed, manifest, chunk_chars)
@@ -0,0 +1,116 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent))
+
+from hybrid import HybridRetriever
+from ingest import HandbookIndexer
+from vector_index import FakeEmbedder, LocalVectorIndex
+
+TOPICS = ["vacation leave policy", "expense report receipts", "remote work equipment", "security badge access"]
+
+
+def chunks(count):
+    return [
+        {"chunk_id": f"c{i}", "parent_id": f"doc{i % 4}", "content": f"{TOPICS[i % 4]} section {i}",
+         "title": TOPICS[i % 4], "url": None, "filepath": f"handbook/{i % 4}.md"}
+        for i in range(count)
+    ]
+
+
+def test_search_finds_the_matching_chunks_with_filters(tmp_path):
+    embed = FakeEmbedder(256)
+    index = LocalVectorIndex(256)
+    assert asyncio.run(index.ingest(chunks(200), embed, batch_size=32)) == 200
+    query = embed.embed_one("expense receipts")
+
+    results = index.search(query, k=5)
+    assert len(results) == 5 and all(record["parent_id"] == "doc1" for _, record in results)
+    assert [score for score, _ in results] == sorted((score for score, _ in results), reverse=True)
+    results = index.search(query, k=3, filters={"filepath": "handbook/2.md"})
+    assert len(results) == 3 and all(record["filepath"] == "handbook/2.md" for _, record in results)
+
+    index.save(tmp_path / "index")
+    loaded = LocalVectorIndex.load(tmp_path / "index")
+    assert isinstance(loaded._vectors, np.memmap)
+    assert [r["chunk_id"] for _, r in loaded.search(query, k=5)] == [r["chunk_id"] for _, r in index.search(query, k=5)]
+
+
+def test_memory_mapped_index_can_be_saved_over_its_own_directory(tmp_path):
+    embed = FakeEmbedder(256)
+    index = LocalVectorIndex(256)
+    asyncio.run(index.ingest(chunks(300), embed))
+    index.build_ivf(nlist=4)
+    index.save(tmp_path / "index")
+    size = (tmp_path / "index" / "vectors.npy").stat().st_size
+
+    loaded = LocalVectorIndex.load(tmp_path / "index")
+    assert isinstance(loaded._vectors, np.memmap)
+    loaded.save(tmp_path / "index")
+    assert (tmp_path / "index" / "vectors.npy").stat().st_size == size
+
+    query = embed.embed_one("security badge access")
+    reloaded = LocalVectorIndex.load(tmp_path / "index")
+    assert len(reloaded) == 300
+    assert [r["chunk_id"] for _, r in reloaded.search(query, k=5)] == [r["chunk_id"] for _, r in index.search(query, k=5)]
+    assert not list((tmp_path / "index").glob("*.tmp"))
+
+
+def test_quantized_ivf_index_agrees_with_exact_search():
+    embed = FakeEmbedder(256)
+    exact = LocalVectorIndex(256)
+    approximate = LocalVectorIndex(256, quantize=True)
+    for index in (exact, approximate):
+        asyncio.run(index.ingest(chunks(400), embed))
+    approximate.build_ivf(nlist=8)
+    query = embed.embed_one("remote work equipment")
+    assert {r["parent_id"] for _, r in approximate.search(query, k=10, nprobe=8)} == {"doc2"}
+    assert approximate.search(query, k=1)[0][1]["parent_id"] == exact.search(query, k=1)[0][1]["parent_id"]
+
+    exact.add([{**chunks(1)[0], "content": "updated"}], [embed.embed_one("updated")])
+    assert len(exact) == 400 and exact.records[0]["content"] == "updated"
+
+
+def test_reindex_only_embeds_changed_chunks(tmp_path):
+    calls = []
+    fake = FakeEmbedder(64)
+
+    async def embed(texts):
+        calls.extend(texts)
+        return await fake(texts)
+
+    documents = [
+        {"filepath": "leave.md", "content": "Vacation days.\n\nSick days.\n\nParental leave.", "title": "Leave"},
+        {"filepath": "expenses.md", "content": "Keep receipts.", "title": "Expenses"},
+    ]
+    indexer = HandbookIndexer(LocalVectorIndex(64), embed, chunk_chars=20)
+    assert (asyncio.run(indexer.reindex(documents)))["embedded"] == 4
+    indexer.save(tmp_path / "index")
+
+    indexer = HandbookIndexer.load(tmp_path / "index", embed, chunk_chars=20)
+    calls.clear()
+    documents[0]["content"] = "Holidays.\n\nVacation days.\n\nSick days.\n\nParental leave."
+    stats = asyncio.run(indexer.reindex(documents[:1]))
+    assert calls == ["Holidays."]
+    assert stats == {"documents": 1, "unchanged_documents": 0, "chunks": 4, "embedded": 1, "reused": 3, "deleted": 1}
+    assert sorted(r["content"] for r in indexer.index.records) == sorted(["Holidays.", "Vacation days.", "Sick days.", "Parental leave."])
+    top = indexer.index.search(fake.embed_one("Sick days."), k=1)[0]
+    assert top[1]["content"] == "Sick days." and top[0] > 0.99
+
+
+def test_hybrid_search_finds_exact_terms_that_vectors_miss():
+    embed = FakeEmbedder(8)
+    index = LocalVectorIndex(8)
+    records = chunks(40) + [{"chunk_id": "pto", "parent_id": "doc9", "content": "PTO accrues monthly.",
+                             "title": "Leave", "url": None, "filepath": "handbook/9.md"}]
+    asyncio.run(index.ingest(records, embed))
+    retriever = HybridRetriever(index, embed)
+    assert retriever.keywords.search("pto")[0][1] == 40
+    assert asyncio.run(retriever.search("PTO", k=1))[0][1]["chunk_id"] == "pto"
+    assert asyncio.run(retriever.search("PTO", k=3, filters={"parent_id": "doc1"}))[0][1]["parent_id"] == "doc1"
+
+    index.remove(["pto"])
+    assert all(record["chunk_id"] != "pto" for _, record in asyncio.run(retriever.search("PTO", k=5)))
@@ -0,0 +1,328 @@
+"""
+Local vector index for employee handbook chunks.
+
+Records follow the fields of ``models/employee_handbook_model.py`` (``chunk_id``,
+``parent_id``, ``content``, ``title``, ``url``, ``filepath``); their ``contentVector``
+is kept in a NumPy matrix instead of Azure AI Search, so lookups work offline.
+
+Vectors are normalised float32 rows, or int8 rows with a per-row scale when the index
+is quantized (4x smaller). Search is exact brute force by default; ``build_ivf``
+clusters the rows so a search only scores the closest ``nprobe`` clusters. Saved
+indexes are loaded memory-mapped, so opening a large one costs no time or memory
+until it is searched. Chunks are embedded in large batches, several at a time.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_DIMENSIONS = 1536
+FILTER_FIELDS = ("parent_id", "filepath")
+RECORD_FIELDS = ("chunk_id", "parent_id", "content", "title", "url", "filepath")
+# Rows scored per matrix product, which bounds the temporary memory of a search
+SEARCH_BLOCK_ROWS = 65536
+
+
+def _normalise(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def replace_file(path, write):
+    """
+    Write a file through a temporary file and swap it in. A saved index may still be
+    memory-mapped from the same path; the mapping keeps reading the old file.
+    """
+    path = Path(path)
+    temporary = path.with_name(f"{path.name}.tmp")
+    with open(temporary, "wb") as file:
+        write(file)
+    os.replace(temporary, path)
+
+
+def _quantize(vectors):
+    """Return int8 rows and the per-row scale that restores them."""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class FakeEmbedder:
+    """Deterministic hashed bag-of-words embeddings, for tests and offline demos."""
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed_one(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    async def __call__(self, texts):
+        return [self.embed_one(text) for text in texts]
+
+
+def service_embedder(service):
+    """Adapt a Semantic Kernel text embedding service (e.g. AzureTextEmbedding) to ``embed(texts)``."""
+    async def embed(texts):
+        return await service.generate_embeddings(texts)
+    return embed
+
+
+async def embed_in_batches(embed, texts, batch_size=256, concurrency=4):
+    """Embed texts in batches of batch_size, with up to concurrency batches in flight; keeps order."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(batch):
+        async with semaphore:
+            return await embed(batch)
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = await asyncio.gather(*(run(batch) for batch in batches))
+    return [vector for result in results for vector in result]
+
+
+class LocalVectorIndex:
+    """NumPy vector index over handbook chunks with parent_id/filepath filters."""
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS, quantize=False):
+        self.dimensions = dimensions
+        self.quantize = quantize
+        self.records = []
+        # Bumped on every change, so derived indexes (see hybrid.py) know when to rebuild
+        self.version = 0
+        self._rows = {}
+        self._vectors = np.empty((0, dimensions), dtype=np.int8 if quantize else np.float32)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._count = 0
+        self._filter_rows = None
+        self._centroids = None
+        self._assignments = None
+        self._lists = None
+
+    def __len__(self):
+        return self._count
+
+    # Ingestion
+
+    def _reserve(self, rows):
+        """Grow the matrices geometrically; a memory-mapped matrix is copied into memory first."""
+        needed = self._count + rows
+        if needed <= len(self._vectors) and self._vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self._vectors), 1024)
+        vectors = np.empty((capacity, self.dimensions), dtype=self._vectors.dtype)
+        vectors[:self._count] = self._vectors[:self._count]
+        scales = np.ones(capacity, dtype=np.float32)
+        scales[:self._count] = self._scales[:self._count]
+        self._vectors, self._scales = vectors, scales
+        if self._assignments is not None:
+            assignments = np.zeros(capacity, dtype=np.int32)
+            assignments[:self._count] = self._assignments[:self._count]
+            self._assignments = assignments
+
+    def add(self, records, vectors):
+        """Add or replace (by chunk_id) records with their embedding vectors."""
+        if not len(records):
+            return
+        vectors = _normalise(vectors)
+        if vectors.shape != (len(records), self.dimensions):
+            raise ValueError(f"Expected {len(records)} vectors of {self.dimensions} dimensions, got {vectors.shape}")
+        self._reserve(len(records))
+        rows = []
+        for record in records:
+            record = {field: record.get(field) for field in RECORD_FIELDS}
+            row = self._rows.get(record["chunk_id"])
+            if row is None:
+                row = self._count
+                self._count += 1
+                self._rows[record["chunk_id"]] = row
+                self.records.append(record)
+            else:
+                self.records[row] = record
+            rows.append(row)
+        rows = np.array(rows)
+        if self.quantize:
+            self._vectors[rows], self._scales[rows] = _quantize(vectors)
+        else:
+            self._vectors[rows] = vectors
+        if self._centroids is not None:
+            self._assignments[rows] = np.argmax(vectors @ self._centroids.T, axis=1)
+            self._lists = None
+        self._filter_rows = None
+        self.version += 1
+
+    def get(self, chunk_id):
+        """Return the record with this chunk_id, or None."""
+        row = self._rows.get(chunk_id)
+        return None if row is None else self.records[row]
+
+    def vector(self, chunk_id):
+        """Return a copy of the stored (normalised) vector of a chunk."""
+        row = self._rows[chunk_id]
+        return self._dequantized(np.array([row]))[0]
+
+    def remove(self, chunk_ids):
+        """Remove records by chunk_id, compacting the rows; return the number removed."""
+        removed = {self._rows[chunk_id] for chunk_id in chunk_ids if chunk_id in self._rows}
+        if not removed:
+            return 0
+        keep = np.array([row for row in range(self._count) if row not in removed], dtype=np.int64)
+        self._reserve(0)
+        self._vectors[:len(keep)] = self._vectors[keep]
+        self._scales[:len(keep)] = self._scales[keep]
+        if self._assignments is not None:
+            self._assignments[:len(keep)] = self._assignments[keep]
+            self._lists = None
+        self.records = [self.records[row] for row in keep]
+        self._rows = {record["chunk_id"]: row for row, record in enumerate(self.records)}
+        self._count = len(keep)
+        self._filter_rows = None
+        self.version += 1
+        return len(removed)
+
+    async def ingest(self, records, embed, batch_size=256, concurrency=4):
+        """Embed the records' content in concurrent batches and add them; return the number added."""
+        records = list(records)
+        vectors = await embed_in_batches(embed, [record["content"] for record in records], batch_size, concurrency)
+        self.add(records, vectors)
+        return len(records)
+
+    # Search
+
+    def rows_matching(self, filters):
+        """Return the row numbers matching all filters (exact values), or None for no filter."""
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        if not filters:
+            return None
+        if self._filter_rows is None:
+            index = {field: {} for field in FILTER_FIELDS}
+            for row, record in enumerate(self.records):
+                for field in FILTER_FIELDS:
+                    index[field].setdefault(record[field], []).append(row)
+            self._filter_rows = {field: {value: np.array(rows) for value, rows in values.items()}
+                                 for field, values in index.items()}
+        rows = None
+        for field, value in filters.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Cannot filter on {field}; use one of {', '.join(FILTER_FIELDS)}")
+            matching = self._filter_rows[field].get(value, np.empty(0, dtype=np.int64))
+            rows = matching if rows is None else np.intersect1d(rows, matching, assume_unique=True)
+        return rows
+
+    def _score(self, query, rows=None):
+        """Dot products of the query with the given rows (all rows when None), block by block."""
+        count = self._count if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = slice(start, min(count, start + SEARCH_BLOCK_ROWS))
+            selected = block if rows is None else rows[block]
+            vectors = self._vectors[selected]
+            if self.quantize:
+                scores[block] = (vectors.astype(np.float32) @ query) * self._scales[selected]
+            else:
+                scores[block] = vectors @ query
+        return scores
+
+    def search(self, vector, k=5, filters=None, nprobe=8):
+        """
+        Return up to k (score, record) pairs by cosine similarity, best first.
+
+        ``filters`` maps parent_id and/or filepath to the value to match. With an IVF index
+        only the rows of the nprobe closest clusters are scored.
+        """
+        if not self._count:
+            return []
+        query = _normalise(vector)
+        rows = self.rows_matching(filters)
+        if self._centroids is not None:
+            probed = self._probe(query, nprobe)
+            rows = probed if rows is None else np.intersect1d(rows, probed)
+        if rows is not None and not len(rows):
+            return []
+        scores = self._score(query, rows)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.records[i if rows is None else rows[i]]) for i in top]
+
+    # IVF
+
+    def _dequantized(self, rows):
+        vectors = self._vectors[rows].astype(np.float32)
+        return vectors * self._scales[rows][:, None] if self.quantize else vectors
+
+    def build_ivf(self, nlist=None, iterations=10, sample_size=50000, seed=0):
+        """Cluster the rows with k-means (nlist defaults to sqrt of the row count) for probed search."""
+        if not self._count:
+            return
+        rng = np.random.default_rng(seed)
+        nlist = min(self._count, nlist or max(1, int(np.sqrt(self._count))))
+        sample = rng.choice(self._count, size=min(sample_size, self._count), replace=False)
+        vectors = _normalise(self._dequantized(np.sort(sample)))
+        centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = vectors[assignments == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = _normalise(centroids)
+        self._centroids = centroids
+        self._assignments = np.zeros(len(self._vectors), dtype=np.int32)
+        for start in range(0, self._count, SEARCH_BLOCK_ROWS):
+            block = np.arange(start, min(self._count, start + SEARCH_BLOCK_ROWS))
+            self._assignments[block] = np.argmax(_normalise(self._dequantized(block)) @ centroids.T, axis=1)
+        self._lists = None
+
+    def _probe(self, query, nprobe):
+        if self._lists is None:
+            assignments = self._assignments[:self._count]
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(self._centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self._centroids))]
+        nearest = np.argsort(-(self._centroids @ query))[:nprobe]
+        return np.sort(np.concatenate([self._lists[cluster] for cluster in nearest]))
+
+    # Persistence
+
+    def save(self, path):
+        """Write the index to a directory: vectors.npy, scales.npy, records.jsonl and meta.json."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        arrays = {"vectors": self._vectors[:self._count], "scales": self._scales[:self._count]}
+        if self._centroids is not None:
+            arrays.update(centroids=self._centroids, assignments=self._assignments[:self._count])
+        for name, array in arrays.items():
+            replace_file(path / f"{name}.npy", lambda file: np.save(file, array))
+        replace_file(path / "records.jsonl", lambda file: file.writelines(
+            (json.dumps(record) + "\n").encode("utf-8") for record in self.records))
+        meta = {"dimensions": self.dimensions, "quantize": self.quantize, "ivf": self._centroids is not None}
+        replace_file(path / "meta.json", lambda file: file.write(json.dumps(meta).encode("utf-8")))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Open a saved index; with mmap the vectors stay on disk until they are read."""
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        index = cls(meta["dimensions"], meta["quantize"])
+        mode = "r" if mmap else None
+        index._vectors = np.load(path / "vectors.npy", mmap_mode=mode)
+        index._scales = np.load(path / "scales.npy")
+        with open(path / "records.jsonl", encoding="utf-8") as file:
+            index.records = [json.loads(line) for line in file]
+        index._count = len(index.records)
+        index._rows = {record["chunk_id"]: row for row, record in enumerate(index.records)}
+        if meta.get("ivf"):
+            index._centroids = np.load(path / "centroids.npy")
+            index._assignments = np.load(path / "assignments.npy")
+        return index
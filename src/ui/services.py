@@ -0,0 +1,382 @@
+"""
+Process-wide registry for the Semantic Kernel and Azure OpenAI services.
+
+Building a new ``Kernel`` and ``AzureChatCompletion`` for every run means a
+fresh TLS handshake and a fresh HTTP connection pool per request. The registry
+keeps one pooled HTTP client per deployment and event loop, and the pool size
+doubles as the per-deployment concurrency cap. httpx connections cannot cross event
+loops, so reuse lasts as long as the loop: the Streamlit app runs every session on
+the orchestrator's long-lived loop and keeps its connections warm, while each
+``asyncio.run`` in a script or demo gets its own pool, closed when that run ends.
+Services asked for outside a running loop are not shared.
+
+Every request goes through the adaptive rate limiter of ``rate_limiter.py``, which
+backs off on 429s and retries them along with 5xx responses, timeouts and connection
+errors; the OpenAI SDK's own retries are turned off so requests are not retried twice.
+
+With ``AZURE_OPENAI_RESPONSE_CACHE`` set to ``memory`` or ``disk`` the chat service
+answers repeated prompts from a ``ResponseCache`` instead of calling the model.
+The text embedding service always answers from an ``EmbeddingCache`` (in memory, or
+on disk with ``AZURE_OPENAI_EMBEDDING_CACHE=disk``), shared by handbook ingestion and
+queries, so repeated questions and re-ingests make no embedding calls.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import numpy as np
+from dotenv import load_dotenv
+from openai import AsyncAzureOpenAI
+from pydantic import PrivateAttr
+from semantic_kernel.connectors.ai.open_ai.services.azure_chat_completion import AzureChatCompletion
+from semantic_kernel.connectors.ai.open_ai.services.azure_text_embedding import AzureTextEmbedding
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
+from semantic_kernel.contents.text_content import TextContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+from semantic_kernel.kernel import Kernel
+
+from embedding_cache import EmbeddingCache
+from rate_limiter import RateLimitedTransport, limiters
+from response_cache import DiskBackend, MemoryBackend, ResponseCache, make_key
+
+load_dotenv()
+
+DEFAULT_API_VERSION = "2024-10-21"
+MAX_CONCURRENT_REQUESTS = int(os.getenv("AZURE_OPENAI_MAX_CONCURRENCY", "8"))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("AZURE_OPENAI_TIMEOUT", "120"))
+# Requests per second across all deployments of the resource; 0 leaves only the adaptive concurrency limit
+REQUESTS_PER_SECOND = float(os.getenv("AZURE_OPENAI_REQUESTS_PER_SECOND", "0"))
+# "memory", "disk" or empty to disable
+RESPONSE_CACHE = os.getenv("AZURE_OPENAI_RESPONSE_CACHE", "").lower()
+RESPONSE_CACHE_TTL = float(os.getenv("AZURE_OPENAI_RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_PATH = os.getenv("AZURE_OPENAI_RESPONSE_CACHE_PATH", str(Path(__file__).parent / ".response_cache.sqlite3"))
+EMBEDDING_DIMENSIONS = int(os.getenv("AZURE_OPENAI_EMBEDDING_DIMENSIONS", "1536"))
+# "memory" or "disk"
+EMBEDDING_CACHE = os.getenv("AZURE_OPENAI_EMBEDDING_CACHE", "memory").lower()
+EMBEDDING_CACHE_PATH = os.getenv("AZURE_OPENAI_EMBEDDING_CACHE_PATH", str(Path(__file__).parent / ".embedding_cache"))
+
+
+def get_base_endpoint(full_endpoint):
+    """Strip deployment-specific parts so we are left with https://{resource}.openai.azure.com/."""
+    if full_endpoint and "openai.azure.com" in full_endpoint:
+        return full_endpoint.split("/openai/deployments")[0]
+    return full_endpoint
+
+
+def get_api_version(full_endpoint):
+    """Use the api-version from the endpoint URL if present, else the environment or default."""
+    if full_endpoint:
+        query = parse_qs(urlparse(full_endpoint).query)
+        if query.get("api-version"):
+            return query["api-version"][0]
+    return os.getenv("AZURE_OPENAI_API_VERSION", DEFAULT_API_VERSION)
+
+
+def create_response_cache(kind=RESPONSE_CACHE):
+    """Create the response cache selected by AZURE_OPENAI_RESPONSE_CACHE, or None when disabled."""
+    if kind == "memory":
+        return ResponseCache(MemoryBackend(), ttl=RESPONSE_CACHE_TTL)
+    if kind == "disk":
+        return ResponseCache(DiskBackend(RESPONSE_CACHE_PATH), ttl=RESPONSE_CACHE_TTL)
+    return None
+
+
+def _is_text_only(message):
+    return all(isinstance(item, TextContent) for item in message.items)
+
+
+class CachedAzureChatCompletion(AzureChatCompletion):
+    """AzureChatCompletion that answers repeated prompts from a ResponseCache."""
+
+    _response_cache: ResponseCache = PrivateAttr(default=None)
+
+    def use_cache(self, cache):
+        self._response_cache = cache
+        return self
+
+    def _cache_lookup(self, chat_history, settings):
+        """Return (key, namespace, text) for a prompt."""
+        messages = []
+        for message in chat_history.messages:
+            try:
+                messages.append(message.to_dict())
+            except (TypeError, ValueError):
+                messages.append({"role": str(message.role), "name": message.name, "content": message.content})
+        try:
+            settings_dict = settings.prepare_settings_dict()
+        except (AttributeError, TypeError, ValueError):
+            settings_dict = {}
+        settings_dict.pop("messages", None)
+        # The system message carries the agent name and instructions
+        system = [message for message in messages if message.get("role") == AuthorRole.SYSTEM.value]
+        namespace = make_key(self.ai_model_id, system, settings_dict)
+        key = make_key(namespace, messages)
+        text = "\n".join(str(message.get("content") or "") for message in messages if message not in system)
+        return key, namespace, text
+
+    def _from_cache(self, choice, message_class, choice_index=0):
+        return message_class(
+            role=AuthorRole(choice["role"]),
+            content=choice["content"],
+            name=choice["name"],
+            ai_model_id=self.ai_model_id,
+            **({"choice_index": choice_index} if message_class is StreamingChatMessageContent else {}),
+        )
+
+    async def _inner_get_chat_message_contents(self, chat_history, settings):
+        if self._response_cache is None:
+            return await super()._inner_get_chat_message_contents(chat_history, settings)
+        key, namespace, text = self._cache_lookup(chat_history, settings)
+        cached = await self._response_cache.get(key, namespace, text)
+        if cached is not None:
+            return [self._from_cache(choice, ChatMessageContent) for choice in cached]
+        responses = await super()._inner_get_chat_message_contents(chat_history, settings)
+        # Tool calls are never replayed from the cache
+        if responses and all(_is_text_only(response) for response in responses):
+            choices = [{"role": r.role.value, "content": r.content, "name": r.name} for r in responses]
+            await self._response_cache.set(key, choices, namespace, text)
+        return responses
+
+    async def _inner_get_streaming_chat_message_contents(self, chat_history, settings, function_invoke_attempt=0):
+        if self._response_cache is None:
+            async for messages in super()._inner_get_streaming_chat_message_contents(
+                chat_history, settings, function_invoke_attempt
+            ):
+                yield messages
+            return
+        key, namespace, text = self._cache_lookup(chat_history, settings)
+        cached = await self._response_cache.get(key, namespace, text)
+        if cached is not None:
+            yield [self._from_cache(choice, StreamingChatMessageContent, i) for i, choice in enumerate(cached)]
+            return
+        combined = {}
+        async for messages in super()._inner_get_streaming_chat_message_contents(
+            chat_history, settings, function_invoke_attempt
+        ):
+            for message in messages:
+                previous = combined.get(message.choice_index)
+                combined[message.choice_index] = message if previous is None else previous + message
+            yield messages
+        responses = [combined[index] for index in sorted(combined)]
+        if responses and all(_is_text_only(response) and response.content for response in responses):
+            choices = [{"role": (r.role or AuthorRole.ASSISTANT).value, "content": r.content, "name": r.name}
+                       for r in responses]
+            await self._response_cache.set(key, choices, namespace, text)
+
+
+class CachedAzureTextEmbedding(AzureTextEmbedding):
+    """AzureTextEmbedding that only requests embeddings for texts missing from its EmbeddingCaches."""
+
+    _embedding_caches: Any = PrivateAttr(default=None)
+
+    def use_caches(self, get_cache):
+        """get_cache(dimensions) returns the EmbeddingCache for that dimension count."""
+        self._embedding_caches = get_cache
+        return self
+
+    async def generate_embeddings(self, texts, settings=None, batch_size=None, **kwargs):
+        if self._embedding_caches is None:
+            return await super().generate_embeddings(texts, settings, batch_size, **kwargs)
+        dimensions = kwargs.get("dimensions") or getattr(settings, "dimensions", None) or EMBEDDING_DIMENSIONS
+        cache = self._embedding_caches(dimensions)
+
+        async def embed(missing):
+            return await super(CachedAzureTextEmbedding, self).generate_embeddings(missing, settings, batch_size, **kwargs)
+
+        return np.array(await cache.embed(self.ai_model_id, list(texts), embed))
+
+
+@dataclass
+class _LoopServices:
+    """Services bound to one event loop (pooled connections cannot cross loops)."""
+    http_clients: dict = field(default_factory=dict)
+    chat_services: dict = field(default_factory=dict)
+    embedding_services: dict = field(default_factory=dict)
+    kernels: dict = field(default_factory=dict)
+    closer: Any = None
+
+
+async def _close_when_loop_ends(services):
+    """Async generator that closes the loop's HTTP pools when the loop shuts down its async generators."""
+    try:
+        yield
+    finally:
+        clients = list(services.http_clients.values())
+        services.http_clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+async def _start(generator):
+    await generator.__anext__()
+
+
+class ServiceRegistry:
+    """Keeps kernels, chat completion services and their HTTP pools alive per process."""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENT_REQUESTS, response_cache=None):
+        self.max_concurrency = max_concurrency
+        endpoint_host = urlparse(get_base_endpoint(os.getenv("AZURE_OPENAI_ENDPOINT") or "")).hostname
+        if endpoint_host:
+            limiters.configure(endpoint_host, rate=REQUESTS_PER_SECOND, max_concurrency=max_concurrency)
+        # One cache for the process, shared by the services of every loop
+        self.response_cache = response_cache
+        # Embedding caches by dimension count, shared by the services of every loop
+        self.embedding_caches = {}
+        self._lock = threading.Lock()
+        self._by_loop = weakref.WeakKeyDictionary()
+
+    def _services_for_current_loop(self):
+        """Return the services of the running loop; outside a loop, a new unshared set."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return _LoopServices()
+        services = self._by_loop.get(loop)
+        if services is None:
+            # Loops that ended without shutting down their async generators
+            for closed in [other for other in self._by_loop if other.is_closed()]:
+                del self._by_loop[closed]
+            services = _LoopServices()
+            # asyncio.run and the Runner finalize async generators before closing the loop
+            services.closer = _close_when_loop_ends(services)
+            loop.create_task(_start(services.closer))
+            self._by_loop[loop] = services
+        return services
+
+    def _create_http_client(self):
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+        )
+        # pool=None queues callers beyond the limit instead of failing them
+        timeout = httpx.Timeout(REQUEST_TIMEOUT_SECONDS, pool=None)
+        # The limiter of the endpoint host backs off on 429s for every deployment and event loop
+        return httpx.AsyncClient(transport=RateLimitedTransport(limits=limits), timeout=timeout)
+
+    def get_chat_service(self, deployment_name=None):
+        """Return the shared AzureChatCompletion service for a deployment."""
+        deployment_name = deployment_name or os.getenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME")
+        with self._lock:
+            services = self._services_for_current_loop()
+            service = services.chat_services.get(deployment_name)
+            if service is not None:
+                return service
+
+            full_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+            http_client = self._create_http_client()
+            async_client = AsyncAzureOpenAI(
+                azure_endpoint=get_base_endpoint(full_endpoint),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version=get_api_version(full_endpoint),
+                http_client=http_client,
+                # Throttling, 5xx and connection errors are retried by the rate-limited transport
+                max_retries=0,
+            )
+            service_class = CachedAzureChatCompletion if self.response_cache is not None else AzureChatCompletion
+            service = service_class(
+                deployment_name=deployment_name,
+                endpoint=get_base_endpoint(full_endpoint),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                async_client=async_client,
+            )
+            if self.response_cache is not None:
+                service.use_cache(self.response_cache)
+            services.http_clients[deployment_name] = http_client
+            services.chat_services[deployment_name] = service
+            return service
+
+    def get_embedding_cache(self, dimensions=EMBEDDING_DIMENSIONS):
+        """Return the process-wide EmbeddingCache for a dimension count."""
+        with self._lock:
+            cache = self.embedding_caches.get(dimensions)
+            if cache is None:
+                path = EMBEDDING_CACHE_PATH if EMBEDDING_CACHE == "disk" else None
+                cache = EmbeddingCache(dimensions, path)
+                self.embedding_caches[dimensions] = cache
+            return cache
+
+    def get_embedding_service(self, deployment_name=None):
+        """Return the shared, cached AzureTextEmbedding service for a deployment."""
+        deployment_name = deployment_name or os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME")
+        with self._lock:
+            services = self._services_for_current_loop()
+            service = services.embedding_services.get(deployment_name)
+            if service is not None:
+                return service
+
+            full_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+            http_client = self._create_http_client()
+            async_client = AsyncAzureOpenAI(
+                azure_endpoint=get_base_endpoint(full_endpoint),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version=get_api_version(full_endpoint),
+                http_client=http_client,
+                # Throttling, 5xx and connection errors are retried by the rate-limited transport
+                max_retries=0,
+            )
+            service = CachedAzureTextEmbedding(
+                deployment_name=deployment_name,
+                endpoint=get_base_endpoint(full_endpoint),
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                async_client=async_client,
+            ).use_caches(self.get_embedding_cache)
+            services.http_clients[f"embedding:{deployment_name}"] = http_client
+            services.embedding_services[deployment_name] = service
+            return service
+
+    def get_kernel(self, name="default", deployment_name=None, setup=None):
+        """
+        Return a named kernel with the shared chat completion service registered.
+        ``setup(kernel)`` runs once, when the kernel is created, to add plugins and services.
+        """
+        service = self.get_chat_service(deployment_name)
+        with self._lock:
+            kernel = self._services_for_current_loop().kernels.get(name)
+        if kernel is not None:
+            return kernel
+        kernel = Kernel()
+        kernel.add_service(service)
+        if setup is not None:
+            # Outside the lock: setup may ask the registry for more services
+            setup(kernel)
+        with self._lock:
+            return self._services_for_current_loop().kernels.setdefault(name, kernel)
+
+    async def aclose(self):
+        """Close the HTTP pools bound to the running event loop."""
+        with self._lock:
+            services = self._services_for_current_loop()
+            clients = list(services.http_clients.values())
+            services.http_clients.clear()
+            services.chat_services.clear()
+            services.embedding_services.clear()
+            services.kernels.clear()
+        for client in clients:
+            await client.aclose()
+
+
+registry = ServiceRegistry(response_cache=create_response_cache())
+
+
+def get_kernel(name="default", deployment_name=None, setup=None):
+    """Return a kernel from the process-wide registry."""
+    return registry.get_kernel(name, deployment_name, setup)
+
+
+def get_chat_service(deployment_name=None):
+    """Return a chat completion service from the process-wide registry."""
+    return registry.get_chat_service(deployment_name)
+
+
+def get_embedding_service(deployment_name=None):
+    """Return a cached text embedding service from the process-wide registry."""
+    return registry.get_embedding_service(deployment_name)
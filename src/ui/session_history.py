@@ -0,0 +1,129 @@
+"""
+Per-session chat histories for ``chat.process_message``.
+
+Each browser session gets its own history, so sessions no longer share (and reset)
+one global ``ChatHistory``. Messages are kept as compact ``(role, name, content)``
+tuples rather than ``ChatMessageContent`` objects, and only the text of a message is
+kept; tool-call round trips are not replayed. At most ``SESSION_HISTORY_MAX_MESSAGES``
+messages are kept per session. When more than ``SESSION_HISTORY_MAX_ACTIVE`` sessions
+are in memory, the least recently used are moved to a SQLite file and loaded back the
+next time they are used, so memory stays flat as the number of users grows.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from semantic_kernel.contents.chat_history import ChatHistory
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+SESSION_HISTORY_MAX_ACTIVE = int(os.getenv("SESSION_HISTORY_MAX_ACTIVE", "100"))
+SESSION_HISTORY_MAX_MESSAGES = int(os.getenv("SESSION_HISTORY_MAX_MESSAGES", "200"))
+SESSION_HISTORY_PATH = os.getenv("SESSION_HISTORY_PATH", str(Path(__file__).parent / ".session_history.sqlite3"))
+
+
+def compact(message):
+    """Return the (role, name, content) tuple of a message, or None if it has no text."""
+    if not message.content:
+        return None
+    return (message.role.value, message.name, message.content)
+
+
+class SessionHistoryStore:
+    """Chat histories by session id: recent sessions in memory, idle ones on disk."""
+
+    def __init__(self, path=SESSION_HISTORY_PATH, max_active=SESSION_HISTORY_MAX_ACTIVE,
+                 max_messages=SESSION_HISTORY_MAX_MESSAGES):
+        self.path = str(path)
+        self.max_active = max_active
+        self.max_messages = max_messages
+        self.evictions = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        # session id -> list of compact messages, least recently used first
+        self._sessions = OrderedDict()
+        self._db = None
+
+    def _connection(self):
+        # Opened on first eviction, so sessions that never spill never touch the disk
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            with self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS sessions ("
+                    "session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated_at REAL NOT NULL)"
+                )
+        return self._db
+
+    def _messages(self, session_id):
+        """Return the session's compact messages, reloading them from disk if evicted."""
+        messages = self._sessions.get(session_id)
+        if messages is not None:
+            self._sessions.move_to_end(session_id)
+            return messages
+        messages = []
+        if self._db is not None or os.path.exists(self.path):
+            row = self._connection().execute(
+                "SELECT messages FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is not None:
+                messages = [tuple(message) for message in json.loads(row[0])]
+                self.reloads += 1
+        self._sessions[session_id] = messages
+        self._evict()
+        return messages
+
+    def _evict(self):
+        evicted = []
+        while len(self._sessions) > self.max_active:
+            evicted.append(self._sessions.popitem(last=False))
+        if not evicted:
+            return
+        self.evictions += len(evicted)
+        now = time.time()
+        with self._connection() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO sessions (session_id, messages, updated_at) VALUES (?, ?, ?)",
+                [(session_id, json.dumps(messages), now) for session_id, messages in evicted],
+            )
+
+    def get(self, session_id):
+        """Return a new ChatHistory with the session's messages."""
+        with self._lock:
+            messages = list(self._messages(session_id))
+        return ChatHistory(messages=[
+            ChatMessageContent(role=AuthorRole(role), name=name, content=content) for role, name, content in messages
+        ])
+
+    def append(self, session_id, messages):
+        """Add messages to a session, dropping the oldest beyond max_messages."""
+        entries = [entry for entry in map(compact, messages) if entry is not None]
+        with self._lock:
+            stored = self._messages(session_id)
+            stored.extend(entries)
+            del stored[:max(0, len(stored) - self.max_messages)]
+
+    def reset(self, session_id):
+        """Forget a session's messages."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            if self._db is not None or os.path.exists(self.path):
+                with self._connection() as db:
+                    db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "active_sessions": len(self._sessions),
+                "active_messages": sum(len(messages) for messages in self._sessions.values()),
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+            }
+
+
+sessions = SessionHistoryStore()
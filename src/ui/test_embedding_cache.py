@@ -0,0 +1,30 @@
+import asyncio
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache, cached_embedder
+
+
+def test_embedding_cache_only_embeds_new_texts_and_survives_a_restart(tmp_path):
+    calls = []
+
+    async def embed(texts):
+        calls.append(list(texts))
+        return [np.full(4, len(text), dtype=np.float32) for text in texts]
+
+    cache = EmbeddingCache(4, tmp_path, capacity=2)
+    cached = cached_embedder(embed, cache, "text-embedding-3-small")
+    vectors = asyncio.run(cached(["vacation policy", "vacation  policy", "badges"]))
+    assert calls == [["vacation policy", "badges"]]
+    assert [vector[0] for vector in vectors] == [15, 15, 6]
+
+    asyncio.run(cached(["vacation policy"]))
+    asyncio.run(cached(["expenses"]))
+    assert calls[1:] == [["expenses"]]
+    cache.close()
+
+    cache = EmbeddingCache(4, tmp_path, capacity=2)
+    assert len(cache) == 2 and cache.get_many("text-embedding-3-small", ["badges"]) == [None]
+    assert cache.get_many("text-embedding-3-small", ["vacation policy"])[0][0] == 15
+    assert cache.get_many("other-model", ["expenses"]) == [None]
+    cache.close()
@@ -0,0 +1,228 @@
+"""
+Tests for the Git publishing backend and the background publish queue.
+Uses a local bare repository as the remote, so no network or GitHub credentials are needed.
+"""
+
+import asyncio
+import subprocess
+import threading
+import time
+
+from git_publisher import Artifact, GitPublisher, PublishResult
+from publish_queue import FAILED, PUBLISHED, RETRYING, RUNNING, PublishQueue
+
+
+def git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def make_repo(tmp_path):
+    """Create a working repository whose origin is a local bare repository."""
+    remote = tmp_path / "remote.git"
+    work = tmp_path / "work"
+    git(tmp_path, "init", "--bare", "-b", "main", str(remote))
+    git(tmp_path, "init", "-b", "main", str(work))
+    git(work, "config", "user.email", "agent@example.com")
+    git(work, "config", "user.name", "agent")
+    git(work, "remote", "add", "origin", str(remote))
+    (work / "README.md").write_text("readme\n")
+    git(work, "add", "README.md")
+    git(work, "commit", "-m", "initial")
+    git(work, "push", "origin", "main")
+    return work, remote
+
+
+def test_publish_batches_artifacts_into_one_commit(tmp_path):
+    work, remote = make_repo(tmp_path)
+    publisher = GitPublisher(repo_dir=work)
+
+    result = asyncio.run(publisher.publish([
+        Artifact(str(work / "src" / "ui" / "index.html"), "<p>one</p>"),
+        Artifact(str(work / "calculator.html"), "<p>two</p>"),
+    ]))
+
+    assert result.success, result.error
+    assert result.committed
+    assert sorted(result.paths) == ["calculator.html", "src/ui/index.html"]
+    assert set(result.timings) == {"write", "stage", "commit", "push"}
+    assert git(remote, "rev-parse", "main") == result.commit
+    assert git(remote, "rev-list", "--count", "main") == "2"
+    assert git(remote, "show", "main:src/ui/index.html") == "<p>one</p>"
+
+
+def test_publish_stages_only_artifact_paths(tmp_path):
+    work, remote = make_repo(tmp_path)
+    (work / "scratch.txt").write_text("not for publishing")
+    (work / "README.md").write_text("staged elsewhere\n")
+    git(work, "add", "README.md")
+
+    result = GitPublisher(repo_dir=work).publish_sync([Artifact(str(work / "index.html"), "<p>hi</p>")])
+
+    assert result.success, result.error
+    assert git(remote, "show", "--name-only", "--format=", "main") == "index.html"
+    assert "scratch.txt" in git(work, "status", "--porcelain")
+    assert git(work, "diff", "--cached", "--name-only") == "README.md"
+
+
+def test_publish_unchanged_artifact_skips_commit(tmp_path):
+    work, remote = make_repo(tmp_path)
+    publisher = GitPublisher(repo_dir=work)
+    first = publisher.publish_sync([Artifact(str(work / "index.html"), "<p>hi</p>")])
+    second = publisher.publish_sync([Artifact(str(work / "index.html"), "<p>hi</p>")])
+
+    assert first.committed and first.success
+    assert not second.committed and second.success
+    assert second.commit == first.commit
+
+
+def test_publish_reports_push_failure(tmp_path):
+    work, _ = make_repo(tmp_path)
+    publisher = GitPublisher(repo_dir=work, remote=str(tmp_path / "missing.git"))
+
+    result = publisher.publish_sync([Artifact(str(work / "index.html"), "<p>hi</p>")])
+
+    assert not result.success
+    assert result.committed
+    assert "push" in result.error
+    assert (work / "index.html").read_text() == "<p>hi</p>"
+
+
+def test_publish_refuses_a_checkout_of_another_branch(tmp_path):
+    work, remote = make_repo(tmp_path)
+    git(work, "checkout", "-b", "feature")
+    result = GitPublisher(repo_dir=work).publish_sync([Artifact(str(work / "index.html"), "<p>hi</p>")])
+
+    assert "feature is checked out, not main" in result.error and not result.retryable
+    assert git(remote, "rev-list", "--count", "main") == "1"
+    assert git(work, "rev-list", "--count", "feature") == "1"
+
+
+def test_queue_fails_deterministic_errors_at_once(tmp_path):
+    work, _ = make_repo(tmp_path)
+    queue = PublishQueue(GitPublisher(repo_dir=work), path=tmp_path / "queue.sqlite3", base_delay=0.1)
+    job_id = queue.enqueue([Artifact(str(tmp_path / "outside.html"), "<p>hi</p>")])
+    job = queue.wait(job_id, timeout=30)
+    queue.stop(timeout=5)
+
+    assert job["status"] == FAILED and job["attempts"] == 1
+    assert "is not in the subpath" in job["error"]
+
+
+def test_queue_publishes_jobs_in_background(tmp_path):
+    work, remote = make_repo(tmp_path)
+    queue = PublishQueue(GitPublisher(repo_dir=work), path=tmp_path / "queue.sqlite3")
+
+    job_id = queue.enqueue([Artifact(str(work / "index.html"), "<p>queued</p>")])
+    job = queue.wait(job_id, timeout=30)
+    queue.stop(timeout=5)
+
+    assert job["status"] == PUBLISHED, job
+    assert job["commit_sha"] == git(remote, "rev-parse", "main")
+    assert set(job["timings"]) == {"write", "stage", "commit", "push"}
+
+
+def test_queue_batches_waiting_jobs_in_order(tmp_path):
+    work, remote = make_repo(tmp_path)
+    queue = PublishQueue(GitPublisher(repo_dir=work), path=tmp_path / "queue.sqlite3", autostart=False)
+    first = queue.enqueue([Artifact(str(work / "index.html"), "<p>first</p>")])
+    second = queue.enqueue([Artifact(str(work / "index.html"), "<p>second</p>")])
+
+    # A new queue on the same file picks the jobs up, as after a restart
+    queue = PublishQueue(GitPublisher(repo_dir=work), path=tmp_path / "queue.sqlite3")
+    jobs = [queue.wait(job_id, timeout=30) for job_id in (first, second)]
+    queue.stop(timeout=5)
+
+    assert [job["status"] for job in jobs] == [PUBLISHED, PUBLISHED]
+    assert jobs[0]["commit_sha"] == jobs[1]["commit_sha"]
+    assert git(remote, "rev-list", "--count", "main") == "2"
+    assert git(remote, "show", "main:index.html") == "<p>second</p>"
+
+
+def test_queue_retries_with_backoff_then_fails(tmp_path):
+    work, _ = make_repo(tmp_path)
+    publisher = GitPublisher(repo_dir=work, remote=str(tmp_path / "missing.git"))
+    queue = PublishQueue(publisher, path=tmp_path / "queue.sqlite3", max_attempts=2, base_delay=0.1)
+
+    job_id = queue.enqueue([Artifact(str(work / "index.html"), "<p>hi</p>")])
+    statuses = set()
+    for _ in range(100):
+        job = queue.status(job_id)
+        statuses.add(job["status"])
+        if job["status"] == FAILED:
+            break
+        time.sleep(0.05)
+    queue.stop(timeout=5)
+
+    assert RETRYING in statuses
+    assert job["status"] == FAILED
+    assert job["attempts"] == 2
+    assert "push" in job["error"]
+
+
+def test_queue_worker_survives_unexpected_errors(tmp_path):
+    work, remote = make_repo(tmp_path)
+
+    class FlakyPublisher(GitPublisher):
+        calls = 0
+
+        def publish_sync(self, *args, **kwargs):
+            FlakyPublisher.calls += 1
+            if FlakyPublisher.calls == 1:
+                raise ValueError("unexpected")
+            return super().publish_sync(*args, **kwargs)
+
+    queue = PublishQueue(FlakyPublisher(repo_dir=work), path=tmp_path / "queue.sqlite3")
+    failed = queue.enqueue([Artifact(str(work / "index.html"), "<p>first</p>")])
+    failed_job = queue.wait(failed, timeout=30)
+    published = queue.enqueue([Artifact(str(work / "index.html"), "<p>second</p>")])
+    published_job = queue.wait(published, timeout=30)
+    queue.stop(timeout=5)
+
+    assert failed_job["status"] == FAILED and "ValueError: unexpected" in failed_job["error"]
+    assert published_job["status"] == PUBLISHED
+    assert git(remote, "show", "main:index.html") == "<p>second</p>"
+
+
+def test_running_jobs_stay_with_their_worker_until_the_lease_expires(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    first = PublishQueue(GitPublisher(repo_dir=tmp_path), path=path, autostart=False, lease_seconds=0.3)
+    job_id = first.enqueue([Artifact(str(tmp_path / "index.html"), "<p>hi</p>")])
+    _, rows, _ = first._claim_batch()
+    assert [row["id"] for row in rows] == [job_id]
+
+    # Another process opening the queue does not take over the job while it is renewed
+    second = PublishQueue(GitPublisher(repo_dir=tmp_path), path=path, autostart=False, lease_seconds=0.3)
+    with first._heartbeat():
+        time.sleep(0.5)
+        _, taken, next_due = second._claim_batch()
+    assert not taken and next_due is not None
+    assert second.status(job_id)["status"] == RUNNING
+
+    # Once the lease lapses the job is taken over, and the first worker's late result is ignored
+    time.sleep(0.4)
+    _, taken, _ = second._claim_batch()
+    assert [row["id"] for row in taken] == [job_id]
+    first._finish_batch(rows, PublishResult(pushed=True, commit="abc"))
+    assert second.status(job_id)["status"] == RUNNING
+    second._finish_batch(taken, PublishResult(pushed=True, commit="def"))
+    assert second.status(job_id)["commit_sha"] == "def"
+
+
+def test_concurrent_workers_never_claim_the_same_job(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    queues = [PublishQueue(GitPublisher(repo_dir=tmp_path), path=path, autostart=False) for _ in range(8)]
+    for i in range(5):
+        queues[0].enqueue([Artifact(str(tmp_path / "index.html"), f"<p>{i}</p>")])
+    barrier = threading.Barrier(len(queues))
+    claimed = []
+
+    def claim(queue):
+        barrier.wait()
+        claimed.extend(row["id"] for row in queue._claim_batch()[1])
+
+    threads = [threading.Thread(target=claim, args=(queue,)) for queue in queues]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == [1, 2, 3, 4, 5]
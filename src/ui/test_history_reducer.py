@@ -0,0 +1,74 @@
+import asyncio
+
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+from history_reducer import SUMMARY_NAME, HistoryReducer, split_html_blocks
+from multi_agent import HtmlBlockExtractor
+
+PAGE = "<div>" + "x" * 400 + "</div>"
+
+
+def message(name, content):
+    role = AuthorRole.USER if name is None else AuthorRole.ASSISTANT
+    return ChatMessageContent(role=role, name=name, content=content)
+
+
+def test_blocks_end_where_the_extractor_ends_them():
+    text = "```html\n<p>a</p>```\nPlease review the layout."
+    assert split_html_blocks(text) == [("html", "```html\n<p>a</p>```"), ("text", "Please review the layout.")]
+    extractor = HtmlBlockExtractor()
+    extractor.feed_message("SoftwareEngineer", text)
+    assert extractor.latest() == "<p>a</p>"
+
+    text = "Intro\n````html\n<pre>```</pre>\n````\nDone\n```html [code] ```"
+    assert [kind for kind, _ in split_html_blocks(text)] == ["text", "html", "text"]
+    assert split_html_blocks("```html\n<p>open") == [("html", "```html\n<p>open")]
+
+
+def test_superseded_html_is_replaced_by_a_reference():
+    reducer = HistoryReducer(token_budget=0)
+    messages = [
+        message(None, "Build a page"),
+        message("SoftwareEngineer", f"v1\n```html\n{PAGE}```\nPlease review."),
+        message("ProductOwner", "Missing a footer."),
+        message("SoftwareEngineer", f"v2\n```html\n{PAGE}<footer>\n```"),
+    ]
+    reduced = asyncio.run(reducer.reduce(messages))
+    assert reduced[1].content == "v1\n[HTML revision 1 omitted: superseded by revision 2 below]\nPlease review."
+    assert reduced[3].content == messages[3].content
+    assert messages[1].content.count(PAGE) == 1
+    assert reducer.artifacts_replaced == 1 and reducer.tokens_saved > 0
+
+
+def test_older_turns_are_summarized_once_and_the_latest_artifact_is_kept():
+    calls = []
+
+    async def summarize(messages):
+        calls.append([m.content for m in messages])
+        return "earlier discussion"
+
+    reducer = HistoryReducer(token_budget=100, keep_recent=2, summarize=summarize)
+    messages = [
+        ChatMessageContent(role=AuthorRole.SYSTEM, content="instructions"),
+        message(None, "Build a page. " * 40),
+        message("SoftwareEngineer", f"```html\n{PAGE}\n```"),
+        message("BusinessAnalyst", "Requirements look covered. " * 10),
+        message("ProductOwner", "Checking."),
+        message("BusinessAnalyst", "Agreed."),
+    ]
+    reduced = asyncio.run(reducer.reduce(messages))
+    assert [m.name for m in reduced] == [None, SUMMARY_NAME, "SoftwareEngineer", "ProductOwner", "BusinessAnalyst"]
+    assert "earlier discussion" in reduced[1].content and PAGE in reduced[2].content
+    assert len(calls) == 1 and len(calls[0]) == 2
+
+    asyncio.run(reducer.reduce(messages))
+    assert len(calls) == 1 and reducer.summaries == 1
+    assert reducer.metrics()["prompts"] == 2 and reducer.tokens_saved > 0
+
+
+def test_prompts_under_budget_are_left_alone():
+    reducer = HistoryReducer(token_budget=6000)
+    messages = [message(None, "Build a page"), message("SoftwareEngineer", f"```html\n{PAGE}\n```")]
+    assert [m.content for m in asyncio.run(reducer.reduce(messages))] == [m.content for m in messages]
+    assert reducer.tokens_saved == 0 and reducer.summaries == 0
@@ -13,13 +13,21 @@ from dotenv import load_dotenv
 import sys
 sys.path.append(str(Path(__file__).parent))
 
-from multi_agent import run_multi_agent, ApprovalTerminationStrategy
+import pytest
+
+import multi_agent
+from multi_agent import run_multi_agent, ApprovalTerminationStrategy, HtmlBlockExtractor
+from history_reducer import HistoryReducer
+from orchestrator import AgentOrchestrator
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.streaming_chat_message_content import StreamingChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
 
 # Load environment variables
 load_dotenv()
 
-async def test_multi_agent():
-    """Test the multi-agent system with a simple request."""
+async def main():
+    """Check the multi-agent system against the configured Azure OpenAI deployment."""
     
     print("🚀 Testing Multi-Agent System...")
     print("=" * 50)
@@ -55,8 +63,9 @@ async def test_multi_agent():
         
         # Mock history with approval message
         class MockMessage:
-            def __init__(self, content):
+            def __init__(self, content, name="ProductOwner"):
                 self.content = content
+                self.name = name
         
         mock_history = [
             MockMessage("This is a test"),
@@ -70,5 +79,201 @@ async def test_multi_agent():
     except Exception as e:
         print(f"❌ Error testing termination strategy: {e}")
 
+    # Test 3: Approval signals are limited by role and scanned incrementally
+    print("\nTest 3: Role-limited approval signals")
+    try:
+        strategy = ApprovalTerminationStrategy()
+
+        class MockAgentMessage:
+            def __init__(self, name, content):
+                self.name = name
+                self.content = content
+
+        history = [MockAgentMessage("BusinessAnalyst", "The order is approved once payment clears.")]
+        quoted = await strategy.should_agent_terminate(None, history)
+        history.append(MockAgentMessage("ProductOwner", "All requirements met. Ready for user approval"))
+        approved = await strategy.should_agent_terminate(None, history)
+        passed = not quoted and approved
+        print(f"✅ Role-limited termination test: {'PASSED' if passed else 'FAILED'}")
+
+    except Exception as e:
+        print(f"❌ Error testing role-limited termination: {e}")
+
+    # Test 4: HTML blocks are extracted while the message streams in
+    print("\nTest 4: Streaming HTML extraction")
+    try:
+        extractor = HtmlBlockExtractor()
+        message = "Here it is:\n````html\n<p>Hi</p>\n```\n<script>let s = `x`;</script>\n````\nDone"
+        for i in range(0, len(message), 4):
+            extractor.feed("SoftwareEngineer", message[i:i + 4])
+        complete = extractor.latest() == "<p>Hi</p>\n```\n<script>let s = `x`;</script>"
+        extractor.feed_message("SoftwareEngineer", "```html\n<div>unterminated")
+        unterminated = extractor.latest("SoftwareEngineer") == "<div>unterminated"
+        passed = complete and unterminated
+        print(f"✅ Streaming HTML extraction test: {'PASSED' if passed else 'FAILED'}")
+
+    except Exception as e:
+        print(f"❌ Error testing HTML extraction: {e}")
+
+    # Test 5: Superseded HTML revisions and old turns are reduced before sending
+    print("\nTest 5: History reduction")
+    try:
+        reducer = HistoryReducer(token_budget=200, keep_recent=2)
+        page = "<div>" + "x" * 400 + "</div>"
+        messages = [
+            ChatMessageContent(role=AuthorRole.SYSTEM, content="instructions"),
+            ChatMessageContent(role=AuthorRole.USER, content="Build a page. " * 40),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, name="SoftwareEngineer", content=f"v1\n```html\n{page}\n```"),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, name="ProductOwner", content="Missing a footer."),
+            ChatMessageContent(role=AuthorRole.ASSISTANT, name="SoftwareEngineer", content=f"v2\n```html\n{page}<footer>\n```"),
+        ]
+        reduced = await reducer.reduce(messages)
+        contents = "\n".join(message.content for message in reduced)
+        passed = ("<footer>" in contents and contents.count(page) == 1
+                  and "superseded" in contents and reducer.tokens_saved > 0)
+        print(f"✅ History reduction test: {'PASSED' if passed else 'FAILED'} ({reducer.report()})")
+
+    except Exception as e:
+        print(f"❌ Error testing history reduction: {e}")
+
+# pytest checks with mocked agents (no Azure OpenAI calls)
+
+def _terminates(*messages):
+    history = [ChatMessageContent(role=role, name=name, content=content) for role, name, content in messages]
+    return asyncio.run(ApprovalTerminationStrategy().should_agent_terminate(None, history))
+
+
+def test_user_prompt_mentioning_approval_does_not_end_the_run():
+    assert not _terminates((AuthorRole.USER, None, "Build a tracker listing approved expenses"))
+    assert not _terminates((AuthorRole.USER, None, "APPROVED"))
+
+
+def test_negated_approval_does_not_end_the_run():
+    assert not _terminates((AuthorRole.ASSISTANT, "ProductOwner", "The footer is missing, so this is NOT APPROVED yet."))
+    assert not _terminates((AuthorRole.ASSISTANT, "ProductOwner", "Not yet approved: the totals are wrong."))
+    assert not _terminates((AuthorRole.ASSISTANT, "ProductOwner", "The budget is PRE-APPROVED, the page is UNAPPROVED."))
+    assert _terminates((AuthorRole.ASSISTANT, "ProductOwner", "Not bad at all. APPROVED."))
+    assert _terminates((AuthorRole.ASSISTANT, "ProductOwner", "All requirements met: READY FOR USER APPROVAL"))
+
+
+def test_fence_closes_at_the_end_of_a_code_line():
+    extractor = HtmlBlockExtractor()
+    extractor.feed_message("SoftwareEngineer", "```html\n<p>x</p>```\nLet me know if you need changes.")
+    assert extractor.latest() == "<p>x</p>"
+
+
+class MockGroupChat:
+    """Plays scripted agent turns, as (agent, chunks), like AgentGroupChat."""
+
+    def __init__(self, turns, error=None):
+        self.turns = turns
+        self.error = error
+        self.history = []
+
+    async def add_chat_message(self, message):
+        self.history.append(message)
+
+    async def invoke_stream(self):
+        for agent, chunks in self.turns:
+            for chunk in chunks:
+                yield StreamingChatMessageContent(role=AuthorRole.ASSISTANT, name=agent, content=chunk, choice_index=0)
+            self.history.append(ChatMessageContent(role=AuthorRole.ASSISTANT, name=agent, content="".join(chunks)))
+        if self.error:
+            raise self.error
+
+    async def invoke(self):
+        for agent, chunks in self.turns:
+            message = ChatMessageContent(role=AuthorRole.ASSISTANT, name=agent, content="".join(chunks))
+            self.history.append(message)
+            yield message
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def mock_agents(monkeypatch):
+    """Replace the kernel, group chat and publishing of stream_multi_agent; returns the approved HTML."""
+    approved = []
+    setup = {}
+
+    def create_group_chat(kernel, history_reducer=None):
+        return setup["chat"], ApprovalTerminationStrategy()
+
+    def handle_approval(html_content):
+        approved.append(html_content)
+        return "Approved", 7
+
+    monkeypatch.setattr(multi_agent, "create_kernel", lambda: None)
+    monkeypatch.setattr(multi_agent, "get_chat_service", lambda: None)
+    monkeypatch.setattr(multi_agent, "create_history_reducer", lambda service: HistoryReducer())
+    monkeypatch.setattr(multi_agent, "create_group_chat", create_group_chat)
+    monkeypatch.setattr(multi_agent, "handle_approval", handle_approval)
+
+    def use(turns, error=None):
+        setup["chat"] = MockGroupChat(turns, error)
+        return approved
+
+    return use
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def test_stream_events_arrive_in_order_and_stop_at_approval(mock_agents):
+    approved = mock_agents([
+        ("BusinessAnalyst", ["Plan", " ready"]),
+        ("SoftwareEngineer", ["```html\n<p>", "Hi</p>\n```"]),
+        ("ProductOwner", ["READY FOR ", "USER APPROVAL"]),
+        ("BusinessAnalyst", ["Never sent"]),
+    ])
+    events = asyncio.run(_collect(multi_agent.stream_multi_agent("Build a page")))
+    summary = [(event["type"], event["agent"], event["content"]) for event in events[:-1]]
+    assert summary == [
+        ("delta", "BusinessAnalyst", "Plan"),
+        ("delta", "BusinessAnalyst", " ready"),
+        ("message", "BusinessAnalyst", "Plan ready"),
+        ("delta", "SoftwareEngineer", "```html\n<p>"),
+        ("delta", "SoftwareEngineer", "Hi</p>\n```"),
+        ("message", "SoftwareEngineer", "```html\n<p>Hi</p>\n```"),
+        ("delta", "ProductOwner", "READY FOR "),
+        ("delta", "ProductOwner", "USER APPROVAL"),
+        ("message", "ProductOwner", "READY FOR USER APPROVAL"),
+        ("message", "System", "Approved"),
+    ]
+    assert events[-2]["publish_job"] == 7
+    assert events[-1]["type"] == "stats"
+    assert approved == ["<p>Hi</p>"]
+
+
+def test_run_multi_agent_returns_messages_without_streaming(mock_agents):
+    approved = mock_agents([
+        ("SoftwareEngineer", ["```html\n<p>Hi</p>\n```"]),
+        ("ProductOwner", ["READY FOR USER APPROVAL"]),
+    ])
+    responses = asyncio.run(run_multi_agent("Build a page"))
+    assert [response["agent"] for response in responses] == ["SoftwareEngineer", "ProductOwner", "System"]
+    assert approved == ["<p>Hi</p>"]
+
+
+def test_stream_errors_reach_the_caller(mock_agents):
+    mock_agents([("BusinessAnalyst", ["Plan"])], error=RuntimeError("deployment unavailable"))
+    events = []
+
+    async def consume():
+        async for event in multi_agent.stream_multi_agent("Build a page"):
+            events.append(event)
+
+    with pytest.raises(RuntimeError, match="deployment unavailable"):
+        asyncio.run(consume())
+    assert [event["type"] for event in events] == ["delta"]
+
+    # app.py reads runs through the orchestrator, whose stream re-raises the failure
+    orchestrator = AgentOrchestrator(runner=multi_agent.stream_multi_agent)
+    run_id = orchestrator.submit("session", "Build a page")
+    with pytest.raises(RuntimeError, match="deployment unavailable"):
+        list(orchestrator.stream(run_id))
+
+
 if __name__ == "__main__":
-    asyncio.run(test_multi_agent())
+    asyncio.run(main())
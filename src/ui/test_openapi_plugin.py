@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import httpx
+from semantic_kernel.kernel import Kernel
+
+from openapi_plugin import OpenApiPluginLoader
+
+SPEC = {
+    "openapi": "3.1.0",
+    "info": {"title": "Work Items API", "version": "1.0.0"},
+    "paths": {
+        "/workitemstates": {
+            "get": {
+                "operationId": "get_work_item_states",
+                "summary": "List work item states",
+                "responses": {"200": {"description": "OK", "content": {"application/json": {"schema": {
+                    "$ref": "#/components/schemas/States"}}}}},
+            }
+        }
+    },
+    "components": {"schemas": {"States": {"type": "array", "items": {"type": "string"}}}},
+}
+
+
+def test_spec_is_compiled_once_and_revalidated_with_its_etag(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append((request.url.path, request.headers.get("if-none-match")))
+        if request.url.path == "/openapi.json":
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304, headers={"ETag": '"v1"'})
+            return httpx.Response(200, content=json.dumps(SPEC).encode(), headers={"ETag": '"v1"'})
+        return httpx.Response(200, json=["New", "Active"])
+
+    transport = httpx.MockTransport(handler)
+
+    async def run(loader, calls=1):
+        kernel = Kernel()
+        for _ in range(calls):
+            await loader.add_to(kernel)
+        result = await kernel.invoke(kernel.get_function("workitems", "get_work_item_states"))
+        await loader.aclose()
+        return str(result)
+
+    loader = OpenApiPluginLoader("workitems", "http://localhost:8000", tmp_path, transport=transport)
+    assert asyncio.run(run(loader, calls=3)) == '["New","Active"]'
+    assert loader.downloads == 1 and loader.compiles == 1
+    assert requests == [("/openapi.json", None), ("/workitemstates", None)]
+
+    requests.clear()
+    restarted = OpenApiPluginLoader("workitems", "http://localhost:8000", tmp_path, transport=transport)
+    assert asyncio.run(run(restarted)) == '["New","Active"]'
+    assert restarted.downloads == 0 and restarted.not_modified == 1
+    assert requests == [("/openapi.json", '"v1"'), ("/workitemstates", None)]
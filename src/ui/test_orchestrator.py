@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+import orchestrator as orchestrator_module
+from orchestrator import DONE, ERROR, AgentOrchestrator, TokenBudget
+
+
+class FakeRunner:
+    """Stands in for stream_multi_agent; user_input is "session:label"."""
+
+    def __init__(self, contents=("done",), delay=0.05, error=None):
+        self.contents = contents
+        self.delay = delay
+        self.error = error
+        self.active = {}
+        self.peak = {}
+        self.times = []
+
+    def _track(self, key, change):
+        self.active[key] = self.active.get(key, 0) + change
+        self.peak[key] = max(self.peak.get(key, 0), self.active[key])
+
+    async def __call__(self, user_input, stream_tokens=True):
+        session = user_input.split(":")[0]
+        self._track("all", 1)
+        self._track(session, 1)
+        try:
+            for content in self.contents:
+                await asyncio.sleep(self.delay)
+                self.times.append(time.monotonic())
+                yield {"type": "message", "agent": "SoftwareEngineer", "content": content}
+            if self.error:
+                raise self.error
+        finally:
+            self._track("all", -1)
+            self._track(session, -1)
+
+
+def run_all(orchestrator, requests):
+    run_ids = [orchestrator.submit(session, f"{session}:{i}") for i, session in enumerate(requests)]
+    return [list(orchestrator.stream(run_id)) for run_id in run_ids]
+
+
+def test_global_cap_limits_concurrent_runs():
+    runner = FakeRunner()
+    orchestrator = AgentOrchestrator(max_concurrent_runs=2, max_runs_per_session=5, runner=runner)
+    results = run_all(orchestrator, [f"session-{i}" for i in range(6)])
+    assert all(len(events) == 1 for events in results)
+    assert runner.peak["all"] == 2
+
+
+def test_session_cap_limits_runs_per_session():
+    runner = FakeRunner()
+    orchestrator = AgentOrchestrator(max_concurrent_runs=10, max_runs_per_session=1, runner=runner)
+    run_all(orchestrator, ["a", "a", "a", "b", "b"])
+    assert runner.peak["a"] == 1 and runner.peak["b"] == 1
+    assert runner.peak["all"] == 2
+
+
+def test_token_budget_charges_reported_usage():
+    class Service:
+        total_tokens = 0
+
+    service = Service()
+    budget = TokenBudget(6000)
+    # The first turn has no earlier total to compare with, so the estimate is charged
+    service.total_tokens = 500
+    budget.charge_service_usage(service, fallback=100)
+    service.total_tokens = 800
+    budget.charge_service_usage(service, fallback=100)
+    assert 5599 <= budget.tokens <= 5601
+
+
+def test_token_budget_holds_turns_until_paid_back():
+    budget = TokenBudget(6000)
+    budget.charge(6050)
+    started = time.monotonic()
+    asyncio.run(budget.wait())
+    assert time.monotonic() - started >= 0.45
+    assert budget.tokens >= 0
+
+
+def test_spent_budget_delays_the_next_turn(monkeypatch):
+    class Service:
+        total_tokens = 0
+
+    monkeypatch.setattr(orchestrator_module, "get_chat_service", lambda deployment_name=None: Service())
+    # 6050 estimated tokens against a budget of 6000 per minute (100 per second)
+    runner = FakeRunner(contents=("x" * 24200, "ok"), delay=0)
+    orchestrator = AgentOrchestrator(tokens_per_minute=6000, runner=runner)
+    run_all(orchestrator, ["a"])
+    assert runner.times[1] - runner.times[0] >= 0.45
+
+
+def test_stream_raises_when_the_run_fails():
+    orchestrator = AgentOrchestrator(runner=FakeRunner(error=ValueError("agent crashed")))
+    run_id = orchestrator.submit("a", "a:0")
+    events = []
+    with pytest.raises(RuntimeError, match="agent crashed"):
+        for event in orchestrator.stream(run_id):
+            events.append(event)
+    assert len(events) == 1
+    assert orchestrator.poll(run_id)["status"] == ERROR
+
+
+def test_poll_reads_events_then_drops_expired_runs():
+    orchestrator = AgentOrchestrator(runner=FakeRunner(contents=("one", "two"), delay=0), run_retention_seconds=0.2)
+    run_id = orchestrator.submit("a", "a:0")
+    list(orchestrator.stream(run_id))
+    first = orchestrator.poll(run_id, cursor=1)
+    assert first["status"] == DONE and len(first["events"]) == 1 and first["cursor"] == 2
+
+    time.sleep(0.25)
+    with pytest.raises(KeyError):
+        orchestrator.poll(run_id)
@@ -0,0 +1,41 @@
+import asyncio
+import sys
+
+from semantic_kernel.kernel import Kernel
+
+from plugin_registry import PluginRegistry
+
+PLUGIN_SOURCE = '''
+from typing import Annotated
+from semantic_kernel.functions import kernel_function
+
+class Greeter:
+    def __init__(self, greeting):
+        self.greeting = greeting
+
+    @kernel_function(description="Greets someone.")
+    def greet(self, name: Annotated[str, "Who to greet"]) -> str:
+        return f"{self.greeting}, {name}"
+'''
+
+
+def test_plugins_are_imported_on_first_call_once_the_manifest_exists(tmp_path, monkeypatch):
+    (tmp_path / "greeter_plugin.py").write_text(PLUGIN_SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    manifest = tmp_path / "manifest.json"
+
+    first = PluginRegistry(manifest)
+    first.register("greeter", "greeter_plugin:Greeter", "Hello")
+    first.add_to(Kernel())
+    assert first.loads == 1 and manifest.exists()
+    del sys.modules["greeter_plugin"]
+
+    registry = PluginRegistry(manifest)
+    registry.register("greeter", "greeter_plugin:Greeter", "Hello")
+    kernel = registry.add_to(Kernel())
+    function = kernel.get_function("greeter", "greet")
+    assert function.description == "Greets someone." and function.parameters[0].schema_data["type"] == "string"
+    assert registry.loads == 0 and "greeter_plugin" not in sys.modules
+
+    result = asyncio.run(kernel.invoke(function, name="Ada"))
+    assert str(result) == "Hello, Ada" and registry.loads == 1
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from rate_limiter import LimiterRegistry, RateLimitedTransport
+
+
+def test_throttled_requests_back_off_and_retry():
+    attempts = []
+
+    def handler(request):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            return httpx.Response(429, headers={"retry-after-ms": "200"})
+        return httpx.Response(200, json={"ok": True})
+
+    registry = LimiterRegistry()
+    registry.configure("api.test", max_concurrency=4)
+    transport = RateLimitedTransport(httpx.MockTransport(handler), registry=registry)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.get("https://api.test/search")
+
+    response = asyncio.run(run())
+    assert response.status_code == 200 and response.json() == {"ok": True}
+    assert attempts[1] - attempts[0] >= 0.2
+    metrics = registry.metrics()["api.test"]
+    assert metrics["throttled"] == 1 and metrics["retries"] == 1 and metrics["in_flight"] == 0
+    assert metrics["limit"] == 2.5
+
+
+def test_token_bucket_paces_requests():
+    registry = LimiterRegistry()
+    registry.configure("api.test", rate=20, burst=1)
+    transport = RateLimitedTransport(httpx.MockTransport(lambda request: httpx.Response(200)), registry=registry)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            started = time.monotonic()
+            await asyncio.gather(*(client.get("https://api.test/") for _ in range(5)))
+            return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.19
+    assert registry.metrics()["api.test"]["requests"] == 5
+
+
+def test_connection_errors_and_server_errors_are_retried():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        if len(attempts) == 2:
+            return httpx.Response(502)
+        return httpx.Response(200, json={"ok": True})
+
+    registry = LimiterRegistry()
+    transport = RateLimitedTransport(httpx.MockTransport(handler), registry=registry)
+
+    async def run(client_transport):
+        async with httpx.AsyncClient(transport=client_transport) as client:
+            return await client.post("https://api.test/chat", json={"prompt": "hi"})
+
+    response = asyncio.run(run(transport))
+    assert response.status_code == 200 and len(attempts) == 3
+    assert all(request.content == b'{"prompt":"hi"}' for request in attempts)
+    metrics = registry.metrics()["api.test"]
+    assert metrics["retries"] == 2 and metrics["throttled"] == 0 and metrics["in_flight"] == 0
+
+    # Once the retries are used up the error reaches the caller
+    attempts.clear()
+    transport = RateLimitedTransport(httpx.MockTransport(handler), registry=registry, max_retries=0)
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(run(transport))
+    assert registry.metrics()["api.test"]["in_flight"] == 0
+
+
+def test_retry_after_on_503_pauses_the_endpoint():
+    limiter = LimiterRegistry().get("api.test")
+
+    async def run():
+        await limiter.acquire()
+        limiter.release(retry_after=0.2)
+        started = time.monotonic()
+        await limiter.acquire()
+        limiter.release()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.19
+    assert limiter.metrics()["throttled"] == 0 and limiter.metrics()["limit"] == 8
+
+
+def test_waiters_are_woken_when_a_slot_is_released():
+    registry = LimiterRegistry()
+    registry.configure("api.test", max_concurrency=1)
+    limiter = registry.get("api.test")
+    acquired = []
+
+    def other_loop():
+        async def wait_for_slot():
+            await limiter.acquire()
+            acquired.append(time.monotonic())
+            limiter.release()
+        asyncio.run(wait_for_slot())
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        thread = threading.Thread(target=other_loop)
+        thread.start()
+        await asyncio.sleep(0.1)
+        # Both callers are queued rather than polling
+        assert len(limiter._waiters) == 2
+        released = time.monotonic()
+        limiter.release()
+        await waiter
+        acquired.append(time.monotonic())
+        limiter.release()
+        await asyncio.to_thread(thread.join)
+        return released
+
+    released = asyncio.run(run())
+    assert len(acquired) == 2 and acquired[0] - released < 0.05
+    assert limiter.metrics()["in_flight"] == 0 and not limiter._waiters
+
+
+def test_cancelled_waiters_leave_the_queue():
+    registry = LimiterRegistry()
+    registry.configure("api.test", max_concurrency=1)
+    limiter = registry.get("api.test")
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not limiter._waiters
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire(), 1)
+        limiter.release()
+
+    asyncio.run(run())
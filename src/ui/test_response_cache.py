@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+from semantic_kernel.connectors.ai.open_ai import AzureChatPromptExecutionSettings
+from semantic_kernel.contents.chat_history import ChatHistory
+
+from response_cache import DiskBackend, MemoryBackend, ResponseCache
+from services import CachedAzureChatCompletion
+
+
+def test_exact_hits_and_misses():
+    cache = ResponseCache(MemoryBackend())
+
+    async def run():
+        await cache.set("a", [{"content": "cached"}])
+        return await cache.get("a"), await cache.get("b")
+
+    assert asyncio.run(run()) == ([{"content": "cached"}], None)
+    assert cache.metrics()["hits"] == 1 and cache.metrics()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    for backend in (MemoryBackend(), DiskBackend(tmp_path / "responses.sqlite3")):
+        cache = ResponseCache(backend, ttl=0.1)
+
+        async def run():
+            await cache.set("a", "value")
+            fresh = await cache.get("a")
+            await asyncio.sleep(0.15)
+            return fresh, await cache.get("a")
+
+        assert asyncio.run(run()) == ("value", None)
+        assert len(backend) == 0
+
+
+def test_disk_entries_survive_a_restart(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    asyncio.run(ResponseCache(DiskBackend(path)).set("a", {"content": "kept"}))
+    assert asyncio.run(ResponseCache(DiskBackend(path)).get("a")) == {"content": "kept"}
+
+
+def test_similar_prompts_hit_only_above_the_threshold():
+    vectors = {"original": [1.0, 0.0, 0.0], "reworded": [0.99, 0.1, 0.0], "different": [0.6, 0.8, 0.0]}
+
+    async def embed(text):
+        return vectors[text]
+
+    cache = ResponseCache(MemoryBackend(), embed=embed, similarity_threshold=0.97)
+
+    async def run():
+        await cache.set("key-original", "answer", namespace="agent", text="original")
+        return (
+            await cache.get("key-reworded", namespace="agent", text="reworded"),
+            await cache.get("key-different", namespace="agent", text="different"),
+            await cache.get("key-other-agent", namespace="other", text="reworded"),
+        )
+
+    assert asyncio.run(run()) == ("answer", None, None)
+    assert cache.metrics()["similar_hits"] == 1 and cache.metrics()["misses"] == 2
+
+
+def test_keys_differ_by_model_and_settings():
+    history = ChatHistory(system_message="You are a Software Engineer.")
+    history.add_user_message("Build a calculator")
+
+    def lookup(deployment_name, temperature):
+        service = CachedAzureChatCompletion(
+            deployment_name=deployment_name, endpoint="https://example.openai.azure.com", api_key="test-key"
+        )
+        return service._cache_lookup(history, AzureChatPromptExecutionSettings(temperature=temperature))
+
+    key, namespace, text = lookup("gpt-a", 0.2)
+    assert lookup("gpt-a", 0.2) == (key, namespace, text)
+    assert text == "Build a calculator"
+    for other_key, other_namespace, _ in (lookup("gpt-b", 0.2), lookup("gpt-a", 0.9)):
+        assert other_key != key and other_namespace != namespace
+
+
+def test_disk_lookups_do_not_block_the_event_loop(tmp_path):
+    backend = DiskBackend(tmp_path / "responses.sqlite3")
+    get = backend.get
+
+    def slow_get(key, ttl):
+        time.sleep(0.2)
+        return get(key, ttl)
+
+    backend.get = slow_get
+    cache = ResponseCache(backend)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    async def run():
+        await asyncio.gather(cache.get("a"), ticker())
+
+    asyncio.run(run())
+    assert ticks[-1] - ticks[0] < 0.18
@@ -0,0 +1,45 @@
+import asyncio
+
+from services import ServiceRegistry
+
+
+def _configure(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com/")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test-key")
+    monkeypatch.setenv("AZURE_OPENAI_CHAT_DEPLOYMENT_NAME", "gpt-test")
+
+
+def test_services_are_reused_within_a_loop(monkeypatch):
+    _configure(monkeypatch)
+    registry = ServiceRegistry()
+
+    async def run():
+        first = registry.get_chat_service()
+        await asyncio.sleep(0)
+        return first, registry.get_chat_service(), registry.get_kernel("test"), registry.get_kernel("test")
+
+    first, second, kernel, same_kernel = asyncio.run(run())
+    assert first is second
+    assert kernel is same_kernel
+
+
+def test_loops_get_their_own_clients_which_close_with_the_loop(monkeypatch):
+    _configure(monkeypatch)
+    registry = ServiceRegistry()
+
+    async def run():
+        service = registry.get_chat_service()
+        await asyncio.sleep(0)
+        return service, service.client._client
+
+    first, first_client = asyncio.run(run())
+    second, second_client = asyncio.run(run())
+    assert first is not second
+    assert first_client is not second_client
+    assert first_client.is_closed and second_client.is_closed
+
+
+def test_services_outside_a_loop_are_not_shared(monkeypatch):
+    _configure(monkeypatch)
+    registry = ServiceRegistry()
+    assert registry.get_chat_service() is not registry.get_chat_service()
@@ -0,0 +1,29 @@
+from semantic_kernel.contents.chat_message_content import ChatMessageContent
+from semantic_kernel.contents.utils.author_role import AuthorRole
+
+from session_history import SessionHistoryStore
+
+
+def message(role, content):
+    return ChatMessageContent(role=role, content=content)
+
+
+def test_sessions_are_separate_bounded_and_reloaded_after_eviction(tmp_path):
+    store = SessionHistoryStore(tmp_path / "sessions.sqlite3", max_active=2, max_messages=3)
+    store.append("a", [message(AuthorRole.USER, "hi from a"), message(AuthorRole.ASSISTANT, "hello a")])
+    store.append("b", [message(AuthorRole.USER, "hi from b")])
+    store.append("c", [message(AuthorRole.USER, "hi from c")])
+    assert store.metrics()["active_sessions"] == 2 and store.evictions == 1
+
+    history = store.get("a")
+    assert [(m.role, m.content) for m in history.messages] == [
+        (AuthorRole.USER, "hi from a"), (AuthorRole.ASSISTANT, "hello a")
+    ]
+    assert store.reloads == 1 and [m.content for m in store.get("b").messages] == ["hi from b"]
+
+    store.append("a", [message(AuthorRole.USER, "again"), message(AuthorRole.ASSISTANT, ""),
+                       message(AuthorRole.ASSISTANT, "welcome back")])
+    assert [m.content for m in store.get("a").messages] == ["hello a", "again", "welcome back"]
+
+    store.reset("b")
+    assert store.get("b").messages == []
@@ -1,11 +1,28 @@
-from fastapi import FastAPI, HTTPException
-import pandas as pd
-from pydantic import BaseModel
-from fastapi.middleware.cors import CORSMiddleware
-import os
+import asyncio
+import atexit
 import csv
+import hashlib
+import io
+import json
+import sqlite3
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import uvicorn
 
+from storage import SqliteStorage
+from store import WorkItemStore, decode_cursor, encode_cursor
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow export is optional
+    pa = None
+
 
 app = FastAPI(
     title="Work Items API",
@@ -23,32 +40,129 @@ class WorkItemsDTO(BaseModel):
     State: str
     Tags: str
 
-# Load CSV data into a DataFrame
-data = pd.read_csv("data/workitems.csv")
-
-workitems = []
-workItemTypes = set()
-workItemStates = set()
-
-def load_work_items_from_csv(file_path):
-    if os.path.exists(file_path):
-        with open(file_path, mode='r', encoding='utf-8-sig') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                print(row)
-                work_item = WorkItemsDTO(
-                    ID=int(row['ID']),
-                    WorkItemType=row['WorkItemType'],
-                    Title=row['Title'],
-                    AssignedTo=row['AssignedTo'],
-                    State=row['State'],
-                    Tags=row['Tags']
-                )
-                workitems.append(work_item)
-                workItemTypes.add(work_item.WorkItemType)
-                workItemStates.add(work_item.State)
-
-load_work_items_from_csv('data/workitems.csv')
+class WorkItemFieldsDTO(BaseModel):
+    """A work item with only the fields requested through ?fields= set."""
+    ID: int
+    WorkItemType: Optional[str] = None
+    Title: Optional[str] = None
+    AssignedTo: Optional[str] = None
+    State: Optional[str] = None
+    Tags: Optional[str] = None
+
+class BulkItemResult(BaseModel):
+    index: int
+    ID: Optional[int] = None
+    status: int
+    detail: Optional[str] = None
+
+class BulkResultDTO(BaseModel):
+    applied: bool
+    results: list[BulkItemResult]
+
+class WorkItemStatsDTO(BaseModel):
+    total: int
+    by_state: dict[str, int]
+    by_type: dict[str, int]
+    by_assignee: dict[str, int]
+    by_tag: dict[str, int]
+
+class WorkItemChangeDTO(BaseModel):
+    sequence: int
+    op: str
+    ID: int
+    item: Optional[WorkItemsDTO] = None
+
+class WorkItemChangesDTO(BaseModel):
+    epoch: str
+    sequence: int
+    reset: bool
+    changes: list[WorkItemChangeDTO]
+
+WORK_ITEM_FIELDS = list(WorkItemsDTO.model_fields)
+MAX_PAGE_SIZE = 1000
+MAX_BULK_ITEMS = 10000
+EXPORT_PAGE_SIZE = 1000
+# The store sequence restarts at 0 with each process, so ETags and change feeds also carry a per-process id
+INSTANCE_ID = uuid.uuid4().hex[:8]
+CHANGE_WAIT_SECONDS = 25
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson")
+BULK_STATUS_DETAILS = {404: "Work item not found", 409: "Work item already exists"}
+
+CSV_PATH = Path(__file__).parent / "data" / "workitems.csv"
+
+# The CSV seeds the SQLite database on first boot; later starts load from the database
+storage = SqliteStorage()
+atexit.register(storage.close)
+workitems = WorkItemStore(storage)
+
+def load_work_items(storage):
+    storage.import_csv_once(CSV_PATH)
+    workitems.load(storage.load())
+
+load_work_items(storage)
+
+class ChangeNotifier:
+    """Lets change-feed requests wait on the event loop for the next store change."""
+
+    def __init__(self):
+        self._loop = None
+        self._event = None
+
+    def on_change(self, sequence):
+        # Store listener: may run on any thread
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def wait(self, timeout):
+        """Wait up to timeout seconds for a change; return False on timeout."""
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._event = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+notifier = ChangeNotifier()
+workitems.add_listener(notifier.on_change)
+
+async def persisted(result):
+    """Wait until the store's changes so far are on disk, then return result."""
+    try:
+        await asyncio.wrap_future(workitems.flush())
+    except sqlite3.Error as e:
+        # The change is applied in memory and stays queued; the writer keeps retrying it
+        raise HTTPException(status_code=503, detail=f"Change accepted but not yet saved: {e}")
+    return result
+
+
+_openapi_etag = None
+
+
+@app.middleware("http")
+async def openapi_etag(request: Request, call_next):
+    """Serve /openapi.json with an ETag and answer If-None-Match with 304, so clients can cache the spec."""
+    global _openapi_etag
+    if request.url.path != app.openapi_url:
+        return await call_next(request)
+    if _openapi_etag is None:
+        schema = json.dumps(app.openapi(), sort_keys=True).encode("utf-8")
+        _openapi_etag = f'"{hashlib.sha256(schema).hexdigest()}"'
+    if _openapi_etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": _openapi_etag})
+    response = await call_next(request)
+    response.headers["ETag"] = _openapi_etag
+    return response
 
 
 app.add_middleware(
@@ -59,59 +173,315 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.get("/workitems", response_model=list[WorkItemsDTO])
-async def get_all_work_items():
-    return workitems
+@app.get("/workitems", response_model=list[WorkItemFieldsDTO], response_model_exclude_unset=True)
+async def get_all_work_items(
+    response: Response,
+    state: Optional[str] = None,
+    type: Optional[str] = Query(None, description="WorkItemType"),
+    assigned_to: Optional[str] = None,
+    tag: Optional[str] = None,
+    title: Optional[str] = Query(None, description="Case-insensitive substring of Title"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. ID,Title,State"),
+    sort: str = Query("ID", description="Field to sort by; prefix with - for descending"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE,
+                                 description="Page size; without it every matching item is returned"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header of the previous page, same sort"),
+):
+    """
+    Return the matching work items, or one page of them with ``limit``; the X-Next-Cursor
+    header is set when more pages follow.
+    """
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    if sort_field not in WORK_ITEM_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by {sort_field}")
+    selected = WORK_ITEM_FIELDS
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in WORK_ITEM_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        # ID is always returned so items can be fetched or updated afterwards
+        selected = ["ID"] + [field for field in selected if field != "ID"]
+
+    filters = query_filters(state, type, assigned_to, tag)
+    try:
+        after = decode_cursor(cursor, sort) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        page, next_key = workitems.query(filters, title, sort_field, descending, after, limit)
+    except TypeError:
+        # A cursor value that does not compare with the sort field
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(next_key, sort)
+    return [WorkItemFieldsDTO(**{field: getattr(item, field) for field in selected}) for item in page]
+
+def query_filters(state, type, assigned_to, tag):
+    """Map filter query parameters to the store's indexed fields."""
+    return {
+        field: value
+        for field, value in (("State", state), ("WorkItemType", type), ("AssignedTo", assigned_to), ("Tags", tag))
+        if value is not None
+    }
+
+def work_item_dict(item):
+    return {field: getattr(item, field) for field in WORK_ITEM_FIELDS}
+
+def export_ndjson(pages):
+    for page in pages:
+        yield "".join(json.dumps(work_item_dict(item)) + "\n" for item in page)
+
+def export_csv(pages):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(WORK_ITEM_FIELDS)
+    for page in pages:
+        writer.writerows([getattr(item, field) for field in WORK_ITEM_FIELDS] for item in page)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_arrow(pages):
+    schema = pa.schema([("ID", pa.int64())] + [(field, pa.string()) for field in WORK_ITEM_FIELDS[1:]])
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for page in pages:
+            columns = [[getattr(item, field) for item in page] for field in WORK_ITEM_FIELDS]
+            writer.write_batch(pa.record_batch(columns, schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+EXPORTERS = {"ndjson": export_ndjson, "csv": export_csv, "arrow": export_arrow}
+
+def bulk_body(item_schema):
+    """OpenAPI request body for a bulk endpoint: a JSON array or NDJSON, one value per line."""
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array", "items": item_schema}},
+        "application/x-ndjson": {"schema": {"type": "string", "description": "One JSON value per line"}},
+    }}}
+
+async def read_bulk_values(request, item_type):
+    """
+    Parse a bulk request body into a list of (value, error) pairs.
+    A JSON array is validated in one pass; per-item errors are only worked out when it fails.
+    """
+    if request.headers.get("content-type", "").split(";")[0].strip() in NDJSON_TYPES:
+        lines = []
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *complete, buffer = buffer.split(b"\n")
+            lines.extend(line for line in complete if line.strip())
+            if len(lines) > MAX_BULK_ITEMS:
+                raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ITEMS} items per request")
+        if buffer.strip():
+            lines.append(buffer)
+        if len(lines) > MAX_BULK_ITEMS:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ITEMS} items per request")
+        adapter = TypeAdapter(item_type)
+        parsed = []
+        for line in lines:
+            try:
+                parsed.append((adapter.validate_json(line), None))
+            except ValidationError as e:
+                parsed.append((None, str(e.errors()[0]["msg"])))
+        return parsed
+
+    body = await request.body()
+    try:
+        values = TypeAdapter(list[item_type]).validate_json(body)
+        parsed = [(value, None) for value in values]
+    except ValidationError:
+        try:
+            raw = TypeAdapter(list).validate_json(body)
+        except ValidationError:
+            raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON")
+        adapter = TypeAdapter(item_type)
+        parsed = []
+        for value in raw:
+            try:
+                parsed.append((adapter.validate_python(value), None))
+            except ValidationError as e:
+                parsed.append((None, str(e.errors()[0]["msg"])))
+    if len(parsed) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ITEMS} items per request")
+    return parsed
+
+async def run_bulk(response, parsed, to_operation, atomic):
+    """Apply the valid operations in one batch and return per-item results in request order."""
+    operations = [(index, to_operation(value)) for index, (value, error) in enumerate(parsed) if error is None]
+    invalid = len(operations) < len(parsed)
+    applied, outcomes = workitems.apply([op for _, op in operations], atomic=atomic, dry_run=atomic and invalid)
+    results = [BulkItemResult(index=index, status=422, detail=error)
+               for index, (value, error) in enumerate(parsed) if error is not None]
+    for (index, (op, payload)), (status, _) in zip(operations, outcomes):
+        item_id = payload.ID if op == "create" else payload[0] if op == "update" else payload
+        results.append(BulkItemResult(index=index, ID=item_id, status=status, detail=BULK_STATUS_DETAILS.get(status)))
+    results.sort(key=lambda result: result.index)
+    if applied:
+        await persisted(None)
+    else:
+        response.status_code = 422 if invalid else 409
+    return BulkResultDTO(applied=applied, results=results)
+
+def update_changes(work_item):
+    """Fields to change for a PUT body; empty fields leave the current value unchanged."""
+    return {field: value for field, value in work_item.model_dump(exclude={"ID"}).items() if value}
+
+@app.post("/workitems/bulk", response_model=BulkResultDTO,
+          openapi_extra=bulk_body({"$ref": "#/components/schemas/WorkItemsDTO"}))
+async def create_work_items(request: Request, response: Response, atomic: bool = True):
+    """Create many work items in one batch. With atomic (default) nothing is created if any item fails."""
+    parsed = await read_bulk_values(request, WorkItemsDTO)
+    return await run_bulk(response, parsed, lambda item: ("create", item), atomic)
+
+@app.put("/workitems/bulk", response_model=BulkResultDTO,
+         openapi_extra=bulk_body({"$ref": "#/components/schemas/WorkItemsDTO"}))
+async def update_work_items(request: Request, response: Response, atomic: bool = True):
+    """Update many work items (matched by ID) in one batch."""
+    parsed = await read_bulk_values(request, WorkItemsDTO)
+    return await run_bulk(response, parsed, lambda item: ("update", (item.ID, update_changes(item))), atomic)
+
+@app.post("/workitems/bulk-delete", response_model=BulkResultDTO, openapi_extra=bulk_body({"type": "integer"}))
+async def delete_work_items(request: Request, response: Response, atomic: bool = True):
+    """Delete many work items, given their IDs, in one batch."""
+    parsed = await read_bulk_values(request, int)
+    return await run_bulk(response, parsed, lambda item_id: ("delete", item_id), atomic)
+
+@app.get("/workitems/stats", response_model=WorkItemStatsDTO)
+async def get_work_item_stats():
+    """Return work item counts by state, type, assignee and tag (an empty AssignedTo means unassigned)."""
+    return workitems.stats()
+
+def change_feed(since, epoch, limit):
+    """Return the changes after since as a WorkItemChangesDTO; a client from another epoch must reload."""
+    changes, sequence = workitems.changes_since(since if epoch in (None, INSTANCE_ID) else -1, limit)
+    if changes is None:
+        return WorkItemChangesDTO(epoch=INSTANCE_ID, sequence=sequence, reset=True, changes=[])
+    return WorkItemChangesDTO(epoch=INSTANCE_ID, sequence=sequence, reset=False, changes=[
+        WorkItemChangeDTO(sequence=seq, op=op, ID=item.ID, item=None if op == "delete" else work_item_dict(item))
+        for seq, op, item in changes
+    ])
+
+@app.get("/workitems/changes", response_model=WorkItemChangesDTO)
+async def get_work_item_changes(
+    since: int = Query(0, description="sequence of the previous response"),
+    epoch: Optional[str] = Query(None, description="epoch of the previous response"),
+    timeout: float = Query(CHANGE_WAIT_SECONDS, ge=0, le=60, description="Seconds to wait for a change"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Long-poll for creates, updates and deletes after since. Returns as soon as there are changes,
+    or empty after timeout. When reset is set the change log no longer reaches back to since (or
+    the server restarted): reload the items, then continue from the returned sequence.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        feed = change_feed(since, epoch, limit)
+        remaining = deadline - asyncio.get_running_loop().time()
+        if feed.reset or feed.changes or remaining <= 0:
+            return feed
+        await notifier.wait(remaining)
+
+@app.get("/workitems/changes/stream", response_class=StreamingResponse,
+         responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_work_item_changes(request: Request, since: int = 0, epoch: Optional[str] = None):
+    """
+    Server-sent events for every change after since. Event ids are "epoch-sequence", so a
+    reconnecting EventSource resumes through Last-Event-ID; a "reset" event means reload.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and "-" in last_event_id:
+        epoch, _, last_sequence = last_event_id.rpartition("-")
+        since = int(last_sequence) if last_sequence.isdigit() else since
+
+    async def events():
+        nonlocal since, epoch
+        while not await request.is_disconnected():
+            feed = change_feed(since, epoch, MAX_PAGE_SIZE)
+            epoch, since = feed.epoch, feed.sequence
+            if feed.reset:
+                yield f"id: {epoch}-{since}\nevent: reset\ndata: {json.dumps({'sequence': since})}\n\n"
+                continue
+            for change in feed.changes:
+                yield f"id: {epoch}-{change.sequence}\nevent: {change.op}\ndata: {change.model_dump_json()}\n\n"
+            if not feed.changes and not await notifier.wait(CHANGE_WAIT_SECONDS):
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/workitems/export", response_class=StreamingResponse, responses={
+    200: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}},
+    304: {"description": "The backlog has not changed since the ETag in If-None-Match"},
+})
+async def export_work_items(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+    state: Optional[str] = None,
+    type: Optional[str] = Query(None, description="WorkItemType"),
+    assigned_to: Optional[str] = None,
+    tag: Optional[str] = None,
+    title: Optional[str] = Query(None, description="Case-insensitive substring of Title"),
+):
+    """Stream matching work items in ID order as NDJSON, CSV or Arrow IPC, a page at a time."""
+    if format == "arrow" and pa is None:
+        raise HTTPException(status_code=406, detail="Arrow export needs pyarrow installed")
+    filters = query_filters(state, type, assigned_to, tag)
+    # Weak: pages are read one at a time, so writes during a long export can show up in it
+    query_hash = hashlib.sha256(json.dumps([format, filters, title], sort_keys=True).encode()).hexdigest()[:16]
+    etag = f'W/"{INSTANCE_ID}-{workitems.sequence}-{query_hash}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    pages = workitems.iter_pages(filters, title, EXPORT_PAGE_SIZE)
+    return StreamingResponse(
+        EXPORTERS[format](pages),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"ETag": etag, "Content-Disposition": f'attachment; filename="workitems.{format}"'},
+    )
 
 @app.get("/workitems/{id}", response_model=WorkItemsDTO)
 async def get_work_item_by_id(id: int):
-    work_item = next((item for item in workitems if item.ID == id), None)
+    work_item = workitems.get(id)
     if not work_item:
         raise HTTPException(status_code=404, detail="Work item not found")
     return work_item
 
 @app.post("/workitems", response_model=WorkItemsDTO, status_code=201)
 async def create_work_item(new_work_item: WorkItemsDTO):
-    workitems.append(new_work_item)
-    workItemTypes.add(new_work_item.WorkItemType)
-    workItemStates.add(new_work_item.State)
-    return new_work_item
+    try:
+        return await persisted(workitems.add(new_work_item))
+    except KeyError:
+        raise HTTPException(status_code=409, detail="Work item already exists")
 
 @app.put("/workitems/{id}", response_model=WorkItemsDTO)
 async def update_work_item(id: int, updated_work_item: WorkItemsDTO):
-    work_item = next((item for item in workitems if item.ID == id), None)
+    work_item = workitems.update(id, update_changes(updated_work_item))
     if not work_item:
         raise HTTPException(status_code=404, detail="Work item not found")
-    if updated_work_item.WorkItemType:
-        work_item.WorkItemType = updated_work_item.WorkItemType
-        workItemTypes.add(updated_work_item.WorkItemType)
-    if updated_work_item.Title:
-        work_item.Title = updated_work_item.Title
-    if updated_work_item.AssignedTo:
-        work_item.AssignedTo = updated_work_item.AssignedTo
-    if updated_work_item.State:
-        work_item.State = updated_work_item.State
-        workItemStates.add(updated_work_item.State)
-    if updated_work_item.Tags:
-        work_item.Tags = updated_work_item.Tags
-    return work_item
+    return await persisted(work_item)
 
 @app.delete("/workitems/{id}", status_code=204)
 async def delete_work_item(id: int):
-    global workitems
-    work_item = next((item for item in workitems if item.ID == id), None)
+    work_item = workitems.delete(id)
     if not work_item:
         raise HTTPException(status_code=404, detail="Work item not found")
-    workitems = [item for item in workitems if item.ID != id]
+    await persisted(None)
     return
 
 @app.get("/workitemtypes", response_model=list[str])
 async def get_work_item_types():
-    return list(workItemTypes)
+    return workitems.values("WorkItemType")
 
 @app.get("/workitemstates", response_model=list[str])
 async def get_work_item_states():
-    return list(workItemStates)
+    return workitems.values("State")
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+SQLite persistence for the work item store.
+
+On first boot the CSV is imported into an embedded SQLite database in one
+transaction; every later start loads the rows straight from the database, so the
+CSV is never parsed again and changes survive restarts. Mutations are written
+through by one writer thread that commits everything queued since its last commit
+as a single transaction (group commit). ``flush`` returns a future that completes
+once every change queued before it is durable, so the API acknowledges a write only
+after it is on disk. A failed commit is rolled back and its changes stay queued, ahead
+of newer ones, and are retried with backoff; pending flushes fail with the error, and
+``close`` raises if changes are still unwritten.
+"""
+
+import csv
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+from store import WORK_ITEM_FIELDS as FIELDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.getenv("WORKITEMS_DB_PATH", str(Path(__file__).parent / "data" / "workitems.sqlite3"))
+# Backoff between attempts to commit a batch that failed
+RETRY_DELAY_SECONDS = 0.1
+MAX_RETRY_DELAY_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workitems (
+    ID INTEGER PRIMARY KEY,
+    WorkItemType TEXT NOT NULL,
+    Title TEXT NOT NULL,
+    AssignedTo TEXT NOT NULL,
+    State TEXT NOT NULL,
+    Tags TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class SqliteStorage:
+    """Write-through SQLite storage with a single group-committing writer thread."""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = str(path)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        # WAL keeps readers off the writer's lock; FULL syncs each (batched) commit to disk
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        with self._db:
+            self._db.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._pending = []
+        self._waiters = []
+        self._queued = 0
+        self._committed = 0
+        self._closing = False
+        # Error of the last failed commit, cleared by the next successful one
+        self.error = None
+        self._writer = threading.Thread(target=self._run, name="workitems-writer", daemon=True)
+        self._writer.start()
+
+    def import_csv_once(self, csv_path):
+        """Import the CSV on first boot; return the number of rows imported (0 if already done)."""
+        with self._db_lock, self._db:
+            if self._db.execute("SELECT 1 FROM meta WHERE key = 'csv_imported'").fetchone():
+                return 0
+            rows = []
+            if os.path.exists(csv_path):
+                with open(csv_path, mode='r', encoding='utf-8-sig') as file:
+                    rows = [tuple(row[field] or "" for field in FIELDS) for row in csv.DictReader(file)]
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO workitems ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                rows,
+            )
+            self._db.execute("INSERT INTO meta (key, value) VALUES ('csv_imported', ?)", (str(csv_path),))
+            return len(rows)
+
+    def load(self):
+        """Return every stored row as a tuple of FIELDS values, in ID order."""
+        with self._db_lock:
+            return self._db.execute(f"SELECT {', '.join(FIELDS)} FROM workitems ORDER BY ID").fetchall()
+
+    def put(self, item):
+        """Queue an insert or update of an item."""
+        self.write([("put", item)])
+
+    def delete(self, item_id):
+        """Queue a delete."""
+        self.write([("delete", item_id)])
+
+    def write(self, changes):
+        """Queue ("put", item) and ("delete", item_id) changes; they are committed in one transaction."""
+        ops = [
+            (op, tuple(getattr(payload, field) for field in FIELDS) if op == "put" else payload)
+            for op, payload in changes
+        ]
+        with self._condition:
+            if self._closing:
+                raise RuntimeError("Storage is closed")
+            self._pending.extend(ops)
+            self._queued += len(ops)
+            self._condition.notify_all()
+
+    def flush(self):
+        """Return a Future that completes when every change queued so far has been committed."""
+        future = Future()
+        with self._condition:
+            if self._committed >= self._queued:
+                future.set_result(None)
+            else:
+                self._waiters.append((self._queued, future))
+        return future
+
+    def close(self, timeout=30):
+        """Commit the queued changes and stop the writer; raise RuntimeError if some could not be written."""
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._writer.join(timeout)
+        with self._condition:
+            unwritten = self._queued - self._committed
+        if unwritten:
+            raise RuntimeError(f"{unwritten} work item changes were not written: {self.error}") from self.error
+
+    def _run(self):
+        delay = RETRY_DELAY_SECONDS
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing:
+                    self._condition.wait()
+                if not self._pending and self._closing:
+                    return
+                batch, self._pending = self._pending, []
+                batch_end = self._queued
+            try:
+                self._write(batch)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to write {len(batch)} work item changes, retrying in {delay:.1f}s: {e}")
+                with self._condition:
+                    # The transaction was rolled back, so the whole batch goes back in front
+                    self._pending[:0] = batch
+                    self.error = e
+                    failed, self._waiters = self._waiters, []
+                    closing = self._closing
+                for _, future in failed:
+                    future.set_exception(e)
+                if closing:
+                    # One last attempt was made; close() reports what is left
+                    return
+                with self._condition:
+                    self._condition.wait_for(lambda: self._closing, delay)
+                delay = min(MAX_RETRY_DELAY_SECONDS, delay * 2)
+                continue
+            delay = RETRY_DELAY_SECONDS
+            with self._condition:
+                self.error = None
+                self._committed = batch_end
+                done = [(target, future) for target, future in self._waiters if target <= batch_end]
+                self._waiters = [(target, future) for target, future in self._waiters if target > batch_end]
+            for _, future in done:
+                future.set_result(None)
+
+    def _write(self, batch):
+        with self._db_lock, self._db:
+            for op, payload in batch:
+                if op == "put":
+                    self._db.execute(
+                        f"INSERT OR REPLACE INTO workitems ({', '.join(FIELDS)}) "
+                        f"VALUES ({', '.join('?' * len(FIELDS))})",
+                        payload,
+                    )
+                else:
+                    self._db.execute("DELETE FROM workitems WHERE ID = ?", (payload,))
@@ -0,0 +1,407 @@
+"""
+In-memory work item store with a primary-key index and secondary indexes.
+
+Items are kept in a dict keyed by ID, so lookups, updates and deletes take O(1)
+time instead of scanning a list. ``State``, ``WorkItemType``, ``AssignedTo`` and
+each tag have a secondary index (value -> set of IDs) that is kept in step on every
+write. A sorted ID list, and a sorted (value, ID) list per other field, serve ordered
+pages by bisection from the cursor. A single re-entrant
+lock guards the store, so concurrent requests never see an index out of step with
+the items.
+
+With a ``storage`` (see ``storage.py``) every change is also queued for write-through,
+in the same order it was applied in memory. Every change also gets the next number of
+a monotonic sequence and goes into a bounded change log, from which clients can catch
+up incrementally with ``changes_since``.
+"""
+
+import base64
+import bisect
+import heapq
+import itertools
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, fields, replace
+
+# Changes kept for change-feed clients; older clients must reload
+CHANGE_LOG_SIZE = int(os.getenv("WORKITEMS_CHANGE_LOG_SIZE", "10000"))
+
+# Secondary indexes: field name -> function returning the index keys of an item
+INDEXED_FIELDS = {
+    "State": lambda item: [item.State],
+    "WorkItemType": lambda item: [item.WorkItemType],
+    "AssignedTo": lambda item: [item.AssignedTo],
+    "Tags": lambda item: split_tags(item.Tags),
+}
+
+
+@dataclass(slots=True)
+class WorkItem:
+    """A stored work item; a slotted dataclass so large backlogs load and index quickly."""
+    ID: int
+    WorkItemType: str
+    Title: str
+    AssignedTo: str
+    State: str
+    Tags: str
+
+
+WORK_ITEM_FIELDS = tuple(field.name for field in fields(WorkItem))
+
+
+def as_work_item(item):
+    """Return a WorkItem with the fields of any object that has them (e.g. a request DTO)."""
+    if isinstance(item, WorkItem):
+        return item
+    return WorkItem(*(getattr(item, field) for field in WORK_ITEM_FIELDS))
+
+
+def split_tags(tags):
+    """Split an Azure DevOps tag string ("a; b") into tags."""
+    return [tag.strip() for tag in (tags or "").split(";") if tag.strip()]
+
+
+def encode_cursor(key, sort="ID"):
+    """Encode a (sort value, ID) key and the sort it was made for (e.g. "-Title") as an opaque page cursor."""
+    return base64.urlsafe_b64encode(json.dumps([sort, *key]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, sort="ID"):
+    """Decode a page cursor made for sort; raise ValueError if it is malformed or made for another sort."""
+    try:
+        cursor_sort, value, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if cursor_sort != sort:
+        raise ValueError(f"Cursor was made for sort={cursor_sort}, not sort={sort}")
+    return value, item_id
+
+
+class WorkItemStore:
+    """Thread-safe store of work items indexed by ID and by the fields in INDEXED_FIELDS."""
+
+    def __init__(self, storage=None, change_log_size=CHANGE_LOG_SIZE):
+        self.storage = storage
+        # Sequence number of the latest change; starts at 0 in each process
+        self.sequence = 0
+        self._changes = deque(maxlen=change_log_size)
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._items = {}
+        self._sorted_ids = []
+        # Sort indexes: field -> sorted list of (value, ID)
+        self._sort_keys = {field: [] for field in WORK_ITEM_FIELDS if field != "ID"}
+        self._indexes = {field: {} for field in INDEXED_FIELDS}
+        self._stats = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def _index(self, item):
+        for field, keys_of in INDEXED_FIELDS.items():
+            index = self._indexes[field]
+            for key in keys_of(item):
+                index.setdefault(key, set()).add(item.ID)
+
+    def _unindex(self, item):
+        for field, keys_of in INDEXED_FIELDS.items():
+            index = self._indexes[field]
+            for key in keys_of(item):
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(item.ID)
+                    if not ids:
+                        del index[key]
+
+    def load(self, rows):
+        """Add rows of WORK_ITEM_FIELDS values read from storage, without writing them back."""
+        with self._lock:
+            loaded = [WorkItem(*row) for row in rows]
+            for item in loaded:
+                self._items[item.ID] = item
+            self._sorted_ids = sorted(self._items)
+            for field in self._sort_keys:
+                self._sort_keys[field] = sorted((getattr(item, field), item.ID) for item in self._items.values())
+            for field, keys_of in INDEXED_FIELDS.items():
+                index = self._indexes[field]
+                for item in loaded:
+                    for key in keys_of(item):
+                        index.setdefault(key, set()).add(item.ID)
+
+    def flush(self):
+        """Return a Future that completes once the changes made so far are persisted."""
+        if self.storage is None:
+            future = Future()
+            future.set_result(None)
+            return future
+        return self.storage.flush()
+
+    def all(self):
+        """Return every item in insertion order."""
+        with self._lock:
+            return list(self._items.values())
+
+    def get(self, item_id):
+        """Return the item with this ID, or None."""
+        with self._lock:
+            return self._items.get(item_id)
+
+    def add(self, item):
+        """Add an item; raise KeyError if its ID is taken."""
+        item = as_work_item(item)
+        with self._lock:
+            if item.ID in self._items:
+                raise KeyError(item.ID)
+            self._record([self._insert(item)])
+            return item
+
+    def update(self, item_id, changes):
+        """Apply a dict of field changes to an item and return it, or None if it does not exist."""
+        with self._lock:
+            if item_id not in self._items:
+                return None
+            change = self._replace(item_id, changes)
+            self._record([change])
+            return change[1]
+
+    def delete(self, item_id):
+        """Remove an item and return it, or None if it does not exist."""
+        with self._lock:
+            if item_id not in self._items:
+                return None
+            change = self._remove(item_id)
+            self._record([change])
+            return change[1]
+
+    def apply(self, operations, atomic=True, dry_run=False):
+        """
+        Apply a batch of ("create", item), ("update", (item_id, changes)) and ("delete", item_id)
+        operations under one lock acquisition, persisted as one transaction.
+
+        Returns (applied, results) with one (status, item or None) per operation, where status
+        is 201, 200 or 204 on success and 404 or 409 on failure. With ``atomic`` nothing is
+        applied if any operation would fail; otherwise the failing ones are skipped. With
+        ``dry_run`` only the statuses are computed.
+        """
+        with self._lock:
+            # Dry run against an overlay of the IDs the batch creates and deletes
+            exists = {}
+            statuses = []
+            for op, payload in operations:
+                if op == "create":
+                    item_id = payload.ID
+                    ok = not exists.get(item_id, item_id in self._items)
+                    statuses.append(201 if ok else 409)
+                    exists[item_id] = True
+                else:
+                    item_id = payload[0] if op == "update" else payload
+                    ok = exists.get(item_id, item_id in self._items)
+                    statuses.append((200 if op == "update" else 204) if ok else 404)
+                    if op == "delete" and ok:
+                        exists[item_id] = False
+            failed = any(status >= 400 for status in statuses)
+            if dry_run or (atomic and failed):
+                return False, [(status, None) for status in statuses]
+
+            changes = []
+            results = []
+            for (op, payload), status in zip(operations, statuses):
+                if status >= 400:
+                    results.append((status, None))
+                    continue
+                if op == "create":
+                    change = self._insert(as_work_item(payload))
+                elif op == "update":
+                    change = self._replace(*payload)
+                else:
+                    change = self._remove(payload)
+                changes.append(change)
+                results.append((status, change[1] if op != "delete" else None))
+            self._record(changes)
+            return True, results
+
+    def _insert(self, item):
+        self._items[item.ID] = item
+        if not self._sorted_ids or item.ID > self._sorted_ids[-1]:
+            self._sorted_ids.append(item.ID)
+        else:
+            bisect.insort(self._sorted_ids, item.ID)
+        for field, keys in self._sort_keys.items():
+            bisect.insort(keys, (getattr(item, field), item.ID))
+        self._index(item)
+        return ("create", item)
+
+    def _replace(self, item_id, changes):
+        item = self._items[item_id]
+        updated = replace(item, **changes)
+        for field, keys in self._sort_keys.items():
+            if getattr(updated, field) != getattr(item, field):
+                del keys[bisect.bisect_left(keys, (getattr(item, field), item_id))]
+                bisect.insort(keys, (getattr(updated, field), item_id))
+        self._unindex(item)
+        self._items[item_id] = updated
+        self._index(updated)
+        return ("update", updated)
+
+    def _remove(self, item_id):
+        item = self._items.pop(item_id)
+        del self._sorted_ids[bisect.bisect_left(self._sorted_ids, item_id)]
+        for field, keys in self._sort_keys.items():
+            del keys[bisect.bisect_left(keys, (getattr(item, field), item_id))]
+        self._unindex(item)
+        return ("delete", item)
+
+    def _record(self, changes):
+        # Called under the store lock, so storage and the change log see changes in the order applied
+        if not changes:
+            return
+        for op, item in changes:
+            self.sequence += 1
+            self._changes.append((self.sequence, op, item))
+        if self.storage is not None:
+            self.storage.write([("delete", item.ID) if op == "delete" else ("put", item) for op, item in changes])
+        for listener in self._listeners:
+            listener(self.sequence)
+
+    def add_listener(self, listener):
+        """Call listener(sequence) after every change. It runs under the store lock, so keep it short."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def changes_since(self, since, limit=1000):
+        """
+        Return (changes, sequence) with up to ``limit`` (sequence, op, item) changes after ``since``,
+        and the sequence to pass next time. Changes is None when ``since`` is older than the change
+        log (or from before a restart) and the client has to reload.
+        """
+        with self._lock:
+            first = self._changes[0][0] if self._changes else self.sequence + 1
+            if since > self.sequence or since < first - 1:
+                return None, self.sequence
+            start = since - first + 1
+            changes = list(itertools.islice(self._changes, start, start + limit))
+            return changes, changes[-1][0] if changes else since
+
+    def ids_for(self, field, value):
+        """Return the IDs of items whose indexed field has this value (a tag, for Tags)."""
+        with self._lock:
+            return set(self._indexes[field].get(value, ()))
+
+    def values(self, field):
+        """Return the distinct values of an indexed field."""
+        with self._lock:
+            return list(self._indexes[field])
+
+    def counts(self, field):
+        """Return {value: number of items} for an indexed field; values no item uses are dropped."""
+        with self._lock:
+            return {value: len(ids) for value, ids in self._indexes[field].items()}
+
+    def stats(self):
+        """
+        Return the item total and the counts per state, type, assignee and tag.
+
+        The counts are the sizes of the secondary index sets, which every change keeps up to
+        date, and the result is cached until the next change, so repeated calls cost nothing.
+        """
+        with self._lock:
+            if self._stats is None or self._stats[0] != self.sequence:
+                self._stats = (self.sequence, {
+                    "total": len(self._items),
+                    "by_state": self.counts("State"),
+                    "by_type": self.counts("WorkItemType"),
+                    "by_assignee": self.counts("AssignedTo"),
+                    "by_tag": self.counts("Tags"),
+                })
+            return self._stats[1]
+
+    def query(self, filters=None, title=None, sort="ID", descending=False, after=None, limit=100):
+        """
+        Return up to ``limit`` (None for all) matching items in sort order, and the key to
+        pass as ``after`` for the next page (None on the last page).
+
+        ``filters`` maps indexed fields to a value; the smallest matching ID set is used
+        first and intersected with the others. ``title`` is a case-insensitive substring.
+        Items are ordered by (sort field, ID) and ``after`` is the last key of the previous page.
+        Pages are read off the field's sort index from the cursor, except when the filters
+        leave so few IDs that sorting those is cheaper than walking the index past the
+        items they skip.
+        """
+        title = title.lower() if title else None
+        with self._lock:
+            ids = None
+            for field, value in sorted((filters or {}).items(), key=lambda f: len(self._indexes[f[0]].get(f[1], ()))):
+                matching = self._indexes[field].get(value, set())
+                ids = set(matching) if ids is None else ids & matching
+                if not ids:
+                    return [], None
+
+            count = None if limit is None else limit + 1
+            # A walk passes about count * len(items) / len(ids) keys to find a page
+            if ids is None or (count is not None and len(ids) ** 2 > count * len(self._items)):
+                keys = self._sorted_ids if sort == "ID" else self._sort_keys[sort]
+                page = self._walk(keys, sort == "ID", ids, title, descending, after, count)
+            else:
+                candidates = (self._items[item_id] for item_id in ids)
+
+                def sort_key(item):
+                    return getattr(item, sort), item.ID
+
+                def wanted(item):
+                    if title is not None and title not in item.Title.lower():
+                        return False
+                    if after is None:
+                        return True
+                    return sort_key(item) < tuple(after) if descending else sort_key(item) > tuple(after)
+
+                if count is None:
+                    page = sorted(filter(wanted, candidates), key=sort_key, reverse=descending)
+                else:
+                    select = heapq.nlargest if descending else heapq.nsmallest
+                    page = select(count, filter(wanted, candidates), key=sort_key)
+
+        if limit is None or len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        return page, (getattr(page[-1], sort), page[-1].ID)
+
+    def iter_pages(self, filters=None, title=None, page_size=1000):
+        """
+        Yield matching items in ID order, one page at a time. The lock is only held while a
+        page is read, so writers are not blocked for the length of an export.
+        """
+        after = None
+        while True:
+            page, after = self.query(filters, title, after=after, limit=page_size)
+            if page:
+                yield page
+            if after is None:
+                return
+
+    def _walk(self, keys, by_id, ids, title, descending, after, count):
+        """
+        Walk a sorted ID list (by_id) or (value, ID) list from the cursor, keeping items in ids
+        (None for all) that match title, and stop after count (None for no limit) matches.
+        """
+        if after is not None:
+            after = after[1] if by_id else tuple(after)
+        if descending:
+            start = bisect.bisect_left(keys, after) if after is not None else len(keys)
+            walk = (keys[i] for i in range(start - 1, -1, -1))
+        else:
+            start = bisect.bisect_right(keys, after) if after is not None else 0
+            walk = (keys[i] for i in range(start, len(keys)))
+        page = []
+        for key in walk:
+            item_id = key if by_id else key[1]
+            if ids is not None and item_id not in ids:
+                continue
+            item = self._items[item_id]
+            if title is None or title in item.Title.lower():
+                page.append(item)
+                if len(page) == count:
+                    break
+        return page
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import threading
+import time
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(str(Path(__file__).parent))
+# Importing the API opens its database; keep it out of data/
+os.environ.setdefault("WORKITEMS_DB_PATH", str(Path(tempfile.mkdtemp()) / "workitems.sqlite3"))
+
+import api
+from storage import SqliteStorage
+from store import WorkItemStore
+
+ROWS = [
+    (1, "Bug", "Broken link", "ana", "New", "ui"),
+    (2, "Epic", "Payments", "", "Active", "billing;ui"),
+    (3, "Task", "Write docs", "ben", "New", ""),
+]
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+def item(item_id, title="Item", state="New"):
+    return {"ID": item_id, "WorkItemType": "Task", "Title": title, "AssignedTo": "", "State": state, "Tags": ""}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    storage = SqliteStorage(tmp_path / "workitems.sqlite3")
+    store = WorkItemStore(storage)
+    store.load(ROWS)
+    notifier = api.ChangeNotifier()
+    store.add_listener(notifier.on_change)
+    monkeypatch.setattr(api, "workitems", store)
+    monkeypatch.setattr(api, "notifier", notifier)
+    yield store
+    storage.close()
+
+
+@pytest.fixture
+def client(store):
+    with TestClient(api.app) as client:
+        yield client
+
+
+def test_list_returns_every_item_unless_a_limit_is_given(client, store):
+    for item_id in range(4, 204):
+        store.add(api.WorkItemsDTO(**item(item_id)))
+    response = client.get("/workitems")
+    assert len(response.json()) == 203 and "x-next-cursor" not in response.headers
+    assert response.json()[0] == dict(zip(api.WORK_ITEM_FIELDS, ROWS[0]))
+
+
+def test_list_filters_and_projects_fields(client):
+    response = client.get("/workitems?state=New&fields=Title,State")
+    assert response.json() == [{"ID": 1, "Title": "Broken link", "State": "New"},
+                               {"ID": 3, "Title": "Write docs", "State": "New"}]
+    assert [row["ID"] for row in client.get("/workitems?tag=ui&type=Epic").json()] == [2]
+    assert [row["ID"] for row in client.get("/workitems?title=DOCS").json()] == [3]
+    assert client.get("/workitems?fields=ID,Owner").status_code == 400
+    assert client.get("/workitems?sort=Owner").status_code == 400
+
+
+def test_list_pages_follow_the_cursor_header(client):
+    titles, cursor = [], None
+    while True:
+        response = client.get("/workitems", params={"sort": "-Title", "limit": 2, "cursor": cursor})
+        titles += [row["Title"] for row in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert titles == ["Write docs", "Payments", "Broken link"]
+
+
+def test_list_rejects_invalid_cursors_and_cursors_of_another_sort(client):
+    cursor = client.get("/workitems?sort=-Title&limit=1").headers["x-next-cursor"]
+    response = client.get("/workitems", params={"sort": "ID", "limit": 1, "cursor": cursor})
+    assert response.status_code == 400 and "sort=-Title" in response.json()["detail"]
+    assert client.get("/workitems", params={"cursor": "not-a-cursor"}).status_code == 400
+    forged = api.encode_cursor(([1], 1), "Title")
+    assert client.get("/workitems", params={"sort": "Title", "cursor": forged}).status_code == 400
+
+
+def test_bulk_create_accepts_a_json_array(client, store):
+    response = client.post("/workitems/bulk", json=[item(4), item(5)])
+    assert response.status_code == 200
+    assert response.json()["applied"] is True
+    assert [result["status"] for result in response.json()["results"]] == [201, 201]
+    assert store.get(4).Title == "Item" and store.get(5) is not None
+
+
+def test_bulk_ndjson_with_a_malformed_line_is_all_or_nothing(client, store):
+    body = "\n".join([json.dumps(item(4)), "{not json", json.dumps(item(5)), ""])
+    response = client.post("/workitems/bulk", content=body, headers=NDJSON)
+    assert response.status_code == 422
+    results = response.json()["results"]
+    assert response.json()["applied"] is False
+    assert [(result["index"], result["status"]) for result in results] == [(0, 201), (1, 422), (2, 201)]
+    assert results[1]["detail"]
+    assert store.get(4) is None and store.get(5) is None
+
+    response = client.post("/workitems/bulk?atomic=false", content=body, headers=NDJSON)
+    assert response.status_code == 200 and response.json()["applied"] is True
+    assert store.get(4) is not None and store.get(5) is not None
+
+
+def test_bulk_update_and_delete_report_missing_items(client, store):
+    response = client.put("/workitems/bulk", json=[item(1, state="Closed"), item(9)])
+    assert response.status_code == 409
+    assert [result["status"] for result in response.json()["results"]] == [200, 404]
+    assert store.get(1).State == "New"
+
+    response = client.put("/workitems/bulk?atomic=false", json=[item(1, state="Closed"), item(9)])
+    assert response.status_code == 200 and store.get(1).State == "Closed"
+
+    response = client.post("/workitems/bulk-delete", content="2\n3\n", headers=NDJSON)
+    assert [result["status"] for result in response.json()["results"]] == [204, 204]
+    assert store.get(2) is None and store.get(3) is None
+
+
+def test_bulk_rejects_bad_bodies_and_oversized_batches(client, monkeypatch):
+    assert client.post("/workitems/bulk", content="not json",
+                       headers={"Content-Type": "application/json"}).status_code == 400
+    response = client.post("/workitems/bulk", json=[item(4), {"ID": "x"}])
+    assert response.status_code == 422
+    assert [result["status"] for result in response.json()["results"]] == [201, 422]
+
+    monkeypatch.setattr(api, "MAX_BULK_ITEMS", 1)
+    assert client.post("/workitems/bulk", json=[item(4), item(5)]).status_code == 413
+    body = "\n".join(json.dumps(item(i)) for i in (4, 5))
+    assert client.post("/workitems/bulk", content=body, headers=NDJSON).status_code == 413
+
+
+def test_exports_stream_every_format(client):
+    response = client.get("/workitems/export")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["ID"] for line in response.text.splitlines()] == [1, 2, 3]
+
+    response = client.get("/workitems/export?format=csv&state=New")
+    assert response.text.splitlines() == ["ID,WorkItemType,Title,AssignedTo,State,Tags",
+                                          "1,Bug,Broken link,ana,New,ui", "3,Task,Write docs,ben,New,"]
+    assert response.headers["content-disposition"] == 'attachment; filename="workitems.csv"'
+
+    pa = pytest.importorskip("pyarrow")
+    response = client.get("/workitems/export?format=arrow&tag=ui")
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("ID").to_pylist() == [1, 2]
+    assert table.column("Tags").to_pylist() == ["ui", "billing;ui"]
+
+
+def test_export_rejects_unknown_formats_and_missing_pyarrow(client, monkeypatch):
+    assert client.get("/workitems/export?format=xml").status_code == 422
+    monkeypatch.setattr(api, "pa", None)
+    assert client.get("/workitems/export?format=arrow").status_code == 406
+
+
+def test_export_etag_is_weak_and_answers_304_until_items_change(client):
+    etag = client.get("/workitems/export").headers["etag"]
+    assert etag.startswith('W/"')
+    assert client.get("/workitems/export?format=csv").headers["etag"] != etag
+
+    response = client.get("/workitems/export", headers={"If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304 and response.headers["etag"] == etag and not response.content
+
+    client.post("/workitems", json=item(4))
+    response = client.get("/workitems/export", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+
+def test_exports_span_pages(client, monkeypatch):
+    monkeypatch.setattr(api, "EXPORT_PAGE_SIZE", 1)
+    assert len(client.get("/workitems/export").text.splitlines()) == 3
+    assert len(client.get("/workitems/export?format=csv").text.splitlines()) == 4
+
+
+def test_changes_long_poll_returns_at_once_or_waits_for_a_change(client, store):
+    client.post("/workitems", json=item(4))
+    client.delete("/workitems/1")
+    feed = client.get("/workitems/changes?since=0").json()
+    assert feed["epoch"] == api.INSTANCE_ID and feed["reset"] is False and feed["sequence"] == 2
+    assert [(change["op"], change["ID"], change["item"] is None) for change in feed["changes"]] == [
+        ("create", 4, False), ("delete", 1, True)]
+
+    started = time.monotonic()
+    assert client.get("/workitems/changes?since=2&timeout=0.2").json()["changes"] == []
+    assert time.monotonic() - started >= 0.2
+
+    timer = threading.Timer(0.2, lambda: store.add(api.WorkItemsDTO(**item(5))))
+    timer.start()
+    started = time.monotonic()
+    feed = client.get("/workitems/changes?since=2&timeout=10").json()
+    timer.join()
+    assert [change["ID"] for change in feed["changes"]] == [5]
+    assert time.monotonic() - started < 5
+
+
+def test_changes_reset_for_another_epoch_or_a_future_sequence(client):
+    client.post("/workitems", json=item(4))
+    assert client.get("/workitems/changes?since=1&epoch=other").json()["reset"] is True
+    assert client.get("/workitems/changes?since=9&timeout=0").json()["reset"] is True
+    assert client.get("/workitems/changes?timeout=61").status_code == 422
+    assert client.get("/workitems/changes?limit=0").status_code == 422
+
+
+async def read_events(count, query="", last_event_id=None):
+    """
+    Read count server-sent events from the change stream, as (id, event, data) tuples, then disconnect.
+    The stream never ends on its own, so it is driven through ASGI directly (TestClient waits for the end).
+    """
+    headers = [(b"last-event-id", last_event_id.encode())] if last_event_id else []
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": "/workitems/changes/stream", "raw_path": b"/workitems/changes/stream", "root_path": "",
+             "query_string": query.encode(), "headers": headers, "client": ("test", 1), "server": ("test", 80)}
+    events, start, body = [], {}, b""
+    requested = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal body
+        if message["type"] == "http.response.start":
+            start.update(message)
+            return
+        body += message.get("body", b"")
+        while b"\n\n" in body and not disconnected.is_set():
+            block, body = body.split(b"\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in block.decode().splitlines() if not line.startswith(":"))
+            if "event" in fields:
+                events.append((fields["id"], fields["event"], json.loads(fields["data"])))
+            if len(events) == count:
+                disconnected.set()
+
+    await asyncio.wait_for(api.app(scope, receive, send), timeout=10)
+    assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+    return events
+
+
+def test_change_stream_sends_events_and_resumes_from_last_event_id(client, monkeypatch):
+    monkeypatch.setattr(api, "CHANGE_WAIT_SECONDS", 0.1)
+    client.post("/workitems", json=item(4))
+    client.put("/workitems/4", json=item(4, state="Active"))
+
+    async def run():
+        events = [await read_events(2, "since=0")]
+        # A change made while the stream waits is sent as soon as it happens
+        reader = asyncio.ensure_future(read_events(1, "since=2"))
+        await asyncio.sleep(0.3)
+        api.workitems.delete(4)
+        events.append(await reader)
+        events.append(await read_events(1, last_event_id=f"{api.INSTANCE_ID}-2"))
+        events.append(await read_events(1, last_event_id="other-2"))
+        return events
+
+    first, waited, resumed, reset = asyncio.run(run())
+    assert [(event_id, event) for event_id, event, _ in first] == [
+        (f"{api.INSTANCE_ID}-1", "create"), (f"{api.INSTANCE_ID}-2", "update")]
+    assert first[1][2]["item"]["State"] == "Active"
+    assert waited[0][:2] == (f"{api.INSTANCE_ID}-3", "delete")
+    assert resumed[0][:2] == (f"{api.INSTANCE_ID}-3", "delete")
+    assert reset[0][1:] == ("reset", {"sequence": 3})
+
+
+def test_stats_count_items_and_follow_changes(client):
+    assert client.get("/workitems/stats").json() == {
+        "total": 3,
+        "by_state": {"New": 2, "Active": 1},
+        "by_type": {"Bug": 1, "Epic": 1, "Task": 1},
+        "by_assignee": {"ana": 1, "": 1, "ben": 1},
+        "by_tag": {"ui": 2, "billing": 1},
+    }
+
+    client.post("/workitems", json=item(4, state="Active"))
+    client.delete("/workitems/1")
+    stats = client.get("/workitems/stats").json()
+    assert stats["total"] == 3
+    assert stats["by_state"] == {"New": 1, "Active": 2}
+    assert stats["by_type"] == {"Epic": 1, "Task": 2}
+    assert stats["by_assignee"] == {"": 2, "ben": 1}
+    assert stats["by_tag"] == {"ui": 1, "billing": 1}
+
+
+def test_openapi_spec_has_an_etag_and_answers_304(client):
+    response = client.get("/openapi.json")
+    etag = response.headers["etag"]
+    assert response.status_code == 200 and response.json()["info"]["title"] == "Work Items API"
+    response = client.get("/openapi.json", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.headers["etag"] == etag and not response.content
+    assert client.get("/openapi.json", headers={"If-None-Match": '"stale"'}).status_code == 200
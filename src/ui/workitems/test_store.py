@@ -0,0 +1,184 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.append(str(Path(__file__).parent))
+
+from storage import SqliteStorage
+from store import WorkItemStore
+
+
+class Item(BaseModel):
+    ID: int
+    WorkItemType: str = "Bug"
+    Title: str = ""
+    AssignedTo: str = ""
+    State: str = "New"
+    Tags: str = ""
+
+
+def test_indexes_follow_updates_and_deletes():
+    store = WorkItemStore()
+    store.add(Item(ID=1, Tags="ui; payments"))
+    store.add(Item(ID=2, State="Active", AssignedTo="User1"))
+
+    store.update(1, {"State": "Active", "Tags": "ui"})
+    assert store.ids_for("State", "Active") == {1, 2}
+    assert store.ids_for("State", "New") == set()
+    assert store.ids_for("Tags", "payments") == set()
+    assert "New" not in store.values("State")
+
+    assert store.delete(2).ID == 2
+    assert store.delete(2) is None
+    assert store.ids_for("AssignedTo", "User1") == set()
+    assert [item.ID for item in store.all()] == [1]
+
+
+def test_duplicate_ids_are_rejected():
+    store = WorkItemStore()
+    store.add(Item(ID=1))
+    with pytest.raises(KeyError):
+        store.add(Item(ID=1, Title="again"))
+    assert store.get(1).Title == ""
+
+
+def test_query_pages_through_filtered_sorted_items():
+    store = WorkItemStore()
+    for item_id in range(1, 21):
+        store.add(Item(ID=item_id, Title=f"Item {item_id % 4}", State="New" if item_id % 2 else "Active"))
+
+    pages, after = [], None
+    while True:
+        page, after = store.query({"State": "New"}, sort="Title", descending=True, after=after, limit=3)
+        pages.append([item.ID for item in page])
+        if after is None:
+            break
+    expected = sorted((item for item in store.all() if item.State == "New"), key=lambda i: (i.Title, i.ID), reverse=True)
+    assert sum(pages, []) == [item.ID for item in expected]
+    assert all(len(page) == 3 for page in pages[:-1])
+
+    page, after = store.query(title="item 3", after=(5, 5), limit=2)
+    assert [item.ID for item in page] == [7, 11] and after == (11, 11)
+
+
+def test_sort_indexes_follow_updates_and_deletes():
+    store = WorkItemStore()
+    for item_id in range(1, 41):
+        store.add(Item(ID=item_id, Title=f"Item {item_id % 7}", AssignedTo="ana" if item_id % 10 == 0 else ""))
+    store.update(3, {"Title": "Item 9"})
+    store.delete(14)
+
+    def expected(items, field):
+        return [item.ID for item in sorted(items, key=lambda i: (getattr(i, field), i.ID))]
+
+    # Unfiltered and large filter sets walk the sort index; small ones are sorted directly
+    assert [item.ID for item in store.query(sort="Title", limit=None)[0]] == expected(store.all(), "Title")
+    page, _ = store.query({"AssignedTo": ""}, sort="Title", descending=True, limit=5)
+    assert [item.ID for item in page] == expected([i for i in store.all() if not i.AssignedTo], "Title")[::-1][:5]
+    page, after = store.query({"AssignedTo": "ana"}, sort="Title", limit=2)
+    assert [item.ID for item in page] == expected([i for i in store.all() if i.AssignedTo], "Title")[:2]
+    assert after == (page[-1].Title, page[-1].ID)
+
+
+def test_changes_survive_a_restart(tmp_path):
+    csv_path = tmp_path / "workitems.csv"
+    csv_path.write_text("ID,WorkItemType,Title,AssignedTo,State,Tags\n1,Bug,Broken link,,New,\n2,Epic,Payments,,New,\n")
+    storage = SqliteStorage(tmp_path / "workitems.sqlite3")
+    assert storage.import_csv_once(csv_path) == 2
+    store = WorkItemStore(storage)
+    store.load(storage.load())
+    store.update(1, {"State": "Closed"})
+    store.delete(2)
+    store.add(Item(ID=3, Title="New item"))
+    store.flush().result(timeout=5)
+    storage.close()
+
+    storage = SqliteStorage(tmp_path / "workitems.sqlite3")
+    assert storage.import_csv_once(csv_path) == 0
+    store = WorkItemStore(storage)
+    store.load(storage.load())
+    assert [(item.ID, item.State) for item in store.all()] == [(1, "Closed"), (3, "New")]
+    assert store.ids_for("State", "Closed") == {1}
+    storage.close()
+
+
+def test_failed_commit_is_reported_and_retried(tmp_path):
+    storage = SqliteStorage(tmp_path / "workitems.sqlite3")
+    write = storage._write
+    failures = []
+
+    def failing_write(batch):
+        if not failures:
+            failures.append(batch)
+            raise sqlite3.OperationalError("disk I/O error")
+        write(batch)
+
+    storage._write = failing_write
+    store = WorkItemStore(storage)
+    store.add(Item(ID=1, Title="Kept"))
+    with pytest.raises(sqlite3.OperationalError):
+        store.flush().result(timeout=5)
+    store.add(Item(ID=2, Title="Also kept"))
+    store.flush().result(timeout=5)
+    assert storage.error is None
+    storage.close()
+
+    storage = SqliteStorage(tmp_path / "workitems.sqlite3")
+    assert [row[0] for row in storage.load()] == [1, 2]
+
+    def locked(batch):
+        raise sqlite3.OperationalError("database is locked")
+
+    storage._write = locked
+    WorkItemStore(storage).add(Item(ID=3))
+    with pytest.raises(RuntimeError, match="1 work item changes were not written"):
+        storage.close()
+
+
+def test_apply_is_all_or_nothing_when_atomic():
+    store = WorkItemStore()
+    store.add(Item(ID=1))
+
+    applied, results = store.apply([("create", Item(ID=2)), ("delete", 1), ("update", (1, {"State": "Done"}))])
+    assert not applied and [status for status, _ in results] == [201, 204, 404]
+    assert store.get(2) is None and store.get(1) is not None
+
+    applied, results = store.apply([("create", Item(ID=2)), ("create", Item(ID=2))], atomic=False)
+    assert applied and [status for status, _ in results] == [201, 409]
+    assert [item.ID for item in store.all()] == [1, 2]
+
+
+def test_iter_pages_yields_every_item_in_pages():
+    store = WorkItemStore()
+    for item_id in range(1, 8):
+        store.add(Item(ID=item_id))
+    assert store.sequence == 7
+    assert [[item.ID for item in page] for page in store.iter_pages(page_size=3)] == [[1, 2, 3], [4, 5, 6], [7]]
+
+
+def test_stats_follow_changes():
+    store = WorkItemStore()
+    store.add(Item(ID=1, State="New", Tags="ui"))
+    store.add(Item(ID=2, State="New"))
+    assert store.stats()["by_state"] == {"New": 2}
+
+    store.update(1, {"State": "Closed"})
+    store.delete(2)
+    stats = store.stats()
+    assert stats["total"] == 1 and stats["by_state"] == {"Closed": 1} and stats["by_tag"] == {"ui": 1}
+
+
+def test_changes_since_returns_changes_in_order_until_the_log_is_outgrown():
+    store = WorkItemStore(change_log_size=3)
+    store.add(Item(ID=1))
+    store.update(1, {"State": "Active"})
+    changes, sequence = store.changes_since(0)
+    assert [(seq, op, item.ID) for seq, op, item in changes] == [(1, "create", 1), (2, "update", 1)]
+    assert sequence == 2 and store.changes_since(2) == ([], 2)
+
+    store.apply([("create", Item(ID=2)), ("delete", 1)])
+    assert [op for _, op, _ in store.changes_since(2)[0]] == ["create", "delete"]
+    assert store.changes_since(0) == (None, 4)